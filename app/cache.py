@@ -0,0 +1,127 @@
+import time
+from collections import OrderedDict
+
+
+# ============================================================
+# Bounded LRU cache with per-entry TTL
+# ============================================================
+class TTLCache:
+    """
+    In-process LRU cache whose entries also expire after a TTL.
+
+    - get/set are O(1)
+    - when full, the least recently used entry is evicted
+    - expired entries are dropped lazily on access
+    """
+
+    _MISSING = object()
+
+    def __init__(self, maxsize: int, ttl: float, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._data = OrderedDict()  # key -> (expires_at, value)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key, self._MISSING, count=False) is not self._MISSING
+
+    def get(self, key, default=None, count: bool = True):
+        entry = self._data.get(key)
+        if entry is None:
+            if count:
+                self.misses += 1
+            return default
+
+        expires_at, value = entry
+        if expires_at <= self.clock():
+            del self._data[key]
+            self.expirations += 1
+            if count:
+                self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        if count:
+            self.hits += 1
+        return value
+
+    def set(self, key, value, ttl: float = None):
+        expires_at = self.clock() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key):
+        return self._data.pop(key, None) is not None
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+# ============================================================
+# Optional shared backend (Redis)
+# ============================================================
+class RedisCacheBackend:
+    """
+    Shared string cache in Redis so several workers reuse each other's entries.
+
+    Requires the optional `redis` package (pip install redis).
+    """
+
+    def __init__(self, url: str, prefix: str, ttl: float):
+        import redis.asyncio as redis
+
+        self.redis = redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.ttl = ttl
+        self.hits = 0
+        self.errors = 0
+
+    async def get(self, key: str):
+        try:
+            value = await self.redis.get(self.prefix + key)
+        except Exception:
+            # A shared cache outage must never fail the turn
+            self.errors += 1
+            return None
+        if value is not None:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: str, ttl: float = None):
+        try:
+            await self.redis.set(self.prefix + key, value, ex=int(ttl or self.ttl))
+        except Exception:
+            self.errors += 1
+
+    async def delete(self, key: str):
+        try:
+            await self.redis.delete(self.prefix + key)
+        except Exception:
+            self.errors += 1
+
+    def stats(self) -> dict:
+        return {"shared_hits": self.hits, "shared_errors": self.errors}
@@ -1,17 +1,45 @@
-import json
-from app.integrations.loan_system import get_loan_status
-from app.llm_router import llm_route, llm_fallback
+import os
+import time
+from app.integrations.loan_repository import get_loan_repository
+from app.llm_router import llm_fallback
+from app.llm_budget import start_turn, end_turn, LLMUnavailable, BUDGET_STATS
+from app.intent_classifier import FAST_PATH_STATS, timed_classify
+from app.route_cache import cached_llm_route
+from app.flow import get_flow, ACTION, DECISION, PROMPT, PROMPT_NEXT, END
+from app.session import Session
+from app.speculation import CALLER_ID_SPECULATION
+from app.goodbye_pool import GOODBYE_POOL, DECLINED_SMS, AFTER_SMS
+from app.metrics import REGISTRY
+from app.tracing import span, start_trace, end_trace
+from app.logs import get_logger, log_event, elapsed_ms
 
 
 # ============================================================
-# Load the conversation flow ONCE at startup
-# FLOW is a dict: state_name -> state_definition
+# Load and compile the conversation flow ONCE at startup
+# FLOW is a read-only mapping: state_name -> FlowNode
+# (FLOW_PATH, relative to the project root)
 # ============================================================
-with open("flows/loan_status_flow.json") as f:
-    FLOW = json.load(f)
+FLOW = get_flow()
 
+# Upper bound on state transitions within a single turn
+MAX_HOPS = int(os.getenv("FLOW_MAX_HOPS", "32"))
 
-def render_prompt(node: dict, session: dict) -> str:
+# Returned by run_state when the turn continues in the next state
+ADVANCE = object()
+
+
+TURN_SECONDS = REGISTRY.histogram("turn_seconds", "Duration of handle_turn", ("outcome",))
+STATE_SECONDS = REGISTRY.histogram("state_seconds", "Duration of one state's handler", ("state",))
+log = get_logger("conversation")
+
+STATE_RUNS = REGISTRY.counter("state_runs_total", "State handler runs by result", ("state", "result"))
+
+
+class FlowLoopError(RuntimeError):
+    """Raised when a turn cycles or exceeds MAX_HOPS transitions."""
+
+
+def render_prompt(node, session: dict) -> str:
     """
     Renders a prompt for the user.
 
@@ -22,27 +50,88 @@ def render_prompt(node: dict, session: dict) -> str:
     Output:
     - string shown to user
     """
-    prompt = node.get("prompt", "")
-    
-    # Replace template variables
-    if "{{status}}" in prompt:
-        prompt = prompt.replace("{{status}}", session.get("loan_status", "UNKNOWN"))
-    
-    return prompt
+    return node.render_prompt(session)
+
 
+async def route_intent(state: str, user_input: str, allowed_actions: tuple[str, ...]):
+    """
+    Maps user input to an allowed action.
 
-def handle_turn(user_input: str, session: dict):
+    Tries the local fast-path classifier first and only falls back
+    to the (memoized) LLM router when it is not confident.
+    """
+    confident, action = timed_classify(state, user_input, allowed_actions)
+    if confident:
+        return action
+
+    start = time.perf_counter()
+    try:
+        action = await cached_llm_route(user_input, allowed_actions)
+    except LLMUnavailable:
+        # Out of time, or the LLM is failing or shed by the breaker: the
+        # decision state re-prompts with its options (action None). The
+        # local router is not precise enough to confirm a caller ID or
+        # send an SMS on its own.
+        action = None
+        BUDGET_STATS.record_degraded("route_reprompt")
+    FAST_PATH_STATS.record_miss(state, time.perf_counter() - start)
+    return action
+
+
+def resolve_state(session: dict) -> str:
+    """Current state name; never None or an unknown state."""
+    state = session.get("state")
+    if state not in FLOW:
+        state = "start"
+        session["state"] = state
+    return state
+
+
+def _session_fingerprint(session: dict):
+    if isinstance(session, Session):
+        return session.fingerprint()  # leaves the trace out too
+    return tuple(sorted((k, v) for k, v in session.items() if k != "trace"))
+
+
+async def handle_turn(user_input: str, session: dict):
     """
     Handles ONE conversational turn.
 
     Input:
     - user_input: text user just typed (string)
-    - session: mutable dict holding conversation state
+    - session: mutable mapping holding conversation state (a Session,
+      or a plain dict)
 
     Output:
     - (response_text, updated_session)
+      session["trace"] lists the states visited during this turn
+
+    LLM calls made during the turn share its latency budget
+    (TURN_BUDGET_SECONDS, see app/llm_budget.py). Its stages are
+    timed as spans (see app/tracing.py).
     """
+    started = time.monotonic()
+    token = start_turn()
+    trace_token = start_trace()
+    outcome = "error"
+    try:
+        result = await _handle_turn(user_input, session)
+        outcome = "ok"
+        return result
+    finally:
+        end_turn(token, started)
+        seconds = time.monotonic() - started
+        TURN_SECONDS.observe(seconds, outcome)
+        trace = session.get("trace")
+        end_trace(trace_token, trace)
+        log_event(
+            log, "turn", outcome=outcome, states=trace,
+            state=session.get("state"), ended=session.get("ended", False),
+            duration_ms=round(seconds * 1000, 3),
+        )
+
 
+async def _handle_turn(user_input: str, session: dict):
     # --------------------------------------------------------
     # 0. TERMINAL GUARD
     # --------------------------------------------------------
@@ -56,22 +145,77 @@ def handle_turn(user_input: str, session: dict):
     # --------------------------------------------------------
     # 0.5. INITIALIZE CALLER ID (simulates incoming call)
     # --------------------------------------------------------
+    # The telephony side may pass the caller ID in with a new session
     if "caller_id" not in session:
         import random
         # Generate random 10-digit phone number (simulating caller ID)
         session["caller_id"] = "".join([str(random.randint(0, 9)) for _ in range(10)])
-        print(f"DEBUG | Incoming call from: {session['caller_id']}")
+
+    if not session.get("greeted"):
+        log_event(log, "incoming_call", caller_id=session["caller_id"])
+
+        # Look the caller ID up while the greeting is played
+        CALLER_ID_SPECULATION.start(session)
+    else:
+        CALLER_ID_SPECULATION.collect(session)
 
     # --------------------------------------------------------
-    # 1. RESOLVE CURRENT STATE SAFELY
+    # 1. RUN STATES UNTIL ONE PRODUCES A RESPONSE
     # --------------------------------------------------------
-    # Never allow None or invalid states
-    state = session.get("state") or "start"
-    if state not in FLOW:
-        state = "start"
+    # Auto-advancing states (verifications, prompts with "next",
+    # routed decisions) hand over to the next state with empty input.
+    # This is a bounded loop rather than recursion, so a cycle in the
+    # flow raises FlowLoopError instead of RecursionError.
+    # --------------------------------------------------------
+    trace = []
+    session["trace"] = trace
+    seen = set()
 
-    session["state"] = state
-    node = FLOW[state]
+    for _ in range(MAX_HOPS):
+        with span("resolve_state"):
+            state = resolve_state(session)
+        trace.append(state)
+
+        # Same state, input and session as earlier in this turn:
+        # the flow would repeat forever
+        fingerprint = (user_input, _session_fingerprint(session))
+        if fingerprint in seen:
+            raise FlowLoopError(f"Flow cycle detected: {' → '.join(trace)}")
+        seen.add(fingerprint)
+
+        response = await timed_run_state(state, FLOW[state], user_input, session)
+        if response is not ADVANCE:
+            if session.get("ended"):
+                CALLER_ID_SPECULATION.discard(session)
+            return response, session
+
+        user_input = ""
+
+    raise FlowLoopError(f"More than {MAX_HOPS} state transitions in one turn: {' → '.join(trace)}")
+
+
+async def timed_run_state(state: str, node, user_input: str, session: dict):
+    """run_state, recorded in the per-state latency histogram and run counter."""
+    started = time.perf_counter()
+    result = "error"
+    try:
+        with span("state", state=state):
+            response = await run_state(state, node, user_input, session)
+        result = "advance" if response is ADVANCE else "respond"
+        return response
+    finally:
+        STATE_SECONDS.observe(time.perf_counter() - started, state)
+        STATE_RUNS.inc(state, result)
+
+
+async def run_state(state: str, node, user_input: str, session: dict):
+    """
+    Runs ONE state of the flow.
+
+    Output:
+    - the response text, or ADVANCE when session["state"] has moved on
+      and the next state should run within the same turn
+    """
 
     # --------------------------------------------------------
     # 2. INITIAL GREETING (start state only)
@@ -85,8 +229,7 @@ def handle_turn(user_input: str, session: dict):
         return (
             f"Hello! I can help you check your loan status. "
             f"I see you're calling from {formatted_number}. "
-            f"Is this the number associated with your loan application? Say yes or no.",
-            session
+            f"Is this the number associated with your loan application? Say yes or no."
         )
 
     # --------------------------------------------------------
@@ -95,35 +238,42 @@ def handle_turn(user_input: str, session: dict):
     # These states CONSUME user input and do work
     # --------------------------------------------------------
 
+    action = node.action if node.kind == ACTION else None
+
     # -------- VERIFY PHONE NUMBER --------
-    if node.get("action") == "verify_phone":
+    if action == "verify_phone":
         # Use the phone number already collected via keypad
         phone = session.get("phone")
         
         if not phone:
-            return "Please enter your phone number first.", session
+            return "Please enter your phone number first."
 
-        status = get_loan_status(phone)
-        print("DEBUG | loan lookup:", repr(phone), "→", status)
+        started = time.perf_counter()
+        with span("loan_lookup", source="keypad"):
+            status = await get_loan_repository().lookup(phone)
+        lookup_ms = elapsed_ms(started)
 
         if status == "NOT_FOUND":
-            session["state"] = node["on_failure"]
+            session["state"] = node.on_failure
         else:
             session["loan_status"] = status
-            session["state"] = node["on_success"]
+            session["state"] = node.on_success
 
-        print("DEBUG | transition after verify:", session["state"])
+        log_event(
+            log, "loan_lookup", state=state, source="keypad", phone=phone,
+            status=status, next_state=session["state"], lookup_ms=lookup_ms,
+        )
 
         # Continue to next state automatically
-        return handle_turn("", session)
+        return ADVANCE
     
     # -------- GET KEYPAD INPUT (simulated) --------
-    if node.get("action") == "get_keypad_input":
+    if action == "get_keypad_input":
         # In simulation, we'll use voice to get the number
         # But present it as if they're using a keypad
         
         if not user_input.strip():
-            return render_prompt(node, session), session
+            return render_prompt(node, session)
         
         # Clean the input - extract only digits
         cleaned_input = ''.join(filter(str.isdigit, user_input))
@@ -132,61 +282,66 @@ def handle_turn(user_input: str, session: dict):
         if len(cleaned_input) != 10:
             return (
                 f"I received {len(cleaned_input)} digits. "
-                f"Please enter exactly 10 digits using your keypad, followed by the pound key.",
-                session
+                f"Please enter exactly 10 digits using your keypad, followed by the pound key."
             )
         
         # Confirm the number back to user
         formatted = f"{cleaned_input[:3]}-{cleaned_input[3:6]}-{cleaned_input[6:]}"
         session["phone"] = cleaned_input
-        session["state"] = node["on_success"]
+        session["state"] = node.on_success
         
         # Continue to verification
-        return handle_turn("", session)
+        return ADVANCE
     
     # -------- VERIFY CALLER ID --------
-    if node.get("action") == "verify_phone_from_caller_id":
+    if action == "verify_phone_from_caller_id":
         # Use the caller ID from session
         phone = session.get("caller_id")
         session["phone"] = phone
 
-        status = get_loan_status(phone)
-        print("DEBUG | caller ID lookup:", repr(phone), "→", status)
+        # Usually already looked up in the background during the greeting
+        started = time.perf_counter()
+        with span("loan_lookup", source="caller_id"):
+            status = await CALLER_ID_SPECULATION.take(session)
+            if status is None:
+                status = await get_loan_repository().lookup(phone)
+        lookup_ms = elapsed_ms(started)
 
         if status == "NOT_FOUND":
-            session["state"] = node["on_failure"]
+            session["state"] = node.on_failure
         else:
             session["loan_status"] = status
-            session["state"] = node["on_success"]
+            session["state"] = node.on_success
+
+        log_event(
+            log, "loan_lookup", state=state, source="caller_id", phone=phone,
+            status=status, next_state=session["state"], lookup_ms=lookup_ms,
+        )
 
         # Continue to next state automatically
-        return handle_turn("", session)
-    
+        return ADVANCE
+
     # -------- TRANSFER TO AGENT --------
-    if node.get("action") == "transfer_to_agent":
+    if action == "transfer_to_agent":
         # Simulate call transfer with hold music
         session["ended"] = True
         return (
             "[Transferring call... Hold music plays... Agent picks up]\n"
-            "Agent: Hello, this is the loan department. How can I help you today?",
-            session
+            "Agent: Hello, this is the loan department. How can I help you today?"
         )
     
     # -------- GENERATE LLM GOODBYE --------
-    if node.get("action") == "generate_goodbye":
-        from app.llm_router import llm_generate_goodbye
-        
-        goodbye_message = llm_generate_goodbye(session)
+    if action == "generate_goodbye":
+        # Pre-generated; live LLM call only if the pool is empty
+        goodbye_message = await GOODBYE_POOL.get(session, DECLINED_SMS)
         session["ended"] = True
-        return goodbye_message, session
+        return goodbye_message
     
     # -------- GENERATE LLM GOODBYE AFTER SMS --------
-    if node.get("action") == "llm_goodbye_after_sms":
-        from app.llm_router import llm_generate_goodbye_after_sms
-        
-        goodbye_message = llm_generate_goodbye_after_sms(session)
+    if action == "llm_goodbye_after_sms":
+        goodbye_message = await GOODBYE_POOL.get(session, AFTER_SMS)
         session["ended"] = True
-        return goodbye_message, session
+        return goodbye_message
 
     # --------------------------------------------------------
     # 4. DECISION STATES (LLM-routed)
@@ -197,61 +352,49 @@ def handle_turn(user_input: str, session: dict):
     # INPUT: user_input
     # OUTPUT: next state OR clarification
     # --------------------------------------------------------
-    if "allowed_actions" in node:
+    if node.kind == DECISION:
         # First time entering decision state → prompt user
         if session.get("last_prompted_state") != state:
             session["last_prompted_state"] = state
-            return render_prompt(node, session), session
+            return render_prompt(node, session)
 
         # If no input, wait
         if not user_input.strip():
-            return render_prompt(node, session), session
+            return render_prompt(node, session)
 
         # Now interpret user's choice
-        action = llm_route(
-            user_input,
-            list(node["allowed_actions"].keys())
-        )
+        choice = await route_intent(state, user_input, node.actions)
 
-        if action:
-            session["state"] = node["allowed_actions"][action]
+        if choice:
+            session["state"] = node.transitions[choice]
             session.pop("last_prompted_state", None)
-            return handle_turn("", session)
+            return ADVANCE
 
         # User said something unclear - give helpful prompt with options
-        options_text = " or ".join(f"'{opt}'" for opt in node["allowed_actions"].keys())
-        return (
-            f"I didn't quite understand that. Please say {options_text}.",
-            session
-        )
+        return node.unclear_text
 
     # --------------------------------------------------------
     # 5. PROMPT-ONLY STATES
     # --------------------------------------------------------
     # These states ONLY speak, never consume input
     # --------------------------------------------------------
-    if (
-        "prompt" in node
-        and "action" not in node
-        and "allowed_actions" not in node
-    ):
-        if "next" in node:
-            session["state"] = node["next"]
-            return handle_turn("", session)
-        
-        return render_prompt(node, session), session
+    if node.kind == PROMPT_NEXT:
+        session["state"] = node.next
+        return ADVANCE
+
+    if node.kind == PROMPT:
+        return render_prompt(node, session)
 
     # --------------------------------------------------------
     # 6. END STATE
     # --------------------------------------------------------
-    if node.get("end"):
+    if node.kind == END:
         session["ended"] = True
-        return render_prompt(node, session), session
+        return render_prompt(node, session)
 
     # --------------------------------------------------------
     # 7. SAFETY FALLBACK (should never hit)
     # --------------------------------------------------------
     return (
-        "I'm sorry, something went wrong. Please start a new conversation.",
-        session
+        "I'm sorry, something went wrong. Please start a new conversation."
     )
\ No newline at end of file
@@ -0,0 +1,235 @@
+import json
+import logging
+import os
+import re
+from functools import lru_cache
+from types import MappingProxyType
+
+from app.logs import get_logger, log_event
+
+log = get_logger("flow")
+
+
+# ============================================================
+# Flow compiler
+# ============================================================
+# Turns the raw flow JSON (state_name -> dict) into immutable
+# FlowNode objects with everything handle_turn needs precomputed:
+# - the dispatch kind (action / decision / prompt / end)
+# - the allowed actions as a tuple
+# - prompt templates split into literal and variable parts
+# - the "I didn't understand" re-prompt
+#
+# It also validates the graph once at load time, so a typo in a
+# transition target fails at startup instead of mid-call.
+# ============================================================
+
+START_STATE = "start"
+
+# Relative flow paths are resolved against the project root (the
+# directory holding app/ and flows/), not the working directory
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FLOW_PATH = os.getenv("FLOW_PATH", "flows/loan_status_flow.json")
+
+# Dispatch kinds, in the same precedence handle_turn has always used
+ACTION = "action"            # known action handler (verify_phone, ...)
+DECISION = "decision"        # has allowed_actions, routed by intent
+PROMPT_NEXT = "prompt_next"  # speaks, then moves to "next"
+PROMPT = "prompt"            # speaks and waits
+END = "end"                  # "end": true
+INVALID = "invalid"          # nothing handle_turn can do with it
+
+# Actions implemented by app/conversation.py
+KNOWN_ACTIONS = frozenset({
+    "verify_phone",
+    "get_keypad_input",
+    "verify_phone_from_caller_id",
+    "transfer_to_agent",
+    "generate_goodbye",
+    "llm_goodbye_after_sms",
+})
+
+# Transitions each action handler relies on
+REQUIRED_TARGETS = {
+    "verify_phone": ("on_success", "on_failure"),
+    "verify_phone_from_caller_id": ("on_success", "on_failure"),
+    "get_keypad_input": ("on_success",),
+}
+
+# Template variable -> (session key, default)
+PROMPT_VARIABLES = {
+    "status": ("loan_status", "UNKNOWN"),
+}
+
+_VARIABLE_RE = re.compile(r"\{\{(\w+)\}\}")
+
+
+class FlowError(ValueError):
+    """Raised when the flow definition is invalid."""
+
+
+class PromptTemplate:
+    """
+    A prompt pre-split into literal text and variable slots.
+
+    head is the literal before the first variable; rest holds one
+    ((session_key, default), following_literal) pair per variable.
+    """
+
+    __slots__ = ("text", "head", "rest")
+
+    def __init__(self, text: str, state: str = "?"):
+        literals = []
+        slots = []
+        position = 0
+        for match in _VARIABLE_RE.finditer(text):
+            name = match.group(1)
+            if name not in PROMPT_VARIABLES:
+                raise FlowError(f"State {state!r}: unknown prompt variable {{{{{name}}}}}")
+            literals.append(text[position:match.start()])
+            slots.append(PROMPT_VARIABLES[name])
+            position = match.end()
+        literals.append(text[position:])
+
+        self.text = text
+        self.head = literals[0]
+        self.rest = tuple(zip(slots, literals[1:]))
+
+    def render(self, session: dict) -> str:
+        if not self.rest:
+            return self.text
+        out = self.head
+        for (key, default), literal in self.rest:
+            out += session.get(key, default) + literal
+        return out
+
+
+_EMPTY_PROMPT = PromptTemplate("")
+
+
+class FlowNode:
+    """One compiled, immutable state of the flow."""
+
+    __slots__ = (
+        "name",
+        "kind",
+        "action",
+        "prompt",
+        "transitions",
+        "actions",
+        "on_success",
+        "on_failure",
+        "next",
+        "end",
+        "unclear_text",
+    )
+
+    def __init__(self, name: str, raw: dict):
+        set_ = object.__setattr__
+        set_(self, "name", name)
+        set_(self, "action", raw.get("action"))
+        set_(self, "prompt", PromptTemplate(raw["prompt"], name) if "prompt" in raw else _EMPTY_PROMPT)
+        set_(self, "transitions", MappingProxyType(dict(raw.get("allowed_actions", {}))))
+        set_(self, "actions", tuple(self.transitions))
+        set_(self, "on_success", raw.get("on_success"))
+        set_(self, "on_failure", raw.get("on_failure"))
+        set_(self, "next", raw.get("next"))
+        set_(self, "end", bool(raw.get("end")))
+        set_(self, "kind", self._dispatch_kind(raw))
+
+        options_text = " or ".join(f"'{opt}'" for opt in self.actions)
+        set_(self, "unclear_text", f"I didn't quite understand that. Please say {options_text}.")
+
+    def _dispatch_kind(self, raw: dict) -> str:
+        if self.action is not None:
+            if self.action not in KNOWN_ACTIONS:
+                raise FlowError(f"State {self.name!r}: unknown action {self.action!r}")
+            return ACTION
+        if "allowed_actions" in raw:
+            return DECISION
+        if "prompt" in raw:
+            return PROMPT_NEXT if "next" in raw else PROMPT
+        if self.end:
+            return END
+        return INVALID
+
+    def __setattr__(self, name, value):
+        raise AttributeError("FlowNode is immutable")
+
+    def render_prompt(self, session: dict) -> str:
+        return self.prompt.render(session)
+
+    def targets(self):
+        """Every state this node can transition to."""
+        for target in (self.on_success, self.on_failure, self.next):
+            if target is not None:
+                yield target
+        yield from self.transitions.values()
+
+    def __repr__(self):
+        return f"FlowNode({self.name!r}, kind={self.kind!r})"
+
+
+def find_unreachable(nodes: dict, start: str = START_STATE) -> list[str]:
+    """States that no path from the start state can reach."""
+    seen = {start}
+    stack = [start]
+    while stack:
+        for target in nodes[stack.pop()].targets():
+            if target not in seen:
+                seen.add(target)
+                stack.append(target)
+    return sorted(set(nodes) - seen)
+
+
+def compile_flow(raw: dict, strict: bool = False):
+    """
+    Compiles and validates a raw flow definition.
+
+    Input:
+    - raw: state_name -> state definition (the flow JSON)
+    - strict: treat unreachable states as errors instead of warnings
+
+    Output:
+    - read-only mapping state_name -> FlowNode
+    """
+    nodes = {name: FlowNode(name, definition) for name, definition in raw.items()}
+
+    if START_STATE not in nodes:
+        raise FlowError(f"Flow has no {START_STATE!r} state")
+
+    for node in nodes.values():
+        for target in node.targets():
+            if target not in nodes:
+                raise FlowError(f"State {node.name!r}: transition to unknown state {target!r}")
+        for field in REQUIRED_TARGETS.get(node.action, ()):
+            if getattr(node, field) is None:
+                raise FlowError(f"State {node.name!r}: action {node.action!r} needs {field!r}")
+
+    unreachable = find_unreachable(nodes)
+    if unreachable:
+        if strict:
+            raise FlowError(f"Unreachable states: {', '.join(unreachable)}")
+        log_event(log, "flow_unreachable_states", level=logging.WARNING, states=unreachable)
+
+    return MappingProxyType(nodes)
+
+
+def resolve_flow_path(path: str) -> str:
+    return os.path.join(PROJECT_DIR, path)
+
+
+def load_flow(path: str, strict: bool = False):
+    """Reads a flow JSON file and compiles it."""
+    with open(resolve_flow_path(path)) as f:
+        return compile_flow(json.load(f), strict=strict)
+
+
+@lru_cache(maxsize=None)
+def get_flow(path: str = FLOW_PATH, strict: bool = False):
+    """
+    The compiled flow for `path`, loaded once per process.
+
+    Compiled flows are immutable, so every caller can share one.
+    """
+    return load_flow(path, strict=strict)
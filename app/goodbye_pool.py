@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import os
+import random
+
+from app import llm_router
+from app.llm_budget import LLMUnavailable, BUDGET_STATS
+from app.llm_guard import LLM_GUARD, CLOSED
+from app.logs import get_logger, log_event
+
+log = get_logger("goodbye_pool")
+
+# ============================================================
+# Goodbye message pool
+# ============================================================
+# The closing message only depends on the loan status and on how
+# the call ended, so goodbyes are reused, handed out round-robin in
+# O(1). A key's pool is filled by its first GOODBYE_POOL_SIZE live
+# goodbyes, which those calls need anyway; after that the LLM is not
+# called for it.
+#
+# With GOODBYE_POOL_WARM the pool is also generated ahead of time and
+# refreshed in the background. Every worker does this, against the
+# same rate limit as live calls, so the requests go one at a time,
+# GOODBYE_WARM_STAGGER_SECONDS apart, and wait while the LLM is busy.
+# ============================================================
+
+GOODBYE_POOL_ENABLED = os.getenv("GOODBYE_POOL", "1") != "0"
+GOODBYE_POOL_SIZE = int(os.getenv("GOODBYE_POOL_SIZE", "8"))
+GOODBYE_POOL_WARM = os.getenv("GOODBYE_POOL_WARM", "0") != "0"
+GOODBYE_REFRESH_SECONDS = float(os.getenv("GOODBYE_REFRESH_SECONDS", "3600"))
+GOODBYE_WARM_STAGGER_SECONDS = float(os.getenv("GOODBYE_WARM_STAGGER_SECONDS", "2"))
+# Warm-up requests wait while the breaker is not closed or more than
+# this share of the LLM concurrency limit is in use
+GOODBYE_WARM_MAX_LOAD = 0.5
+GOODBYE_STATUSES = [
+    s.strip() for s in os.getenv("GOODBYE_STATUSES", "UNDER_REVIEW,APPROVED").split(",") if s.strip()
+]
+
+# Call paths that end in a generated goodbye
+DECLINED_SMS = "declined_sms"
+AFTER_SMS = "after_sms"
+
+# Used when the turn's budget runs out before a live goodbye is ready
+STATIC_GOODBYES = {
+    DECLINED_SMS: "Thank you for calling. Have a great day!",
+    AFTER_SMS: "Thank you for calling. You'll receive your SMS shortly. Goodbye!",
+}
+
+# Path -> llm_router function that writes a goodbye for it
+GENERATORS = {
+    DECLINED_SMS: "llm_generate_goodbye",
+    AFTER_SMS: "llm_generate_goodbye_after_sms",
+}
+
+
+def _generate(path: str, session: dict):
+    return getattr(llm_router, GENERATORS[path])(session)
+
+
+def _llm_busy() -> bool:
+    limiter = LLM_GUARD.limiter
+    return LLM_GUARD.breaker.state != CLOSED or limiter.in_flight >= limiter.limit * GOODBYE_WARM_MAX_LOAD
+
+
+class GoodbyePool:
+    """Pre-generated goodbyes keyed by (loan_status, path)."""
+
+    def __init__(self, size: int = GOODBYE_POOL_SIZE):
+        self.size = size
+        self._messages = {}  # (status, path) -> list[str]
+        self._cursor = {}    # (status, path) -> next index
+        self._generated = {}  # (status, path) -> goodbyes generated so far
+        self.served = 0
+        self.live_fallbacks = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.warm_deferred = 0
+
+    def pick(self, status: str, path: str):
+        """Next message for the key, or None if the pool is empty."""
+        key = (status, path)
+        messages = self._messages.get(key)
+        if not messages:
+            return None
+        i = self._cursor[key]
+        self._cursor[key] = i + 1
+        self.served += 1
+        return messages[i % len(messages)]
+
+    def add(self, status: str, path: str, message: str):
+        """Adds one generated message, keeping at most `size` per key."""
+        key = (status, path)
+        self._generated[key] = self._generated.get(key, 0) + 1
+        messages = self._messages.setdefault(key, [])
+        if message in messages:
+            return
+        if len(messages) >= self.size:
+            messages.pop(0)
+        messages.append(message)
+        self._cursor.setdefault(key, random.randrange(self.size))
+
+    async def get(self, session: dict, path: str) -> str:
+        """
+        Goodbye for this call.
+
+        Falls back to a live LLM call (and keeps its result) while the
+        pool for this status/path is still filling, and to a static
+        goodbye when that call fails or does not fit in the turn's budget.
+        """
+        status = session.get("loan_status", "")
+        if GOODBYE_POOL_ENABLED and self._generated.get((status, path), 0) >= self.size:
+            message = self.pick(status, path)
+            if message is not None:
+                return message
+
+        self.live_fallbacks += 1
+        try:
+            message = await _generate(path, session)
+        except LLMUnavailable:
+            BUDGET_STATS.record_degraded("goodbye_static")
+            return STATIC_GOODBYES[path]
+        if GOODBYE_POOL_ENABLED:
+            self.add(status, path, message)
+        return message
+
+    async def _generate_one(self, status: str, path: str):
+        try:
+            message = await _generate(path, {"loan_status": status})
+        except Exception:
+            self.refresh_errors += 1
+            return
+        if message:
+            self.add(status, path, message)
+
+    async def _wait_for_idle_llm(self, stagger: float):
+        """Sleeps `stagger` seconds, then for as long as the LLM is busy."""
+        await asyncio.sleep(stagger)
+        while _llm_busy():
+            self.warm_deferred += 1
+            await asyncio.sleep(stagger)
+
+    async def refresh(self, statuses=None, stagger: float = GOODBYE_WARM_STAGGER_SECONDS):
+        """
+        Generates `size` goodbyes for every key; the oldest messages make
+        room, so a key whose generation failed keeps what it had.
+
+        With stagger > 0 the requests go one at a time, round-robin over
+        the keys, at least `stagger` seconds apart and only while the LLM
+        is not busy. stagger=0 sends them all at once (benchmarks).
+        """
+        statuses = statuses or GOODBYE_STATUSES
+        keys = [(status, path) for status in statuses for path in GENERATORS]
+        if stagger > 0:
+            for _ in range(self.size):
+                for status, path in keys:
+                    await self._wait_for_idle_llm(stagger)
+                    await self._generate_one(status, path)
+        else:
+            await asyncio.gather(*(self._generate_one(*key) for key in keys for _ in range(self.size)))
+        self.refreshes += 1
+
+    async def run_refresher(self, interval: float = GOODBYE_REFRESH_SECONDS):
+        """Warms the pool, then refreshes it every `interval` seconds. Runs until cancelled."""
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                self.refresh_errors += 1
+                log_event(log, "goodbye_refresh_failed", level=logging.ERROR, error=str(e))
+            await asyncio.sleep(interval)
+
+    def stats(self) -> dict:
+        return {
+            "keys": {f"{status}/{path}": len(m) for (status, path), m in self._messages.items()},
+            "served_from_pool": self.served,
+            "live_fallbacks": self.live_fallbacks,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "warm_deferred": self.warm_deferred,
+        }
+
+
+GOODBYE_POOL = GoodbyePool()
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import time
+
+from app.cache import TTLCache
+from app.integrations.loan_repository import LoanStatusRepository, NOT_FOUND
+
+LOAN_CACHE_ENABLED = os.getenv("LOAN_CACHE", "1") != "0"
+LOAN_CACHE_SIZE = int(os.getenv("LOAN_CACHE_SIZE", "50000"))
+LOAN_CACHE_TTL = float(os.getenv("LOAN_CACHE_TTL", "300"))
+LOAN_CACHE_NEGATIVE_TTL = float(os.getenv("LOAN_CACHE_NEGATIVE_TTL", "30"))
+
+
+class CachedLoanRepository(LoanStatusRepository):
+    """
+    Read-through cache in front of another loan repository.
+
+    - found statuses are kept for `ttl`, NOT_FOUND only for `negative_ttl`
+      (a just-submitted application should show up quickly)
+    - concurrent lookups of the same phone share one backend call
+    - invalidate(phone) drops an entry when its status changes
+    """
+
+    def __init__(self, backend: LoanStatusRepository, maxsize: int = LOAN_CACHE_SIZE,
+                 ttl: float = LOAN_CACHE_TTL, negative_ttl: float = LOAN_CACHE_NEGATIVE_TTL):
+        self.backend = backend
+        self.negative_ttl = negative_ttl
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._inflight = {}  # phone -> Task
+
+        self.coalesced = 0
+        self.invalidations = 0
+        self.backend_calls = 0
+        self.backend_seconds = 0.0
+        self.backend_max_seconds = 0.0
+        self.lookups = 0
+        self.lookup_seconds = 0.0
+
+    async def lookup(self, phone: str) -> str:
+        start = time.perf_counter()
+        try:
+            status = self.cache.get(phone)
+            if status is not None:
+                return status
+
+            task = self._inflight.get(phone)
+            if task is None:
+                task = asyncio.ensure_future(self._fetch(phone))
+                self._inflight[phone] = task
+            else:
+                self.coalesced += 1
+
+            # shield: one caller giving up must not cancel the others' lookup
+            return await asyncio.shield(task)
+        finally:
+            self.lookups += 1
+            self.lookup_seconds += time.perf_counter() - start
+
+    async def _fetch(self, phone: str) -> str:
+        task = asyncio.current_task()
+        start = time.perf_counter()
+        try:
+            status = await self.backend.lookup(phone)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.backend_calls += 1
+            self.backend_seconds += elapsed
+            self.backend_max_seconds = max(self.backend_max_seconds, elapsed)
+
+            # Invalidated while in flight: hand the result to current
+            # waiters but do not cache it
+            current = self._inflight.get(phone) is task
+            if current:
+                del self._inflight[phone]
+
+        if current:
+            ttl = self.negative_ttl if status == NOT_FOUND else None
+            self.cache.set(phone, status, ttl=ttl)
+        return status
+
+    def invalidate(self, phone: str):
+        """Call when an application's status changes."""
+        self.cache.delete(phone)
+        self._inflight.pop(phone, None)
+        self.invalidations += 1
+
+    def stats(self) -> dict:
+        report = self.cache.stats()
+        report.update({
+            "coalesced": self.coalesced,
+            "invalidations": self.invalidations,
+            "backend_calls": self.backend_calls,
+            "backend_avg_ms": round(self.backend_seconds / self.backend_calls * 1000, 3) if self.backend_calls else 0.0,
+            "backend_max_ms": round(self.backend_max_seconds * 1000, 3),
+            "lookup_avg_ms": round(self.lookup_seconds / self.lookups * 1000, 3) if self.lookups else 0.0,
+        })
+        return report
+
+    def close(self):
+        self.backend.close()
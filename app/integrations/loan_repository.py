@@ -0,0 +1,283 @@
+import asyncio
+import json
+import os
+import queue
+import sqlite3
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from app.integrations.loan_system import MOCK_LOAN_DB
+
+NOT_FOUND = "NOT_FOUND"
+
+LOAN_BACKEND = os.getenv("LOAN_BACKEND", "mock")
+LOAN_DB_PATH = os.getenv("LOAN_DB_PATH", "loan_status.db")
+LOAN_SNAPSHOT_PATH = os.getenv("LOAN_SNAPSHOT_PATH", "loan_status.snapshot")
+LOAN_DB_POOL_SIZE = int(os.getenv("LOAN_DB_POOL_SIZE", "4"))
+
+
+# ============================================================
+# Repository interface
+# ============================================================
+class LoanStatusRepository:
+    """Looks up the loan application status for a phone number."""
+
+    async def lookup(self, phone: str) -> str:
+        """Returns the status, or NOT_FOUND."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MockLoanRepository(LoanStatusRepository):
+    """The two demo applications from loan_system.MOCK_LOAN_DB."""
+
+    async def lookup(self, phone: str) -> str:
+        return MOCK_LOAN_DB.get(phone, NOT_FOUND)
+
+
+# ============================================================
+# SQLite backend
+# ============================================================
+class SQLiteLoanRepository(LoanStatusRepository):
+    """
+    Applications in a SQLite table indexed on phone number.
+
+    - a fixed pool of connections, one per worker thread, so lookups
+      never block the event loop
+    - every lookup uses the same SQL text, so each connection prepares
+      it once and reuses it from its statement cache
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS loan_applications ("
+        " application_id INTEGER PRIMARY KEY,"
+        " phone TEXT NOT NULL,"
+        " status TEXT NOT NULL"
+        ")",
+        "CREATE INDEX IF NOT EXISTS idx_loan_applications_phone"
+        " ON loan_applications (phone, application_id)",
+    )
+
+    # Latest application for the number
+    LOOKUP_SQL = (
+        "SELECT status FROM loan_applications"
+        " WHERE phone = ? ORDER BY application_id DESC LIMIT 1"
+    )
+    INSERT_SQL = "INSERT INTO loan_applications (phone, status) VALUES (?, ?)"
+
+    def __init__(self, path: str = LOAN_DB_PATH, pool_size: int = LOAN_DB_POOL_SIZE):
+        self.path = path
+        self._pool = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="loan-db")
+
+        for _ in range(pool_size):
+            conn = sqlite3.connect(path, check_same_thread=False, cached_statements=32)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._pool.put(conn)
+
+        with self._connection() as conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+            conn.commit()
+
+    def _connection(self):
+        return _PooledConnection(self._pool)
+
+    def lookup_sync(self, phone: str) -> str:
+        with self._connection() as conn:
+            row = conn.execute(self.LOOKUP_SQL, (phone,)).fetchone()
+        return row[0] if row else NOT_FOUND
+
+    async def lookup(self, phone: str) -> str:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.lookup_sync, phone)
+
+    def bulk_load(self, rows, batch_size: int = 50000) -> int:
+        """
+        Inserts (phone, status) pairs in large transactions.
+
+        Output:
+        - number of rows inserted
+        """
+        count = 0
+        batch = []
+        with self._connection() as conn:
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    conn.executemany(self.INSERT_SQL, batch)
+                    conn.commit()
+                    count += len(batch)
+                    batch = []
+            if batch:
+                conn.executemany(self.INSERT_SQL, batch)
+                conn.commit()
+                count += len(batch)
+        return count
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+
+class _PooledConnection:
+    """Borrows a connection from the pool for the duration of a with-block."""
+
+    __slots__ = ("pool", "conn")
+
+    def __init__(self, pool: queue.Queue):
+        self.pool = pool
+        self.conn = None
+
+    def __enter__(self):
+        self.conn = self.pool.get()
+        return self.conn
+
+    def __exit__(self, *exc):
+        self.pool.put(self.conn)
+
+
+# ============================================================
+# Memory-mapped snapshot backend
+# ============================================================
+# File layout (little endian):
+#   magic "LOANSNAP" | version u32 | count u64 | statuses_len u32
+#   statuses (JSON list of status names)
+#   padding to 8 bytes
+#   phones   u64[count]  sorted ascending
+#   codes    u8[count]   index into statuses
+# ============================================================
+SNAPSHOT_MAGIC = b"LOANSNAP"
+SNAPSHOT_VERSION = 1
+_HEADER = struct.Struct("<8sIQI")
+
+
+def phone_key(phone: str):
+    """10-digit phone number as an integer, or None if it is not one."""
+    if phone is None or len(phone) != 10 or not phone.isdigit():
+        return None
+    return int(phone)
+
+
+def write_snapshot(path: str, rows) -> int:
+    """
+    Bulk-builds a snapshot file from (phone, status) pairs.
+
+    Later rows win when a phone appears more than once.
+    Rows whose phone is not 10 digits are skipped.
+
+    Output:
+    - number of distinct phones written
+    """
+    import numpy as np
+
+    statuses = {}
+    phones = []
+    codes = []
+    for phone, status in rows:
+        key = phone_key(phone)
+        if key is None:
+            continue
+        phones.append(key)
+        codes.append(statuses.setdefault(status, len(statuses)))
+
+    if len(statuses) > 255:
+        raise ValueError("Snapshot supports at most 255 distinct statuses")
+
+    phones = np.asarray(phones, dtype=np.uint64)
+    codes = np.asarray(codes, dtype=np.uint8)
+
+    # Stable sort keeps input order among duplicates; keep the last one
+    order = np.argsort(phones, kind="stable")
+    phones, codes = phones[order], codes[order]
+    keep = np.ones(len(phones), dtype=bool)
+    keep[:-1] = phones[1:] != phones[:-1]
+    phones, codes = phones[keep], codes[keep]
+
+    names = json.dumps(list(statuses)).encode()
+    header = _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(phones), len(names)) + names
+    header += b"\0" * (-len(header) % 8)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(phones.tobytes())
+        f.write(codes.tobytes())
+    os.replace(tmp_path, path)
+    return len(phones)
+
+
+class SnapshotLoanRepository(LoanStatusRepository):
+    """
+    Read-only, memory-mapped snapshot of every application.
+
+    Lookups are a binary search over the sorted phone column; the OS page
+    cache holds the file, so millions of rows cost little private memory
+    and several workers share the same pages.
+    """
+
+    def __init__(self, path: str = LOAN_SNAPSHOT_PATH):
+        import numpy as np
+
+        with open(path, "rb") as f:
+            magic, version, count, names_len = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                raise ValueError(f"{path} is not a version {SNAPSHOT_VERSION} loan snapshot")
+            self.statuses = tuple(json.loads(f.read(names_len)))
+
+        offset = _HEADER.size + names_len
+        offset += -offset % 8
+
+        self.path = path
+        self.count = count
+        self._uint64 = np.uint64
+        self._phones = np.memmap(path, dtype=np.uint64, mode="r", offset=offset, shape=(count,))
+        self._codes = np.memmap(path, dtype=np.uint8, mode="r", offset=offset + 8 * count, shape=(count,))
+
+    def lookup_sync(self, phone: str) -> str:
+        key = phone_key(phone)
+        if key is None or not self.count:
+            return NOT_FOUND
+        # Search with a uint64 scalar: a Python int would make numpy
+        # convert the whole column on every lookup
+        key = self._uint64(key)
+        i = int(self._phones.searchsorted(key))
+        if i < self.count and self._phones[i] == key:
+            return self.statuses[self._codes[i]]
+        return NOT_FOUND
+
+    async def lookup(self, phone: str) -> str:
+        # A few microseconds of CPU; not worth a thread hop
+        return self.lookup_sync(phone)
+
+    def close(self):
+        self._phones = self._codes = None
+
+
+# ============================================================
+# Backend selection
+# ============================================================
+def create_loan_repository(kind: str = LOAN_BACKEND) -> LoanStatusRepository:
+    """Builds the repository selected by LOAN_BACKEND."""
+    if kind == "mock":
+        return MockLoanRepository()
+    if kind == "sqlite":
+        return SQLiteLoanRepository()
+    if kind == "snapshot":
+        return SnapshotLoanRepository()
+    raise ValueError(f"Unknown LOAN_BACKEND: {kind!r}")
+
+
+@lru_cache(maxsize=1)
+def get_loan_repository() -> LoanStatusRepository:
+    """The process-wide repository (behind the read-through cache), created on first use."""
+    from app.integrations.loan_cache import CachedLoanRepository, LOAN_CACHE_ENABLED
+
+    repository = create_loan_repository()
+    if LOAN_CACHE_ENABLED:
+        repository = CachedLoanRepository(repository)
+    return repository
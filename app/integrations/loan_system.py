@@ -1,7 +1,9 @@
-def get_loan_status(phone):
-    mock_db = {
-        "9999999999": "UNDER_REVIEW",
-        "8888888888": "APPROVED"
-    }
+# Demo applications, used when no real backend is configured
+MOCK_LOAN_DB = {
+    "9999999999": "UNDER_REVIEW",
+    "8888888888": "APPROVED"
+}
+
 
-    return mock_db.get(phone, "NOT_FOUND")
+def get_loan_status(phone):
+    return MOCK_LOAN_DB.get(phone, "NOT_FOUND")
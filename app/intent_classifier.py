@@ -0,0 +1,281 @@
+import os
+import re
+import time
+from functools import lru_cache
+
+from app.flow import get_flow
+from app.llm_router import ROUTE_EXAMPLES
+
+
+# ============================================================
+# Deterministic fast-path intent classifier
+# ============================================================
+# Answers the common short utterances ("yes", "nah", "talk to agent")
+# locally so they never pay for an LLM round trip. Anything it is not
+# confident about is left to llm_route.
+# ============================================================
+
+FAST_PATH_ENABLED = os.getenv("INTENT_FAST_PATH", "1") != "0"
+
+# Inputs longer than this are left to the LLM
+MAX_TOKENS = 6
+
+# A misheard / misspelled word ("yess", "agnet") may be one edit (or
+# one swap of neighbouring letters) away from a keyword. Short words
+# must match exactly: "now" is too close to "no".
+FUZZY_MIN_LENGTH = 4
+
+# Most single edits of a short keyword are other English words ("hope"
+# / "nope", "night" / "right", "year" / "yeah", "bright"), so keywords
+# shorter than this only match with a letter doubled ("yess") or two
+# neighbouring letters swapped ("yaeh", "agnet")
+FUZZY_ANY_EDIT_LENGTH = 7
+
+# A keyword after one of these is its opposite ("incorrect", "unsure")
+NEGATING_PREFIXES = ("in", "un", "dis", "non")
+
+NONE = "none"
+
+# Filler and function words that never change the intent
+FILLERS = {
+    "um", "uh", "erm", "hmm", "oh", "well", "please", "okay", "ok", "so",
+    "now", "just", "indeed", "thanks", "thank", "you", "that's", "thats", "it's",
+    "a", "an", "the", "to", "me", "i", "it", "my", "with",
+}
+
+# Words that make a phrase match unsafe ("I don't want an agent")
+NEGATIONS = {"not", "dont", "don't", "never", "without", "but", "instead"}
+
+# Extra single-word synonyms on top of ROUTE_EXAMPLES
+SYNONYMS = {
+    "yep": "yes",
+    "yup": "yes",
+    "yea": "yes",
+    "okay": "yes",
+    "correct": "yes",
+    "right": "yes",
+    "alright": "yes",
+    "absolutely": "yes",
+    "nope": "no",
+    "human": "agent",
+    "representative": "agent",
+    "operator": "agent",
+    "person": "agent",
+    "retry": "retry",
+}
+
+
+def normalize(text: str) -> str:
+    """Lowercase, drop punctuation (keeping apostrophes) and collapse whitespace."""
+    text = re.sub(r"[^a-z0-9' ]+", " ", text.lower())
+    return " ".join(text.split())
+
+
+def _build_index():
+    """
+    Builds the phrase and keyword indexes.
+
+    Output:
+    - phrases: normalized phrase -> action (multi-word examples)
+    - keywords: single word -> action
+    """
+    phrases = {}
+    keywords = dict(SYNONYMS)
+
+    for phrase, action in ROUTE_EXAMPLES:
+        phrase = normalize(phrase)
+        if " " in phrase:
+            phrases[phrase] = action
+        else:
+            keywords[phrase] = action
+
+    # Every action key in the flow answers for itself
+    for node in get_flow().values():
+        for action in node.actions:
+            keywords[action] = action
+
+    return phrases, keywords
+
+
+@lru_cache(maxsize=1)
+def _index():
+    return _build_index()
+
+
+def _one_edit_apart(a: str, b: str) -> bool:
+    """True if a and b differ by one insertion, deletion, substitution or swap."""
+    if abs(len(a) - len(b)) > 1 or a == b:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) < len(b):
+        return a[i:] == b[i + 1:]
+    if a[i + 1:] == b[i + 1:]:
+        return True
+    # Neighbouring letters swapped ("yse")
+    return i + 1 < len(a) and a[i] == b[i + 1] and a[i + 1] == b[i] and a[i + 2:] == b[i + 2:]
+
+
+def _doubled_or_swapped(token: str, keyword: str) -> bool:
+    """True if token is keyword with one letter doubled or two neighbouring letters swapped."""
+    if len(token) == len(keyword) + 1:
+        return any(
+            token[i] == token[i - 1] and token[:i] + token[i + 1:] == keyword
+            for i in range(1, len(token))
+        )
+    if len(token) != len(keyword):
+        return False
+    diff = [i for i, (a, b) in enumerate(zip(token, keyword)) if a != b]
+    return (
+        len(diff) == 2 and diff[1] == diff[0] + 1
+        and token[diff[0]] == keyword[diff[1]] and token[diff[1]] == keyword[diff[0]]
+    )
+
+
+def _misspelling(token: str, keyword: str) -> bool:
+    if len(keyword) >= FUZZY_ANY_EDIT_LENGTH:
+        return _one_edit_apart(token, keyword) and not _negated(token, keyword)
+    return _doubled_or_swapped(token, keyword)
+
+
+def _negated(token: str, keyword: str) -> bool:
+    """True if token is keyword behind a negating prefix ("incorrect")."""
+    return any(token.startswith(prefix) and token[len(prefix):].startswith(keyword[:-1])
+               for prefix in NEGATING_PREFIXES)
+
+
+@lru_cache(maxsize=4096)
+def _fuzzy_keyword(token: str):
+    """Returns the action for a token, tolerating one misspelling (see FUZZY_ANY_EDIT_LENGTH)."""
+    _, keywords = _index()
+    if token in keywords:
+        return keywords[token]
+    if len(token) < FUZZY_MIN_LENGTH:
+        return None
+    actions = {action for keyword, action in keywords.items() if _misspelling(token, keyword)}
+    # Close to keywords of different actions: not a safe guess
+    return actions.pop() if len(actions) == 1 else None
+
+
+def classify(user_input: str, allowed_actions):
+    """
+    Maps user input to an action without calling the LLM.
+
+    Input:
+    - user_input: raw text the user said
+    - allowed_actions: actions valid in the current state
+
+    Output:
+    - (confident, action)
+      confident=False means "ask the LLM"
+      action=None with confident=True means "clearly unclear" (e.g. "not sure")
+    """
+    text = normalize(user_input)
+    if not text:
+        return False, None
+
+    phrases, keywords = _index()
+
+    # 1. Whole-utterance match ("no thanks", "not sure", "yes")
+    action = phrases.get(text) or keywords.get(text)
+    if action == NONE:
+        return True, None
+    if action:
+        return (True, action) if action in allowed_actions else (False, None)
+
+    tokens = text.split()
+    if len(tokens) > MAX_TOKENS or NEGATIONS.intersection(tokens):
+        return False, None
+
+    # 2. Known multi-word phrases inside the utterance ("talk to agent now")
+    found = {a for p, a in phrases.items() if f" {p} " in f" {text} "}
+
+    # 3. Remaining words, with fuzzy matching. Every word outside a
+    # matched phrase must be a keyword or a filler: "I have no idea" is
+    # not "no", so anything else is left to the LLM.
+    covered = {word for p in phrases if f" {p} " in f" {text} " for word in p.split()}
+    for token in tokens:
+        if token in covered or (token in FILLERS and len(tokens) > 1):
+            continue
+        action = _fuzzy_keyword(token)
+        if action is None:
+            return False, None
+        found.add(action)
+
+    # Exactly one intent, and it must be valid here
+    if len(found) == 1:
+        action = found.pop()
+        if action == NONE:
+            return True, None
+        if action in allowed_actions:
+            return True, action
+
+    return False, None
+
+
+# ============================================================
+# Per-state statistics
+# ============================================================
+class FastPathStats:
+    """Counts fast-path hits/misses per state and estimates latency saved."""
+
+    def __init__(self):
+        self.states = {}
+
+    def _state(self, state: str) -> dict:
+        if state not in self.states:
+            self.states[state] = {
+                "hits": 0,
+                "misses": 0,
+                "fast_path_seconds": 0.0,
+                "llm_seconds": 0.0,
+            }
+        return self.states[state]
+
+    def record_hit(self, state: str, seconds: float):
+        entry = self._state(state)
+        entry["hits"] += 1
+        entry["fast_path_seconds"] += seconds
+
+    def record_miss(self, state: str, llm_seconds: float):
+        entry = self._state(state)
+        entry["misses"] += 1
+        entry["llm_seconds"] += llm_seconds
+
+    def snapshot(self) -> dict:
+        """Hit rate and estimated latency saved per state (for /health)."""
+        total_misses = sum(e["misses"] for e in self.states.values())
+        total_llm = sum(e["llm_seconds"] for e in self.states.values())
+        avg_llm = total_llm / total_misses if total_misses else 0.0
+
+        report = {}
+        for state, e in self.states.items():
+            calls = e["hits"] + e["misses"]
+            state_avg_llm = e["llm_seconds"] / e["misses"] if e["misses"] else avg_llm
+            saved = e["hits"] * state_avg_llm - e["fast_path_seconds"]
+            report[state] = {
+                "hits": e["hits"],
+                "misses": e["misses"],
+                "hit_rate": round(e["hits"] / calls, 3) if calls else 0.0,
+                "avg_fast_path_us": round(e["fast_path_seconds"] / e["hits"] * 1e6, 1) if e["hits"] else 0.0,
+                "latency_saved_s": round(max(saved, 0.0), 3),
+            }
+        return report
+
+
+FAST_PATH_STATS = FastPathStats()
+
+
+def timed_classify(state: str, user_input: str, allowed_actions):
+    """classify() plus hit accounting. Returns (confident, action)."""
+    if not FAST_PATH_ENABLED:
+        return False, None
+
+    start = time.perf_counter()
+    confident, action = classify(user_input, allowed_actions)
+    if confident:
+        FAST_PATH_STATS.record_hit(state, time.perf_counter() - start)
+    return confident, action
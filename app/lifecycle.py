@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+
+from app.flow import get_flow
+from app.logs import get_logger, log_event, bind_session
+from app.session_store import SESSION_IDLE_TTL
+
+log = get_logger("lifecycle")
+
+# Ended calls stay in the store this long (the client's last request,
+# /reset) before the reaper removes them
+SESSION_ENDED_TTL = float(os.getenv("SESSION_ENDED_TTL", "60"))
+# How often the reaper looks for idle and ended calls
+LIFECYCLE_SWEEP_SECONDS = float(os.getenv("LIFECYCLE_SWEEP_SECONDS", "5"))
+
+STARTED = "started"
+ENDED = "ended"
+HANDED_OFF = "handed_off"
+ABANDONED = "abandoned"
+EVENTS = (STARTED, ENDED, HANDED_OFF, ABANDONED)
+
+# Calls that end in one of these states went to a human agent
+HANDOFF_STATES = frozenset(
+    name for name, node in get_flow().items() if node.action == "transfer_to_agent"
+)
+
+
+# ============================================================
+# Call lifecycle and idle-session reaper
+# ============================================================
+# Every finished turn is recorded here. Events, logged as
+# "call_<event>" for analytics and counted in /health:
+# - started:    first turn of a new session
+# - ended:      the flow finished the call
+# - handed_off: the call ended with a transfer to an agent
+# - abandoned:  no turn for SESSION_IDLE_TTL (the caller hung up
+#               mid-flow), or the session was reset
+#
+# With an in-process store (memory, ephemeral) the calls are also
+# tracked, and the reaper deletes abandoned sessions and ended ones
+# SESSION_ENDED_TTL after their last turn. Each kind has a single TTL,
+# so a dict ordered by last activity always has the next call to
+# expire at the front: recording a turn is O(1) and a sweep stops at
+# the first call still in time, each call being removed once.
+#
+# Shared and token stores are not tracked: another worker may serve
+# the next turn, so one process cannot tell a call was abandoned.
+# Redis expires idle sessions itself; abandoned is not reported there.
+# ============================================================
+
+
+class CallLifecycle:
+    """Lifecycle events of the calls on `store`, and its reaper (see above)."""
+
+    def __init__(self, store, idle_ttl: float = SESSION_IDLE_TTL,
+                 ended_ttl: float = SESSION_ENDED_TTL, clock=time.monotonic):
+        self.store = store
+        self.tracking = store.local
+        self.idle_ttl = idle_ttl
+        self.ended_ttl = ended_ttl
+        self.clock = clock
+        # session_id -> [started_at, last_turn_at, turns], least recently active first
+        self._live = OrderedDict()
+        # session_id -> ended_at, oldest first
+        self._ended = OrderedDict()
+
+        self.events = dict.fromkeys(EVENTS, 0)
+        self.reaped = 0
+        self.sweeps = 0
+        self.sweep_errors = 0
+
+    def _emit(self, event: str, session_id: str, **fields):
+        self.events[event] += 1
+        bind_session(session_id)
+        log_event(log, "call_" + event, **fields)
+
+    def record_turn(self, session_id: str, session: dict, new: bool, was_ended: bool):
+        """
+        Records a finished turn whose session has been stored.
+
+        Input:
+        - new: the call had not been greeted before the turn
+        - was_ended: the call had already ended before the turn
+        """
+        now = self.clock()
+        if new:
+            if self.tracking:
+                self._ended.pop(session_id, None)
+                if self._live.pop(session_id, None) is not None:
+                    # The store lost the old session (evicted) before we reaped it
+                    self._emit(ABANDONED, session_id, reason="replaced")
+            self._emit(STARTED, session_id)
+
+        call = self._live.get(session_id) if self.tracking else None
+        if call is None and self.tracking and not was_ended:
+            call = self._live[session_id] = [now, now, 0]
+        if call is not None:
+            call[1] = now
+            call[2] += 1
+
+        if not session.get("ended"):
+            if call is not None:
+                self._live.move_to_end(session_id)
+            if self.tracking:
+                # A new call on a reset or ended session's id: not to be reaped
+                self._ended.pop(session_id, None)
+            return
+
+        if not was_ended:
+            state = session.get("state")
+            fields = {"state": state}
+            if call is not None:
+                fields["duration_s"] = round(now - call[0], 1)
+                fields["turns"] = call[2]
+            self._emit(HANDED_OFF if state in HANDOFF_STATES else ENDED, session_id, **fields)
+        if self.tracking:
+            self._live.pop(session_id, None)
+            self._ended[session_id] = now
+            self._ended.move_to_end(session_id)
+
+    def reset(self, session_id: str):
+        """
+        The session was reset (/reset): a live call counts as abandoned,
+        and the emptied session is reaped like an ended one.
+        """
+        if not self.tracking:
+            return
+        if self._live.pop(session_id, None) is not None:
+            self._emit(ABANDONED, session_id, reason="reset")
+        self._ended[session_id] = self.clock()
+        self._ended.move_to_end(session_id)
+
+    def expired(self) -> list:
+        """Removes and returns the ids of calls idle or ended for too long."""
+        now = self.clock()
+        expired = []
+        while self._live:
+            session_id, (started_at, last_turn_at, turns) = next(iter(self._live.items()))
+            if last_turn_at + self.idle_ttl > now:
+                break
+            del self._live[session_id]
+            self._emit(ABANDONED, session_id, reason="idle",
+                       duration_s=round(last_turn_at - started_at, 1), turns=turns)
+            expired.append(session_id)
+        while self._ended:
+            session_id, ended_at = next(iter(self._ended.items()))
+            if ended_at + self.ended_ttl > now:
+                break
+            del self._ended[session_id]
+            expired.append(session_id)
+        return expired
+
+    async def sweep(self):
+        """Deletes the expired calls' sessions from the store."""
+        self.sweeps += 1
+        for session_id in self.expired():
+            self.reaped += await self.store.delete(session_id)
+
+    async def run_reaper(self, interval: float = LIFECYCLE_SWEEP_SECONDS):
+        """Sweeps every `interval` seconds. Runs until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                self.sweep_errors += 1
+                log_event(log, "session_sweep_failed", level=logging.ERROR, error=str(e))
+
+    def live_calls(self) -> int:
+        return len(self._live)
+
+    def stats(self) -> dict:
+        return {
+            "tracking": self.tracking,
+            "live": len(self._live),
+            "ended_pending_reap": len(self._ended),
+            "events": dict(self.events),
+            "reaped": self.reaped,
+            "sweeps": self.sweeps,
+            "sweep_errors": self.sweep_errors,
+        }
@@ -0,0 +1,247 @@
+import asyncio
+import os
+import time
+from collections import deque
+from contextvars import ContextVar
+
+from app.llm_guard import LLM_GUARD, LLMUnavailable
+from app.tracing import span
+
+# ============================================================
+# Per-turn latency budget and hedged LLM calls
+# ============================================================
+# Every turn gets a deadline (TURN_BUDGET_SECONDS from its start).
+# LLM calls made during the turn:
+# - never run past the deadline; they raise LLMDeadlineExceeded and
+#   the caller degrades (re-prompt, static text).
+#   Failed calls and calls rejected by the circuit breaker (see
+#   llm_guard) raise LLMUnavailable and degrade the same way
+# - send one duplicate ("hedge") request when the first has not
+#   answered within the recent p95 latency, keep whichever answers
+#   first and cancel the other
+#
+# Calls outside a turn (e.g. the goodbye pool refresher) have no
+# deadline and are only bounded by LLM_TIMEOUT_SECONDS.
+# ============================================================
+
+TURN_BUDGET_SECONDS = float(os.getenv("TURN_BUDGET_SECONDS", "1.8"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "10"))
+
+LLM_HEDGE = os.getenv("LLM_HEDGE", "1") != "0"
+# At most this fraction of calls may send a hedge
+LLM_HEDGE_MAX_RATE = float(os.getenv("LLM_HEDGE_MAX_RATE", "0.2"))
+# Hedge delay until enough latencies have been seen
+LLM_HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "0.8"))
+LLM_HEDGE_MIN_DELAY = 0.05
+LATENCY_WINDOW = 200
+LATENCY_MIN_SAMPLES = 20
+
+# Monotonic time at which the current turn must have answered
+turn_deadline: ContextVar = ContextVar("turn_deadline", default=None)
+
+
+class LLMDeadlineExceeded(LLMUnavailable, TimeoutError):
+    """The turn's latency budget ran out before the LLM answered."""
+
+
+def time_left():
+    """Seconds left in the current turn, or None outside a turn."""
+    deadline = turn_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+class LatencyTracker:
+    """Recent successful call latencies of one kind of LLM call."""
+
+    def __init__(self, size: int = LATENCY_WINDOW):
+        self.samples = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def p95(self):
+        if len(self.samples) < LATENCY_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def hedge_delay(self) -> float:
+        p95 = self.p95()
+        return LLM_HEDGE_DEFAULT_DELAY if p95 is None else max(p95, LLM_HEDGE_MIN_DELAY)
+
+
+class BudgetStats:
+    """Counters for /health."""
+
+    def __init__(self):
+        self.latency = {}  # kind -> LatencyTracker
+        self.turns = 0
+        self.turns_over_budget = 0
+        self.turn_seconds = 0.0
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.timeouts = 0
+        self.degraded = {}  # how -> count
+
+    def tracker(self, kind: str) -> LatencyTracker:
+        tracker = self.latency.get(kind)
+        if tracker is None:
+            tracker = self.latency[kind] = LatencyTracker()
+        return tracker
+
+    def may_hedge(self) -> bool:
+        return LLM_HEDGE and self.hedged < LLM_HEDGE_MAX_RATE * self.calls
+
+    def record_turn(self, seconds: float):
+        self.turns += 1
+        self.turn_seconds += seconds
+        if seconds > TURN_BUDGET_SECONDS:
+            self.turns_over_budget += 1
+
+    def record_degraded(self, how: str):
+        self.degraded[how] = self.degraded.get(how, 0) + 1
+
+    def snapshot(self) -> dict:
+        def ms(seconds):
+            return None if seconds is None else round(seconds * 1000, 1)
+
+        return {
+            "turn_budget_ms": ms(TURN_BUDGET_SECONDS),
+            "turns": self.turns,
+            "turns_over_budget": self.turns_over_budget,
+            "avg_turn_ms": ms(self.turn_seconds / self.turns) if self.turns else 0.0,
+            "llm_calls": self.calls,
+            "llm_timeouts": self.timeouts,
+            "hedged": self.hedged,
+            "hedge_rate": round(self.hedged / self.calls, 3) if self.calls else 0.0,
+            "hedge_wins": self.hedge_wins,
+            "degraded": dict(self.degraded),
+            "p95_ms": {kind: ms(t.p95()) for kind, t in self.latency.items()},
+            "hedge_delay_ms": {kind: ms(t.hedge_delay()) for kind, t in self.latency.items()},
+        }
+
+
+BUDGET_STATS = BudgetStats()
+
+
+def start_turn():
+    """Starts the current turn's budget. Returns the token for end_turn."""
+    return turn_deadline.set(time.monotonic() + TURN_BUDGET_SECONDS)
+
+
+def end_turn(token, started: float):
+    turn_deadline.reset(token)
+    BUDGET_STATS.record_turn(time.monotonic() - started)
+
+
+async def wait_within_budget(awaitable):
+    """Awaits `awaitable`, giving up (LLMDeadlineExceeded) when the turn's budget runs out."""
+    left = time_left()
+    if left is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, timeout=max(left, 0))
+    except asyncio.TimeoutError:
+        BUDGET_STATS.timeouts += 1
+        raise LLMDeadlineExceeded("turn budget exhausted") from None
+
+
+def _retrieve_exception(task: asyncio.Task):
+    if not task.cancelled():
+        task.exception()
+
+
+async def hedged(kind: str, attempt, discard=None):
+    """
+    Runs attempt() with a hedge, within the turn's budget. Every
+    attempt goes through LLM_GUARD (circuit breaker + concurrency limit).
+
+    Input:
+    - kind: latency class ("route", "text", ...) for the p95 delay
+    - attempt: zero-argument coroutine function making ONE request
+    - discard: called with the result of a finished losing attempt
+      (e.g. to close a stream)
+
+    Output:
+    - the first successful result
+    - raises LLMDeadlineExceeded when the budget runs out, CircuitOpen
+      while the breaker is open, or LLMUnavailable (from the last
+      error) when every attempt failed
+    """
+    LLM_GUARD.check()
+    left = time_left()
+    timeout = LLM_TIMEOUT_SECONDS if left is None else min(left, LLM_TIMEOUT_SECONDS)
+    if timeout <= 0:
+        BUDGET_STATS.timeouts += 1
+        raise LLMDeadlineExceeded("turn budget exhausted")
+
+    tracker = BUDGET_STATS.tracker(kind)
+
+    async def timed_attempt():
+        start = time.monotonic()
+        with span("llm." + kind):
+            result = await LLM_GUARD.call(attempt)
+        tracker.add(time.monotonic() - start)
+        return result
+
+    start = time.monotonic()
+    end = start + timeout
+    hedge_at = start + tracker.hedge_delay()
+    BUDGET_STATS.calls += 1
+
+    tasks = [asyncio.ensure_future(timed_attempt())]
+    tasks[0].add_done_callback(_retrieve_exception)
+    winner = None
+    error = None
+
+    try:
+        while winner is None:
+            now = time.monotonic()
+            if now >= end:
+                break
+
+            # A hedge only adds load once the LLM is failing or at its limit
+            can_hedge = (
+                len(tasks) == 1 and BUDGET_STATS.may_hedge()
+                and not isinstance(error, LLMUnavailable) and not LLM_GUARD.limiter.saturated()
+            )
+            active = [t for t in tasks if not t.done()]
+
+            # Hedge when the first attempt is slow, or has already failed
+            if can_hedge and (now >= hedge_at or not active):
+                BUDGET_STATS.hedged += 1
+                hedge = asyncio.ensure_future(timed_attempt())
+                hedge.add_done_callback(_retrieve_exception)
+                tasks.append(hedge)
+                continue
+            if not active:
+                break
+
+            wake = min(end, hedge_at) if can_hedge else end
+            done, _ = await asyncio.wait(active, timeout=wake - now, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    winner = task
+                    break
+                error = task.exception()
+    finally:
+        for task in tasks:
+            if task is winner:
+                continue
+            if not task.done():
+                task.cancel()
+            elif discard is not None and not task.cancelled() and task.exception() is None:
+                discard(task.result())
+
+    if winner is not None:
+        if winner is not tasks[0]:
+            BUDGET_STATS.hedge_wins += 1
+        return winner.result()
+
+    if error is not None and time.monotonic() < end:
+        if isinstance(error, LLMUnavailable):
+            raise error
+        raise LLMUnavailable(f"LLM call failed: {error!r}") from error
+    BUDGET_STATS.timeouts += 1
+    raise LLMDeadlineExceeded(f"no LLM answer within {timeout:.2f}s")
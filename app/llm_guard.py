@@ -0,0 +1,308 @@
+import asyncio
+import os
+import time
+from collections import deque
+
+# ============================================================
+# Circuit breaker and adaptive concurrency limit for the LLM
+# ============================================================
+# Every LLM request passes through LLM_GUARD:
+#
+# - CircuitBreaker: when at least LLM_BREAKER_FAILURE_RATE of the last
+#   LLM_BREAKER_WINDOW requests failed (throttling, 5xx, timeouts,
+#   connection errors) the breaker opens and calls are rejected at once
+#   for LLM_BREAKER_COOLDOWN seconds, so turns degrade immediately
+#   instead of waiting to fail. Then a single trial request is let
+#   through (half-open); success closes the breaker, failure opens it
+#   again. Each request carries the ticket allow() gave it: only the
+#   trial's outcome moves a half-open breaker, and requests sent before
+#   the breaker last changed state are not counted at all.
+#
+# - AIMDLimiter: caps in-flight requests. The limit grows by about one
+#   per limit's worth of successes (additive increase) and is halved
+#   on throttling or timeouts (multiplicative decrease; plain 5xx
+#   errors say nothing about capacity and leave it alone), so it tracks
+#   what the deployment can currently take. Requests over the limit
+#   wait for a slot (within the turn's budget); once as many are
+#   waiting as the limit allows in flight, new ones are shed at once.
+#
+# Occasional 429s while the limit adapts stay well under the failure
+# rate; the breaker is for the deployment being down.
+# ============================================================
+
+LLM_BREAKER_FAILURE_RATE = float(os.getenv("LLM_BREAKER_FAILURE_RATE", "0.5"))
+LLM_BREAKER_WINDOW = int(os.getenv("LLM_BREAKER_WINDOW", "20"))
+# Outcomes needed in the window before the breaker may open
+LLM_BREAKER_MIN_CALLS = 5
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "10"))
+
+LLM_LIMIT_INITIAL = int(os.getenv("LLM_LIMIT_INITIAL", "20"))
+LLM_LIMIT_MIN = int(os.getenv("LLM_LIMIT_MIN", "1"))
+LLM_LIMIT_MAX = int(os.getenv("LLM_LIMIT_MAX", os.getenv("LLM_MAX_CONNECTIONS", "200")))
+LLM_LIMIT_BACKOFF = 0.5
+# Decrease at most once per this many seconds: one overload event
+# fails many in-flight requests at once
+LLM_LIMIT_DECREASE_INTERVAL = 0.5
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class LLMUnavailable(Exception):
+    """No LLM answer for this request; the caller degrades instead."""
+
+
+class CircuitOpen(LLMUnavailable):
+    """The LLM breaker is open; the request was not sent."""
+
+
+class LimitExceeded(LLMUnavailable):
+    """Too many LLM requests already waiting for the concurrency limit."""
+
+
+def is_overload(error: BaseException) -> bool:
+    """Throttling (429) or a timeout: the deployment wants less concurrency."""
+    if isinstance(error, TimeoutError) or type(error).__name__ == "APITimeoutError":
+        return True
+    return getattr(error, "status_code", None) == 429
+
+
+def is_failure(error: BaseException) -> bool:
+    """Overload, server errors and connection failures: counts against the breaker."""
+    if is_overload(error) or isinstance(error, ConnectionError):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status >= 500
+    # openai.APIConnectionError carries no status code
+    return type(error).__name__ == "APIConnectionError"
+
+
+class CircuitBreaker:
+    def __init__(self, failure_rate: float = LLM_BREAKER_FAILURE_RATE, window: int = LLM_BREAKER_WINDOW,
+                 cooldown: float = LLM_BREAKER_COOLDOWN, clock=time.monotonic):
+        self.failure_rate = failure_rate
+        self.cooldown = cooldown
+        self.clock = clock
+        self.state = CLOSED
+        self.outcomes = deque(maxlen=window)  # True = failure
+        self.opened_at = 0.0
+        self._trial_running = False
+        # Bumped on every change of state; tickets of an older epoch are stale
+        self._epoch = 0
+
+        self.opened = 0
+        self.rejected = 0
+
+    def rejecting(self) -> bool:
+        """Whether allow() would refuse a request now (without taking the trial)."""
+        if self.state == CLOSED:
+            return False
+        if self.state == OPEN and self.clock() - self.opened_at < self.cooldown:
+            return True
+        return self._trial_running
+
+    def allow(self):
+        """
+        Ticket for a request that may be sent now, None if it may not.
+
+        May move OPEN -> HALF_OPEN and hand out the trial. The ticket,
+        (epoch, is_trial), goes back with the request's outcome to
+        record_success / record_failure / record_neutral.
+        """
+        if self.state == CLOSED:
+            return self._epoch, False
+        if self.state == OPEN and self.clock() - self.opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+            self._epoch += 1
+        if self.state == HALF_OPEN and not self._trial_running:
+            self._trial_running = True
+            return self._epoch, True
+        self.rejected += 1
+        return None
+
+    def failure_ratio(self) -> float:
+        return sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+
+    def record_success(self, ticket):
+        epoch, trial = ticket
+        if epoch != self._epoch:
+            return
+        if trial:
+            self._trial_running = False
+            self.state = CLOSED
+            self._epoch += 1
+            self.outcomes.clear()
+        self.outcomes.append(False)
+
+    def record_failure(self, ticket):
+        epoch, trial = ticket
+        if epoch != self._epoch:
+            return
+        self.outcomes.append(True)
+        if trial:
+            self._trial_running = False
+            self._open()
+        elif len(self.outcomes) >= LLM_BREAKER_MIN_CALLS and self.failure_ratio() >= self.failure_rate:
+            self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self._epoch += 1
+        self.opened_at = self.clock()
+        self.opened += 1
+
+    def record_neutral(self, ticket):
+        """The request was cancelled before it said anything about the LLM."""
+        if ticket == (self._epoch, True):
+            # The trial did not tell: the next request may try again
+            self._trial_running = False
+
+    def stats(self) -> dict:
+        retry_in = 0.0
+        if self.state == OPEN:
+            retry_in = max(0.0, self.cooldown - (self.clock() - self.opened_at))
+        return {
+            "state": self.state,
+            "failure_ratio": round(self.failure_ratio(), 3),
+            "times_opened": self.opened,
+            "rejected": self.rejected,
+            "retry_in_s": round(retry_in, 2),
+        }
+
+
+class AIMDLimiter:
+    def __init__(self, initial: int = LLM_LIMIT_INITIAL, min_limit: int = LLM_LIMIT_MIN,
+                 max_limit: int = LLM_LIMIT_MAX, clock=time.monotonic):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.clock = clock
+        self.in_flight = 0
+        self._waiters = deque()
+        self._last_decrease = float("-inf")
+
+        self.peak_in_flight = 0
+        self.decreases = 0
+        self.waited = 0
+        self.shed = 0
+
+    def saturated(self) -> bool:
+        return self.in_flight >= int(self.limit)
+
+    async def acquire(self):
+        if self.saturated() or self._waiters:
+            if len(self._waiters) >= int(self.limit):
+                self.shed += 1
+                raise LimitExceeded("LLM concurrency limit reached")
+            self.waited += 1
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # Woken (holding a slot) and cancelled at once: pass the slot on
+                    self.in_flight -= 1
+                    self._wake()
+                raise
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+            # _wake took the slot for us
+            return
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def release(self, outcome: str):
+        """outcome: "success", "overload", "failure" or "neutral"."""
+        self.in_flight -= 1
+        if outcome == "success":
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        elif outcome == "overload":
+            now = self.clock()
+            if now - self._last_decrease >= LLM_LIMIT_DECREASE_INTERVAL:
+                self._last_decrease = now
+                self.limit = max(self.min_limit, self.limit * LLM_LIMIT_BACKOFF)
+                self.decreases += 1
+        self._wake()
+
+    def _wake(self):
+        """
+        Hands free slots to the oldest waiters. The slot is taken here,
+        not when the waiter resumes, so a new acquire() in between
+        cannot take it as well.
+        """
+        for waiter in list(self._waiters):
+            if self.saturated():
+                break
+            if not waiter.done():
+                waiter.set_result(None)
+                self.in_flight += 1
+                self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            self._waiters.remove(waiter)
+
+    def stats(self) -> dict:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "peak_in_flight": self.peak_in_flight,
+            "decreases": self.decreases,
+            "waited": self.waited,
+            "shed": self.shed,
+        }
+
+
+class LLMGuard:
+    """Breaker + limiter around single LLM requests."""
+
+    def __init__(self):
+        self.breaker = CircuitBreaker()
+        self.limiter = AIMDLimiter()
+
+    def check(self):
+        """Fails fast (CircuitOpen) while the breaker is open."""
+        if self.breaker.rejecting():
+            self.breaker.rejected += 1
+            raise CircuitOpen("LLM circuit breaker is open")
+
+    async def call(self, attempt):
+        """Runs attempt() under the breaker and the concurrency limit."""
+        ticket = self.breaker.allow()
+        if ticket is None:
+            raise CircuitOpen("LLM circuit breaker is open")
+
+        outcome = "neutral"
+        try:
+            await self.limiter.acquire()
+        except BaseException:
+            self.breaker.record_neutral(ticket)
+            raise
+        try:
+            result = await attempt()
+            outcome = "success"
+            return result
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if is_overload(e):
+                outcome = "overload"
+            elif is_failure(e):
+                outcome = "failure"
+            raise
+        finally:
+            self.limiter.release(outcome)
+            if outcome == "success":
+                self.breaker.record_success(ticket)
+            elif outcome in ("overload", "failure"):
+                self.breaker.record_failure(ticket)
+            else:
+                self.breaker.record_neutral(ticket)
+
+    def stats(self) -> dict:
+        return {"breaker": self.breaker.stats(), "limiter": self.limiter.stats()}
+
+
+LLM_GUARD = LLMGuard()
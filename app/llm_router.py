@@ -1,75 +1,393 @@
+import asyncio
+import json
 import os
-from openai import AzureOpenAI
-from dotenv import load_dotenv
+from functools import lru_cache
 
-load_dotenv('Tesco_Azure.env')
+from app.llm_budget import LLM_TIMEOUT_SECONDS, hedged, LLMDeadlineExceeded, BUDGET_STATS
+from app.prompt_tokens import TOKEN_STATS, answer_budget
+from app.streaming import token_sink
 
 # -----------------------------------
 # Azure OpenAI client configuration
 # -----------------------------------
-client = AzureOpenAI(
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    api_version=os.getenv("AZURE_OPENAI_API_VERSION")
+# One async client (and one httpx connection pool) shared by every
+# request in the process, so concurrent calls reuse keep-alive
+# connections instead of tying up a threadpool worker each.
+#
+# The client, the openai/httpx stack and the Azure env file are only
+# loaded on the first LLM call, so importing the app stays fast and
+# works without credentials.
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "200"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "50"))
+# The SDK's own retries (with backoff) would hide throttling from the
+# circuit breaker and spend the turn's budget; hedging does the retrying
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "0"))
+AZURE_ENV_FILE = os.getenv("AZURE_ENV_FILE", "Tesco_Azure.env")
+# "azure", or "stub" / "cache" for deterministic offline runs such as
+# transcript replay (see app/llm_stub.py)
+LLM_CLIENT = os.getenv("LLM_CLIENT", "azure")
+
+
+@lru_cache(maxsize=1)
+def load_env():
+    """Loads the Azure settings from AZURE_ENV_FILE (existing variables win)."""
+    from dotenv import load_dotenv
+    load_dotenv(AZURE_ENV_FILE)
+
+
+@lru_cache(maxsize=1)
+def get_client():
+    """The shared client selected by LLM_CLIENT, created on first use."""
+    if LLM_CLIENT == "azure":
+        return _azure_client()
+    from app.llm_stub import StubLLMClient, CachedLLMClient
+    if LLM_CLIENT == "stub":
+        return StubLLMClient()
+    if LLM_CLIENT == "cache":
+        return CachedLLMClient(_azure_client())
+    raise ValueError(f"Unknown LLM_CLIENT: {LLM_CLIENT!r}")
+
+
+def _azure_client():
+    """An AsyncAzureOpenAI client with its own connection pool."""
+    import httpx
+    from openai import AsyncAzureOpenAI, DefaultAsyncHttpxClient
+
+    load_env()
+    return AsyncAzureOpenAI(
+        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+        api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
+        timeout=LLM_TIMEOUT_SECONDS,
+        max_retries=LLM_MAX_RETRIES,
+        http_client=DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE,
+            )
+        ),
+    )
+
+
+@lru_cache(maxsize=1)
+def deployment_name():
+    """AZURE_OPENAI_CHAT_DEPLOYMENT, read once the env file is loaded."""
+    load_env()
+    return os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT")
+
+
+def __getattr__(name):
+    # Old module attributes, now created on first access
+    if name == "client":
+        return get_client()
+    if name == "CHAT_DEPLOYMENT_NAME":
+        return deployment_name()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# "azure" routes intents with the chat deployment, "local" with the
+# offline n-gram model in app/local_intent_router.py
+INTENT_ROUTER = os.getenv("INTENT_ROUTER", "azure")
+
+# -----------------------------------
+# Intent routing examples
+# -----------------------------------
+# (phrase, action) pairs shown to the LLM; also used by the local
+# fast-path classifier in app/intent_classifier.py
+ROUTE_EXAMPLES = [
+    ("give another number", "retry"),
+    ("try again", "retry"),
+    ("different number", "retry"),
+    ("retry with another number", "retry"),
+    ("talk to agent", "agent"),
+    ("speak to human", "agent"),
+    ("agent please", "agent"),
+    ("handoff", "agent"),
+    ("connect me to someone", "agent"),
+    ("yes", "yes"),
+    ("yeah", "yes"),
+    ("sure", "yes"),
+    ("ok", "yes"),
+    ("yes please", "yes"),
+    ("no", "no"),
+    ("nah", "no"),
+    ("no thanks", "no"),
+    ("I don't know", "none"),
+    ("not sure", "none"),
+]
+
+ROUTE_EXAMPLES_TEXT = "\n".join(
+    f"- '{phrase}' → {action}" + (" (unclear intent)" if action == "none" else "")
+    for phrase, action in ROUTE_EXAMPLES
 )
 
-CHAT_DEPLOYMENT_NAME = os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT")
 
+# -----------------------------------
+# Prompt templates
+# -----------------------------------
+# Built once at import. Each request starts with its static system
+# prompt, byte for byte the same on every call; only the user message
+# carries per-call text, with the per-state part (allowed actions)
+# ahead of the caller's words. That keeps the longest possible prefix
+# identical for the provider's prompt cache (single and batch routing
+# also share ROUTE_PREFIX).
+ROUTE_PREFIX = (
+    "You are a banking assistant routing user intent. "
+    "Be flexible with variations.\n\n"
+    "Examples:\n"
+    f"{ROUTE_EXAMPLES_TEXT}\n\n"
+)
+
+ROUTE_SYSTEM_PROMPT = ROUTE_PREFIX + (
+    "Map the user's input to ONE allowed action. "
+    "Respond ONLY with the action name (lowercase) or 'none'."
+)
+
+ROUTE_USER_TEMPLATE = "Allowed actions: {actions}\nUser input: {user_input}"
+
+ROUTE_BATCH_SYSTEM_PROMPT = ROUTE_PREFIX + (
+    "Map each user input to ONE of its allowed actions. "
+    "You receive one JSON object per line with an id, the user input "
+    "and its allowed actions. Respond ONLY with a JSON array holding "
+    "one action name (lowercase) or 'none' per line, in id order."
+)
+
+ROUTE_BATCH_USER_TEMPLATE = "Inputs:\n{lines}"
+
+FALLBACK_SYSTEM_PROMPT = (
+    "You are a helpful banking assistant for loan status inquiries. "
+    "The user has said something that doesn't match what you asked for. "
+    "Your job is to:\n"
+    "1. Politely acknowledge what they said (if it makes sense)\n"
+    "2. Redirect them back to providing their phone number\n"
+    "3. Keep it brief (1-2 sentences max)\n"
+    "4. Be warm and helpful\n\n"
+    "Examples:\n"
+    "User: 'What's the weather?'\n"
+    "Response: 'I can't help with weather information, but I can check your loan status if you share your registered phone number.'\n\n"
+    "User: 'hello'\n"
+    "Response: 'Hello! I can help you check your loan status. Please share your registered phone number to continue.'\n\n"
+    "User: 'abc123'\n"
+    "Response: 'That doesn't look like a valid phone number. Please enter your registered phone number (digits only).'"
+)
+
+FALLBACK_USER_TEMPLATE = (
+    "Current context: Asking for phone number to check loan status\n"
+    "Generate a brief, helpful redirect message.\n"
+    "User said: {user_input}"
+)
+
+GOODBYE_SYSTEM_PROMPT = (
+    "You are a helpful banking assistant. "
+    "The user just checked their loan status and declined an SMS update. "
+    "Generate a brief, warm goodbye message (1-2 sentences). "
+    "Be professional but friendly.\n\n"
+    "Examples:\n"
+    "- 'Thank you for checking your loan status. If you have any questions, feel free to reach out anytime!'\n"
+    "- 'Alright! Your application is progressing well. Have a great day!'\n"
+    "- 'Perfect! We'll keep you updated. Take care!'"
+)
+
+GOODBYE_USER_TEMPLATE = (
+    "Generate a brief goodbye message.\n"
+    "Context: User's loan is {loan_status}. They declined SMS."
+)
+
+GOODBYE_AFTER_SMS_SYSTEM_PROMPT = (
+    "You are a helpful banking assistant. "
+    "You just sent an SMS with the user's loan status. "
+    "Generate a brief, friendly closing message (1-2 sentences). "
+    "Thank them and wish them well.\n\n"
+    "Examples:\n"
+    "- 'Perfect! I've sent the details to your phone. Have a wonderful day!'\n"
+    "- 'All set! You should receive the SMS shortly. Thanks for using our service!'\n"
+    "- 'Done! Check your phone for the update. Take care!'"
+)
+
+GOODBYE_AFTER_SMS_USER_PROMPT = "Generate a brief goodbye after sending SMS."
+
+# Output budgets of the free-text replies
+FALLBACK_MAX_TOKENS = 100
+GOODBYE_MAX_TOKENS = 80
+
+
+# Batch input lines without the default ", " / ": " padding
+_COMPACT_JSON = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def _messages(system: str, user: str) -> list:
+    return [{"role": "system", "content": system}, {"role": "user", "content": user}]
+
+
+def route_messages(user_input: str, allowed_actions) -> list:
+    return _messages(
+        ROUTE_SYSTEM_PROMPT,
+        ROUTE_USER_TEMPLATE.format(actions=", ".join(allowed_actions), user_input=user_input),
+    )
 
-def llm_route(user_input: str, allowed_actions: list[str]):
+
+def route_batch_messages(requests) -> list:
+    lines = "\n".join(
+        _COMPACT_JSON.encode({"id": i, "input": user_input, "allowed": list(allowed_actions)})
+        for i, (user_input, allowed_actions) in enumerate(requests)
+    )
+    return _messages(ROUTE_BATCH_SYSTEM_PROMPT, ROUTE_BATCH_USER_TEMPLATE.format(lines=lines))
+
+
+def route_max_tokens(allowed_actions) -> int:
+    """Output budget of a route answer: the longest allowed action or 'none'."""
+    return answer_budget(["none", *allowed_actions])
+
+
+def route_batch_max_tokens(requests) -> int:
+    """Output budget of a JSON array holding one route answer per request."""
+    # Each answer also needs its quotes and a separator; 2 for the brackets
+    return 2 + sum(route_max_tokens(allowed_actions) + 3 for _, allowed_actions in requests)
+
+
+async def _create(kind: str, prompt: str = None, **kwargs):
+    """
+    One chat completion, hedged and bounded by the turn's budget (see
+    app/llm_budget.py). Its tokens are counted under `prompt` (default:
+    the call kind).
+    """
+    prompt = prompt or kind
+    TOKEN_STATS.record_request(prompt, kwargs["messages"], kwargs.get("max_tokens"))
+    response = await hedged(kind, lambda: get_client().chat.completions.create(**kwargs))
+    TOKEN_STATS.record_usage(prompt, getattr(response, "usage", None))
+    return response
+
+def _delta_text(chunk) -> str:
+    if not chunk.choices:
+        return ""
+    return chunk.choices[0].delta.content or ""
+
+
+async def _open_stream(**kwargs):
+    """Starts a streamed completion and waits for its first text delta."""
+    stream = await get_client().chat.completions.create(stream=True, **kwargs)
+    try:
+        chunks = stream.__aiter__()
+        async for chunk in chunks:
+            delta = _delta_text(chunk)
+            if delta:
+                return stream, chunks, delta
+        return stream, chunks, ""
+    except BaseException:
+        # Cancelled (a hedge loser, the turn's deadline) or failed before
+        # the first delta: nobody else holds the stream to close it
+        _close_stream((stream,))
+        raise
+
+
+def _close_stream(opened):
+    asyncio.ensure_future(opened[0].close())
+
+
+async def _complete_text(prompt: str, **kwargs) -> str:
+    """
+    Runs a free-text chat completion and returns the stripped text.
+
+    When a streaming request is active (token_sink is set), the
+    completion is streamed and each delta is forwarded as it arrives.
+    The turn's budget (and the hedge) covers the wait for the first
+    delta; once the caller is hearing the reply it is allowed to finish.
+    """
+    sink = token_sink.get()
+    if sink is None:
+        response = await _create("text", prompt, **kwargs)
+        return response.choices[0].message.content.strip()
+
+    TOKEN_STATS.record_request(prompt, kwargs["messages"], kwargs.get("max_tokens"))
+    stream, chunks, delta = await hedged(
+        "stream_first_token", lambda: _open_stream(**kwargs), discard=_close_stream
+    )
+    text = ""
+    try:
+        async with asyncio.timeout(LLM_TIMEOUT_SECONDS):
+            while True:
+                if not text:
+                    delta = delta.lstrip()
+                if delta:
+                    text += delta
+                    sink(delta)
+                chunk = await anext(chunks, None)
+                if chunk is None:
+                    break
+                delta = _delta_text(chunk)
+    except TimeoutError:
+        BUDGET_STATS.timeouts += 1
+        if not text.strip():
+            raise LLMDeadlineExceeded("stream stalled") from None
+    finally:
+        # Also when the reader is cancelled or the sink raises
+        await stream.close()
+    return text.strip()
+
+
+@lru_cache(maxsize=1)
+def get_local_router():
+    """The local intent router, built from the routing examples on first use."""
+    from app.local_intent_router import LocalIntentRouter, EXEMPLARS
+    return LocalIntentRouter(ROUTE_EXAMPLES + EXEMPLARS)
+
+
+async def llm_route(user_input: str, allowed_actions):
     """
-    Maps free-text user input to ONE allowed action using Azure OpenAI.
+    Maps free-text user input to ONE allowed action using Azure OpenAI
+    (or the local router when INTENT_ROUTER=local).
     Returns the action string or None.
     """
 
-    response = client.chat.completions.create(
-        model=CHAT_DEPLOYMENT_NAME,
-        messages=[
-            {
-                "role": "system",
-                "content": (
-                    "You are a banking assistant routing user intent. "
-                    "Map the user's input to ONE allowed action. "
-                    "Be flexible with variations.\n\n"
-                    "Examples:\n"
-                    "- 'give another number' → retry\n"
-                    "- 'try again' → retry\n"
-                    "- 'different number' → retry\n"
-                    "- 'retry with another number' → retry\n"
-                    "- 'talk to agent' → agent\n"
-                    "- 'speak to human' → agent\n"
-                    "- 'agent please' → agent\n"
-                    "- 'handoff' → agent\n"
-                    "- 'connect me to someone' → agent\n"
-                    "- 'yes' → yes\n"
-                    "- 'yeah' → yes\n"
-                    "- 'sure' → yes\n"
-                    "- 'ok' → yes\n"
-                    "- 'yes please' → yes\n"
-                    "- 'no' → no\n"
-                    "- 'nah' → no\n"
-                    "- 'no thanks' → no\n"
-                    "- 'I don't know' → none (unclear intent)\n"
-                    "- 'not sure' → none (unclear intent)\n\n"
-                    "Respond ONLY with the action name (lowercase) or 'none'."
-                )
-            },
-            {
-                "role": "user",
-                "content": f"""
-User input: {user_input}
-Allowed actions: {allowed_actions}
-"""
-            }
-        ],
-        temperature=0
+    if INTENT_ROUTER == "local":
+        return get_local_router().route(user_input, allowed_actions)
+
+    response = await _create(
+        "route",
+        model=deployment_name(),
+        messages=route_messages(user_input, allowed_actions),
+        temperature=0,
+        max_tokens=route_max_tokens(allowed_actions),
     )
 
     action = response.choices[0].message.content.strip().lower()
     return action if action in allowed_actions else None
 
 
-def llm_fallback(user_input: str, session: dict):
+async def llm_route_batch(requests):
+    """
+    Routes several utterances with ONE completion.
+
+    Input:
+    - requests: list of (user_input, allowed_actions) pairs
+
+    Output:
+    - list of action strings or None, in the same order
+    - raises ValueError if the reply is not one answer per utterance
+    """
+
+    if INTENT_ROUTER == "local":
+        return get_local_router().route_batch(requests)
+
+    response = await _create(
+        "route_batch",
+        model=deployment_name(),
+        messages=route_batch_messages(requests),
+        temperature=0,
+        max_tokens=route_batch_max_tokens(requests),
+    )
+
+    answers = json.loads(response.choices[0].message.content.strip())
+    if not isinstance(answers, list) or len(answers) != len(requests):
+        raise ValueError(f"Expected {len(requests)} routing answers, got {answers!r}")
+
+    actions = []
+    for answer, (_, allowed_actions) in zip(answers, requests):
+        action = str(answer).strip().lower()
+        actions.append(action if action in allowed_actions else None)
+    return actions
+
+
+async def llm_fallback(user_input: str, session: dict):
     """
     Intelligent fallback using LLM to handle off-topic or invalid inputs.
     Redirects user back to the loan status flow gracefully.
@@ -82,49 +400,16 @@ def llm_fallback(user_input: str, session: dict):
     - A helpful response that redirects to phone number collection
     """
     
-    # Get current state context
-    current_state = session.get("state", "start")
-    
-    response = client.chat.completions.create(
-        model=CHAT_DEPLOYMENT_NAME,
-        messages=[
-            {
-                "role": "system",
-                "content": (
-                    "You are a helpful banking assistant for loan status inquiries. "
-                    "The user has said something that doesn't match what you asked for. "
-                    "Your job is to:\n"
-                    "1. Politely acknowledge what they said (if it makes sense)\n"
-                    "2. Redirect them back to providing their phone number\n"
-                    "3. Keep it brief (1-2 sentences max)\n"
-                    "4. Be warm and helpful\n\n"
-                    "Examples:\n"
-                    "User: 'What's the weather?'\n"
-                    "Response: 'I can't help with weather information, but I can check your loan status if you share your registered phone number.'\n\n"
-                    "User: 'hello'\n"
-                    "Response: 'Hello! I can help you check your loan status. Please share your registered phone number to continue.'\n\n"
-                    "User: 'abc123'\n"
-                    "Response: 'That doesn't look like a valid phone number. Please enter your registered phone number (digits only).'"
-                )
-            },
-            {
-                "role": "user",
-                "content": f"""
-User said: {user_input}
-Current context: Asking for phone number to check loan status
-
-Generate a brief, helpful redirect message.
-"""
-            }
-        ],
+    return await _complete_text(
+        "fallback",
+        model=deployment_name(),
+        messages=_messages(FALLBACK_SYSTEM_PROMPT, FALLBACK_USER_TEMPLATE.format(user_input=user_input)),
         temperature=0.7,
-        max_tokens=100
+        max_tokens=FALLBACK_MAX_TOKENS,
     )
 
-    return response.choices[0].message.content.strip()
-
 
-def llm_generate_goodbye(session: dict):
+async def llm_generate_goodbye(session: dict):
     """
     Generate a personalized goodbye message when user declines SMS.
     
@@ -137,39 +422,16 @@ def llm_generate_goodbye(session: dict):
     
     loan_status = session.get("loan_status", "")
     
-    response = client.chat.completions.create(
-        model=CHAT_DEPLOYMENT_NAME,
-        messages=[
-            {
-                "role": "system",
-                "content": (
-                    "You are a helpful banking assistant. "
-                    "The user just checked their loan status and declined an SMS update. "
-                    "Generate a brief, warm goodbye message (1-2 sentences). "
-                    "Be professional but friendly.\n\n"
-                    "Examples:\n"
-                    "- 'Thank you for checking your loan status. If you have any questions, feel free to reach out anytime!'\n"
-                    "- 'Alright! Your application is progressing well. Have a great day!'\n"
-                    "- 'Perfect! We'll keep you updated. Take care!'"
-                )
-            },
-            {
-                "role": "user",
-                "content": f"""
-Context: User's loan is {loan_status}. They declined SMS.
-
-Generate a brief goodbye message.
-"""
-            }
-        ],
+    return await _complete_text(
+        "goodbye",
+        model=deployment_name(),
+        messages=_messages(GOODBYE_SYSTEM_PROMPT, GOODBYE_USER_TEMPLATE.format(loan_status=loan_status)),
         temperature=0.8,
-        max_tokens=80
+        max_tokens=GOODBYE_MAX_TOKENS,
     )
 
-    return response.choices[0].message.content.strip()
 
-
-def llm_generate_goodbye_after_sms(session: dict):
+async def llm_generate_goodbye_after_sms(session: dict):
     """
     Generate a personalized goodbye after sending SMS asking if they need anything else.
     If user says no or goodbye, end the conversation warmly.
@@ -181,29 +443,17 @@ def llm_generate_goodbye_after_sms(session: dict):
     - A message asking if they need help with anything else
     """
     
-    response = client.chat.completions.create(
-        model=CHAT_DEPLOYMENT_NAME,
-        messages=[
-            {
-                "role": "system",
-                "content": (
-                    "You are a helpful banking assistant. "
-                    "You just sent an SMS with the user's loan status. "
-                    "Generate a brief, friendly closing message (1-2 sentences). "
-                    "Thank them and wish them well.\n\n"
-                    "Examples:\n"
-                    "- 'Perfect! I've sent the details to your phone. Have a wonderful day!'\n"
-                    "- 'All set! You should receive the SMS shortly. Thanks for using our service!'\n"
-                    "- 'Done! Check your phone for the update. Take care!'"
-                )
-            },
-            {
-                "role": "user",
-                "content": "Generate a brief goodbye after sending SMS."
-            }
-        ],
+    return await _complete_text(
+        "goodbye_after_sms",
+        model=deployment_name(),
+        messages=_messages(GOODBYE_AFTER_SMS_SYSTEM_PROMPT, GOODBYE_AFTER_SMS_USER_PROMPT),
         temperature=0.8,
-        max_tokens=80
+        max_tokens=GOODBYE_MAX_TOKENS,
     )
 
-    return response.choices[0].message.content.strip()
\ No newline at end of file
+
+async def aclose():
+    """Close the shared HTTP connection pool (called on app shutdown)."""
+    if get_client.cache_info().currsize:
+        await get_client().close()
+        get_client.cache_clear()
@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+from types import SimpleNamespace
+
+from app import llm_router
+
+# ============================================================
+# Offline and recorded LLM clients
+# ============================================================
+# Stand-ins for the AsyncAzureOpenAI client, selected with LLM_CLIENT
+# (see llm_router.get_client), so transcripts can be replayed without
+# credentials and give the same outcome on every run:
+#
+# - stub:  no network. Routing prompts are answered by the local intent
+#          router, free-text prompts (fallback, goodbyes) with fixed text.
+# - cache: answers recorded from the real deployment. A prompt seen
+#          before gets its recorded reply; a new one (a changed prompt)
+#          goes to Azure once and is appended to LLM_CACHE_PATH.
+#
+# Both implement the one call the app makes,
+# client.chat.completions.create(...), streamed or not.
+# ============================================================
+
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.jsonl")
+
+STUB_FALLBACK = "I can help you check your loan status. Could you tell me your 10-digit phone number?"
+STUB_GOODBYE = "Thank you for calling. Have a great day!"
+STUB_GOODBYE_AFTER_SMS = "I've sent the details by SMS. Is there anything else I can help you with?"
+
+_ROUTE_INPUT = re.compile(r"Allowed actions: (.*)\nUser input: (.*)", re.DOTALL)
+
+
+def _completion(text: str):
+    message = SimpleNamespace(content=text)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+class _Stream:
+    """The whole text as one streamed delta."""
+
+    def __init__(self, text: str):
+        self._chunks = [SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for chunk in self._chunks:
+            yield chunk
+
+    async def close(self):
+        pass
+
+
+class _Client:
+    """chat.completions.create(**kwargs) -> self.complete(kwargs)."""
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+        self.calls = 0
+
+    async def _create(self, stream: bool = False, **kwargs):
+        self.calls += 1
+        text = await self.complete(kwargs)
+        return _Stream(text) if stream else _completion(text)
+
+    async def complete(self, request: dict) -> str:
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class StubLLMClient(_Client):
+    """Deterministic answers without a network (LLM_CLIENT=stub)."""
+
+    async def complete(self, request: dict) -> str:
+        system, user = (m["content"] for m in request["messages"])
+        router = llm_router.get_local_router()
+
+        if system == llm_router.ROUTE_SYSTEM_PROMPT:
+            actions, user_input = _ROUTE_INPUT.match(user).groups()
+            return router.route(user_input, actions.split(", ")) or "none"
+        if system == llm_router.ROUTE_BATCH_SYSTEM_PROMPT:
+            lines = [json.loads(line) for line in user.splitlines()[1:]]
+            answers = router.route_batch([(line["input"], line["allowed"]) for line in lines])
+            return json.dumps([answer or "none" for answer in answers])
+        if system == llm_router.GOODBYE_SYSTEM_PROMPT:
+            return STUB_GOODBYE
+        if system == llm_router.GOODBYE_AFTER_SMS_SYSTEM_PROMPT:
+            return STUB_GOODBYE_AFTER_SMS
+        return STUB_FALLBACK
+
+
+class CachedLLMClient(_Client):
+    """
+    Record/replay of `client`'s answers in a JSONL file (LLM_CLIENT=cache).
+
+    Keyed by the request (model, messages, temperature, max_tokens), so
+    any prompt change is a miss. Lines are appended as they are
+    recorded; processes sharing the file only miss each other's new
+    entries until they reload it.
+    """
+
+    def __init__(self, client, path: str = LLM_CACHE_PATH):
+        super().__init__()
+        self.client = client
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._answers = {}
+        # key -> task of a miss still waiting on `client`, shared by
+        # concurrent requests for the same prompt
+        self._recording = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._answers[entry["key"]] = entry["content"]
+
+    @staticmethod
+    def key(request: dict) -> str:
+        fields = {name: request.get(name) for name in ("model", "messages", "temperature", "max_tokens")}
+        return hashlib.sha256(json.dumps(fields, sort_keys=True).encode()).hexdigest()
+
+    async def complete(self, request: dict) -> str:
+        key = self.key(request)
+        content = self._answers.get(key)
+        if content is not None:
+            self.hits += 1
+            return content
+
+        self.misses += 1
+        task = self._recording.get(key)
+        if task is None:
+            task = self._recording[key] = asyncio.ensure_future(self._record(key, request))
+            task.add_done_callback(lambda _: self._recording.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _record(self, key: str, request: dict) -> str:
+        response = await self.client.chat.completions.create(**request)
+        content = response.choices[0].message.content
+        self._answers[key] = content
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"key": key, "content": content}) + "\n")
+        return content
+
+    async def close(self):
+        await self.client.close()
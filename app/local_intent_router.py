@@ -0,0 +1,175 @@
+import os
+import zlib
+from typing import TYPE_CHECKING
+
+from app.intent_classifier import normalize
+
+if TYPE_CHECKING:
+    # numpy itself is imported when a router is built
+    import numpy as np
+
+# ============================================================
+# Local intent router
+# ============================================================
+# llm_route only ever picks one of a handful of labels, so a tiny
+# CPU model does the same job without a network round trip:
+#
+# - each utterance is embedded as hashed character n-grams plus whole
+#   words (a fixed-size, L2-normalized bag of features)
+# - every action has a centroid: the normalized mean of its exemplars
+# - the answer is the allowed action with the highest cosine
+#   similarity, or None when "none" wins or nothing clears the
+#   threshold
+#
+# Selected with INTENT_ROUTER=local (see llm_router.llm_route).
+# ============================================================
+
+# Calibrated on benchmarks/data/intent_utterances.csv
+LOCAL_ROUTER_THRESHOLD = float(os.getenv("LOCAL_ROUTER_THRESHOLD", "0.1"))
+LOCAL_ROUTER_DIM = 4096
+NGRAM_SIZES = (2, 3, 4)
+
+NONE = "none"
+
+# Exemplars on top of llm_router.ROUTE_EXAMPLES
+EXEMPLARS = [
+    ("yes it is", "yes"),
+    ("yes that's right", "yes"),
+    ("that's correct", "yes"),
+    ("correct", "yes"),
+    ("right", "yes"),
+    ("yep", "yes"),
+    ("absolutely", "yes"),
+    ("of course", "yes"),
+    ("go ahead", "yes"),
+    ("please do", "yes"),
+    ("sounds good", "yes"),
+    ("that is my number", "yes"),
+    ("send it", "yes"),
+    ("no it isn't", "no"),
+    ("nope", "no"),
+    ("not really", "no"),
+    ("no that's not my number", "no"),
+    ("that's wrong", "no"),
+    ("don't send it", "no"),
+    ("no need", "no"),
+    ("i'm good thanks", "no"),
+    ("no thank you", "no"),
+    ("let me try a different number", "retry"),
+    ("enter it again", "retry"),
+    ("use another phone number", "retry"),
+    ("let me type it again", "retry"),
+    ("i want to speak to a person", "agent"),
+    ("representative", "agent"),
+    ("operator", "agent"),
+    ("can i talk to someone", "agent"),
+    ("transfer me to a human", "agent"),
+    ("get me a real person", "agent"),
+    ("customer service", "agent"),
+    ("i'd like to speak with an agent", "agent"),
+    ("what", "none"),
+    ("hmm", "none"),
+    ("maybe", "none"),
+    ("what's the weather like", "none"),
+    ("can you repeat that", "none"),
+    ("i'm not sure what you mean", "none"),
+    ("hello", "none"),
+    ("who is this", "none"),
+]
+
+
+def features(text: str) -> list[int]:
+    """Hashed feature indices: character n-grams of the padded text, plus each word."""
+    text = f" {normalize(text)} "
+    grams = [text[i:i + n] for n in NGRAM_SIZES for i in range(len(text) - n + 1)]
+    grams += ["w:" + word for word in text.split()]
+    # crc32, not hash(): str hashes are salted per process
+    return [zlib.crc32(gram.encode()) % LOCAL_ROUTER_DIM for gram in grams]
+
+
+class LocalIntentRouter:
+    """
+    Nearest-centroid intent router over hashed n-gram embeddings.
+
+    Input:
+    - examples: (phrase, action) pairs; "none" marks unclear phrases
+    - threshold: minimum cosine similarity to accept an action
+    """
+
+    def __init__(self, examples, threshold: float = LOCAL_ROUTER_THRESHOLD):
+        import numpy as np
+
+        self._np = np
+        self.threshold = threshold
+        self.labels = tuple(sorted({action for _, action in examples}))
+        self._label_index = {label: i for i, label in enumerate(self.labels)}
+
+        vectors = self.embed([phrase for phrase, _ in examples])
+        owners = np.array([self._label_index[action] for _, action in examples])
+        centroids = np.zeros((len(self.labels), LOCAL_ROUTER_DIM), dtype=np.float32)
+        for i in range(len(self.labels)):
+            centroids[i] = vectors[owners == i].mean(axis=0)
+        centroids /= np.linalg.norm(centroids, axis=1, keepdims=True)
+        self.centroids = centroids
+
+    def embed(self, texts) -> "np.ndarray":
+        """(len(texts), LOCAL_ROUTER_DIM) float32 matrix of L2-normalized rows."""
+        np = self._np
+        matrix = np.zeros((len(texts), LOCAL_ROUTER_DIM), dtype=np.float32)
+        for row, text in enumerate(texts):
+            np.add.at(matrix[row], features(text), 1.0)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def similarities(self, texts) -> "np.ndarray":
+        """(len(texts), len(labels)) cosine similarity to every centroid."""
+        return self.embed(texts) @ self.centroids.T
+
+    def _pick(self, row, allowed_actions, threshold: float):
+        candidates = [self._label_index[a] for a in allowed_actions if a in self._label_index]
+        if NONE in self._label_index:
+            candidates.append(self._label_index[NONE])
+        if not candidates:
+            return None
+
+        best = max(candidates, key=row.__getitem__)
+        label = self.labels[best]
+        if label == NONE or row[best] < threshold:
+            return None
+        return label
+
+    def route(self, user_input: str, allowed_actions):
+        """Same contract as llm_route: the action string or None."""
+        return self._pick(self.similarities([user_input])[0], allowed_actions, self.threshold)
+
+    def route_batch(self, requests) -> list:
+        """Same contract as llm_route_batch, in one matrix product."""
+        rows = self.similarities([user_input for user_input, _ in requests])
+        return [self._pick(row, actions, self.threshold) for row, (_, actions) in zip(rows, requests)]
+
+    def calibrate(self, samples) -> tuple[float, float]:
+        """
+        Picks the threshold with the best accuracy on labeled samples
+        and keeps it.
+
+        Input:
+        - samples: (user_input, allowed_actions, expected) triples,
+          expected being an action or None
+
+        Output:
+        - (threshold, accuracy)
+        """
+        rows = self.similarities([user_input for user_input, _, _ in samples])
+        best = (self.threshold, -1.0)
+        for threshold in self._np.arange(0.0, 0.8, 0.01):
+            correct = sum(
+                self._pick(row, actions, threshold) == expected
+                for row, (_, actions, expected) in zip(rows, samples)
+            )
+            accuracy = correct / len(samples)
+            if accuracy > best[1]:
+                best = (round(float(threshold), 2), accuracy)
+
+        self.threshold = best[0]
+        return best
@@ -0,0 +1,199 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+import zlib
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+
+# ============================================================
+# Structured, non-blocking logging
+# ============================================================
+# log_event(logger, "event", **fields) puts a record on a bounded
+# in-memory queue; a background thread (QueueListener) formats it as
+# one JSON line and writes it to stdout. A turn never waits on stdout:
+# when the queue is full the record is dropped and counted.
+#
+# Every line carries the session ID of the call being handled
+# (bind_session), and phone numbers are masked to their last 4
+# digits. Below WARNING, only LOG_SAMPLE_RATE of the calls are logged
+# (chosen by session ID, so a sampled call is logged completely).
+# ============================================================
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # json | text
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Session ID of the call being handled
+log_session: ContextVar = ContextVar("log_session", default=None)
+
+# Runs of 7+ digits, optionally separated by - . or spaces
+PHONE_PATTERN = re.compile(r"\+?\d(?:[\s.-]?\d){6,}")
+
+
+def mask_phone(text: str) -> str:
+    """Masks every phone-number-like run of digits to its last 4 digits."""
+    def mask(match):
+        digits = re.sub(r"\D", "", match.group())
+        return "*" * (len(digits) - 4) + digits[-4:]
+    return PHONE_PATTERN.sub(mask, text)
+
+
+def _mask(value):
+    if isinstance(value, str):
+        return mask_phone(value)
+    if isinstance(value, (list, tuple)):
+        return [_mask(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _mask(v) for k, v in value.items()}
+    return value
+
+
+def bind_session(session_id):
+    """Tags the current task's log lines with `session_id`."""
+    log_session.set(session_id)
+
+
+def sampled(session_id=None) -> bool:
+    """Whether below-WARNING events of this call are logged."""
+    if LOG_SAMPLE_RATE >= 1.0:
+        return True
+    if session_id is None:
+        return random.random() < LOG_SAMPLE_RATE
+    return zlib.crc32(str(session_id).encode()) % 10000 < LOG_SAMPLE_RATE * 10000
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": mask_phone(record.getMessage()),
+        }
+        if record.session_id is not None:
+            entry["session_id"] = record.session_id
+        entry.update(_mask(getattr(record, "fields", {})))
+        if record.exc_info:
+            entry["exc"] = mask_phone(self.formatException(record.exc_info))
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        fields = " ".join(f"{k}={v}" for k, v in _mask(getattr(record, "fields", {})).items())
+        line = f"{record.levelname} | {record.session_id or '-'} | {mask_phone(record.getMessage())} {fields}"
+        if record.exc_info:
+            line += "\n" + mask_phone(self.formatException(record.exc_info))
+        return line
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Enqueues without blocking; formatting happens on the listener thread."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve everything that depends on the caller's context now
+        record.session_id = log_session.get()
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DrainingQueueListener(QueueListener):
+    def enqueue_sentinel(self):
+        # Wait for room: the queue may be full when the app shuts down
+        self.queue.put(self._sentinel)
+
+
+class SessionSampler(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or sampled(log_session.get())
+
+
+LOGGER = logging.getLogger("loan_agent")
+QUEUE_HANDLER = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def configure():
+    """
+    Routes the app's loggers through the queue. Called on import; safe
+    to call again. The writer thread starts with the first event (or
+    start()), so importing the module starts no thread.
+    """
+    if QUEUE_HANDLER not in LOGGER.handlers:
+        QUEUE_HANDLER.addFilter(SessionSampler())
+        LOGGER.addHandler(QUEUE_HANDLER)
+        LOGGER.setLevel(LOG_LEVEL)
+        LOGGER.propagate = False
+        atexit.register(shutdown)
+
+
+def start():
+    """Starts the writer thread; does nothing if it is running."""
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            return
+        output = logging.StreamHandler(sys.stdout)
+        output.setFormatter(TextFormatter() if LOG_FORMAT == "text" else JsonFormatter())
+        _listener = DrainingQueueListener(QUEUE_HANDLER.queue, output)
+        _listener.start()
+
+
+def shutdown():
+    """Flushes queued lines and stops the writer thread."""
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    return LOGGER.getChild(name)
+
+
+def log_event(logger: logging.Logger, event: str, level: int = logging.INFO, exc_info=None, **fields):
+    """
+    Logs one structured event.
+
+    Input:
+    - logger: from get_logger()
+    - event: short event name ("loan_lookup", "turn", ...)
+    - fields: extra JSON fields (timings in *_ms)
+    """
+    if logger.isEnabledFor(level):
+        if _listener is None:
+            start()
+        logger.log(level, event, exc_info=exc_info, extra={"fields": fields})
+
+
+def stats() -> dict:
+    return {"queued": QUEUE_HANDLER.queue.qsize(), "dropped": QUEUE_HANDLER.dropped, "sample_rate": LOG_SAMPLE_RATE}
+
+
+def elapsed_ms(started: float) -> float:
+    """Milliseconds since a time.perf_counter() value."""
+    return round((time.perf_counter() - started) * 1000, 3)
+
+
+configure()
@@ -1,8 +1,68 @@
-from fastapi import FastAPI
+import asyncio
+import json
+import logging
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from app.conversation import handle_turn
+from fastapi.responses import Response, StreamingResponse
+from app.conversation import handle_turn, FlowLoopError
+from app.intent_classifier import FAST_PATH_STATS
+from app import llm_router, route_cache, route_batcher
+from app.session import Session
+from app.session_store import create_session_store, SESSION_CONFLICT_RETRIES
+from app.lifecycle import CallLifecycle
+from app.replay import (
+    replay_stream, REPLAY_CONCURRENCY, REPLAY_MAX_CONCURRENCY, REPLAY_MAX_BODY_BYTES, REPLAY_LLM_CLIENTS,
+)
+from app.integrations.loan_repository import get_loan_repository
+from app.speculation import CALLER_ID_SPECULATION
+from app.goodbye_pool import GOODBYE_POOL, GOODBYE_POOL_ENABLED, GOODBYE_POOL_WARM
+from app.llm_budget import BUDGET_STATS
+from app.llm_guard import LLM_GUARD
+from app.prompt_tokens import TOKEN_STATS
+from app.streaming import token_sink, SentenceChunker, split_sentences, sse_event
+from app.metrics import REGISTRY, CONTENT_TYPE, stats_lines
+from app import tracing
+from app import logs
+from app.logs import get_logger, log_event, bind_session
+
+log = get_logger("main")
+
+# Accept "caller_id" on /chat and /chat/stream: only behind a trusted
+# telephony front end or for load tests, since whoever sends it hears
+# that number's loan status. Otherwise the caller ID is simulated.
+CHAT_CALLER_ID = os.getenv("CHAT_CALLER_ID", "0") != "0"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logs.start()
+    # Build the LLM client now rather than on the first call
+    try:
+        llm_router.get_client()
+    except Exception as e:
+        log_event(log, "llm_client_not_configured", level=logging.ERROR, error=str(e))
+
+    # Warm and periodically refresh the goodbye pool in the background
+    refresher = (
+        asyncio.create_task(GOODBYE_POOL.run_refresher()) if GOODBYE_POOL_ENABLED and GOODBYE_POOL_WARM else None
+    )
+    # Reap idle and ended sessions of the in-process stores
+    reaper = asyncio.create_task(call_lifecycle.run_reaper()) if call_lifecycle.tracking else None
+
+    yield
+
+    for task in (refresher, reaper):
+        if task is not None:
+            task.cancel()
+    # Release the shared LLM connection pool
+    await llm_router.aclose()
+    # Write out the queued log lines
+    logs.shutdown()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware to allow browser requests
 app.add_middleware(
@@ -13,50 +73,368 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-sessions = {}
+sessions = create_session_store()
+call_lifecycle = CallLifecycle(sessions)
 
-@app.post("/chat")
-def chat(payload: dict):
+async def _turn(message: str, session: dict) -> dict:
+    """Runs one turn on an already loaded session (updated in place)."""
+    response, updated_session = await handle_turn(message, session)
+    return {
+        "response": response,
+        "ended": updated_session.get("ended", False)
+    }
+
+
+def _turn_failed(e: Exception) -> dict:
+    # A FlowLoopError is a broken flow definition, not a transient failure
+    log_event(
+        log, "flow_loop" if isinstance(e, FlowLoopError) else "turn_failed",
+        level=logging.ERROR, exc_info=e, error=str(e),
+    )
+    return {
+        "response": "Something went wrong. Please start a new conversation.",
+        "ended": True
+    }
+
+
+def _turn_conflict() -> dict:
+    # Other turns of the same call kept winning the write; nothing was saved
+    log_event(log, "session_conflict", level=logging.WARNING)
+    return {
+        "response": "Sorry, I didn't catch that. Could you say it again?",
+        "ended": False
+    }
+
+
+def _session_id(payload: dict) -> str:
+    """The request's session_id; 400 if it is missing or not a string."""
     session_id = payload.get("session_id")
-    message = payload.get("message", "")
+    if not isinstance(session_id, str) or not session_id:
+        raise HTTPException(status_code=400, detail="session_id must be a non-empty string")
+    return session_id
+
+
+def _caller_id(payload: dict):
+    """The request's caller_id (a 10-digit string) or None; 400 if it is not accepted."""
+    caller_id = payload.get("caller_id")
+    if caller_id is None:
+        return None
+    if not CHAT_CALLER_ID:
+        raise HTTPException(status_code=400, detail="caller_id is not accepted (CHAT_CALLER_ID=0)")
+    if not (isinstance(caller_id, str) and len(caller_id) == 10 and caller_id.isdigit()):
+        raise HTTPException(status_code=400, detail="caller_id must be a 10-digit string")
+    return caller_id
+
+
+async def _load_session(session_id: str, session_token: str = None):
+    if sessions.stateless:
+        return sessions.decode(session_token) if session_token else None
+    return await sessions.get(session_id)
+
+
+async def run_turn(session_id: str, message: str, caller_id: str = None,
+                   session_token: str = None, retries: int = SESSION_CONFLICT_RETRIES) -> dict:
+    """
+    Loads the session, runs one turn and stores the session back.
+
+    - caller_id (from the telephony side) is only used for a new session
+    - SESSION_STORE=token: the session comes from session_token and the
+      updated one is returned as "session_token"
+    - otherwise the write is optimistic: when another turn of the call
+      wrote the session first, the turn is rerun on that newer session
+      (up to `retries` times)
+    """
+    bind_session(session_id)
+    for _ in range(retries + 1):
+        session = await _load_session(session_id, session_token)
+        if session is None:
+            session = Session({"caller_id": caller_id})
+        new, was_ended = not session.get("greeted"), bool(session.get("ended"))
+
+        try:
+            result = await _turn(message, session)
+        except Exception as e:
+            return _turn_failed(e)
+
+        if sessions.stateless:
+            result["session_token"] = sessions.encode(session)
+        elif not await sessions.put_if_unchanged(session_id, session):
+            continue
+        call_lifecycle.record_turn(session_id, session, new, was_ended)
+        return result
+
+    return _turn_conflict()
+
+
+async def stream_turn(turn):
+    """
+    Runs the `turn` coroutine and yields its output as (event, data):
+    - token:    each LLM text delta as it arrives
+    - sentence: each complete sentence, ready for TTS
+    - done:     the final {"response", "ended"} payload
+    """
+    tokens = asyncio.Queue()
+
+    async def run():
+        token_sink.set(tokens.put_nowait)
+        try:
+            return await turn
+        finally:
+            tokens.put_nowait(None)  # end of tokens
+
+    task = asyncio.create_task(run())
+    chunker = SentenceChunker()
+    streamed = False
+
+    while (token := await tokens.get()) is not None:
+        streamed = True
+        yield "token", {"text": token}
+        for sentence in chunker.feed(token):
+            yield "sentence", {"text": sentence}
+
+    result = await task
+    sentences = chunker.flush() if streamed else split_sentences(result["response"])
+    for sentence in sentences:
+        yield "sentence", {"text": sentence}
+    yield "done", result
+
+
+@app.post("/chat")
+async def chat(payload: dict):
+    return await run_turn(
+        _session_id(payload), payload.get("message", ""),
+        _caller_id(payload), payload.get("session_token"),
+    )
 
-    if session_id not in sessions:
-        sessions[session_id] = {}
+
+@app.post("/chat/stream")
+async def chat_stream(payload: dict):
+    """Same turn as /chat, as Server-Sent Events (see stream_turn)."""
+    # No reruns after a lost write: the first run's tokens are already out
+    turn = run_turn(
+        _session_id(payload), payload.get("message", ""),
+        _caller_id(payload), payload.get("session_token"), retries=0,
+    )
+
+    async def events():
+        async for event, data in stream_turn(turn):
+            yield sse_event(event, data)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/chat/batch")
+async def chat_batch(request: Request, concurrency: int = REPLAY_CONCURRENCY, responses: bool = False):
+    """
+    Replays call transcripts through the engine (see app/replay.py).
+
+    The body is JSONL, one transcript per line; the reply streams one
+    JSONL outcome per call as calls finish. Sessions are not stored.
+
+    - 403 unless LLM_CLIENT is stub or cache: replays share the LLM
+      client and the stats with live calls
+    - 413 for a body over REPLAY_MAX_BODY_BYTES
+    - concurrency is capped at REPLAY_MAX_CONCURRENCY
+    """
+    if llm_router.LLM_CLIENT not in REPLAY_LLM_CLIENTS:
+        raise HTTPException(status_code=403, detail="/chat/batch needs LLM_CLIENT=stub or cache")
+
+    # Read up front: once the response starts, the server's disconnect
+    # listener shares the request's receive channel
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > REPLAY_MAX_BODY_BYTES:
+            raise HTTPException(status_code=413, detail=f"Body over {REPLAY_MAX_BODY_BYTES} bytes")
+    lines = body.decode(errors="replace").splitlines()
+    concurrency = min(max(1, concurrency), REPLAY_MAX_CONCURRENCY)
+
+    async def outcomes():
+        async for outcome in replay_stream(lines, concurrency, responses):
+            yield json.dumps(outcome) + "\n"
+
+    return StreamingResponse(outcomes(), media_type="application/x-ndjson")
+
+
+# ============================================================
+# Call channel
+# ============================================================
+def parse_call_input(raw: str):
+    """
+    Turns one client frame into the user input for the next turn.
+
+    Accepted frames:
+    - {"type": "utterance", "text": "..."}
+    - {"type": "dtmf", "digits": "..."}   keypad presses
+    - plain text, treated as an utterance
+
+    Output:
+    - the input string, or None if the frame is not understood
+    """
+    try:
+        frame = json.loads(raw)
+    except ValueError:
+        return raw
+
+    if not isinstance(frame, dict):
+        return None
+    if frame.get("type") == "utterance":
+        return str(frame.get("text", ""))
+    if frame.get("type") == "dtmf":
+        return "".join(ch for ch in str(frame.get("digits", "")) if ch.isdigit())
+    return None
+
+
+@app.websocket("/call/{session_id}")
+async def call(websocket: WebSocket, session_id: str):
+    """
+    One whole call over a persistent WebSocket.
+
+    - the greeting is pushed as soon as a new call connects
+    - each client frame (see parse_call_input) runs one turn, answered
+      with the same token / sentence / done events as /chat/stream,
+      sent as {"type": event, ...}
+    - the session is loaded once and kept in memory for the call; it
+      is written back after every turn, optimistically as in run_turn:
+      when another turn of the call (an HTTP fallback) wrote it first,
+      the turn is rerun on that newer session
+    """
+    await websocket.accept()
+    bind_session(session_id)
+
+    session = await sessions.get(session_id)
+    if session is None:
+        session = Session()
+    message = "" if not session else None
 
     try:
-        response, updated_session = handle_turn(message, sessions[session_id])
-        sessions[session_id] = updated_session
+        while not session.get("ended"):
+            if message is None:
+                message = parse_call_input(await websocket.receive_text())
+                if message is None:
+                    await websocket.send_json({"type": "error", "detail": "Unknown frame"})
+                    continue
+
+            for _ in range(SESSION_CONFLICT_RETRIES + 1):
+                new, was_ended = not session.get("greeted"), bool(session.get("ended"))
+                async for event, data in stream_turn(_turn(message, session)):
+                    if event == "done":
+                        result = data
+                    else:
+                        await websocket.send_json({"type": event, **data})
+                if await sessions.put_if_unchanged(session_id, session):
+                    call_lifecycle.record_turn(session_id, session, new, was_ended)
+                    break
+                session = await sessions.get(session_id) or Session()
+            else:
+                result = _turn_conflict()
+            await websocket.send_json({"type": "done", **result})
+            message = None
 
-        return {
-            "response": response,
-            "ended": updated_session.get("ended", False)
-        }
+        await websocket.close()
+
+    except WebSocketDisconnect:
+        pass
 
     except Exception as e:
-        print(f"ERROR: {e}")
-        return {
-            "response": "Something went wrong. Please start a new conversation.",
-            "ended": True
-        }
+        # Same reply as /chat, then hang up; the failed turn is not saved
+        try:
+            await websocket.send_json({"type": "done", **_turn_failed(e)})
+            await websocket.close()
+        except Exception:
+            pass
+
+
+async def _component_stats() -> dict:
+    """Stats of every component, shared by /health and /metrics."""
+    return {
+        "session_store": await sessions.stats(),
+        "call_lifecycle": call_lifecycle.stats(),
+        "intent_fast_path": FAST_PATH_STATS.snapshot(),
+        "route_cache": route_cache.stats(),
+        "route_batching": route_batcher.ROUTE_BATCHER.stats() if route_batcher.ROUTE_BATCHING else None,
+        "loan_cache": _loan_cache_stats(),
+        "caller_id_speculation": CALLER_ID_SPECULATION.stats(),
+        "goodbye_pool": GOODBYE_POOL.stats(),
+        "llm_budget": BUDGET_STATS.snapshot(),
+        "llm_guard": LLM_GUARD.stats(),
+        "llm_tokens": TOKEN_STATS.stats(),
+        "logging": logs.stats(),
+    }
 
 
 @app.get("/health")
-def health_check():
+async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "active_sessions": len(sessions)}
+    stats = await _component_stats()
+    return {
+        "status": "degraded" if LLM_GUARD.breaker.state != "closed" else "healthy",
+        # Live calls only when tracked (in-process stores); else every stored
+        # session, or None where counting them is too costly (Redis)
+        "active_sessions": (
+            call_lifecycle.live_calls() if call_lifecycle.tracking else stats["session_store"].get("size")
+        ),
+        **stats,
+    }
+
+
+# Stats dicts keyed by data (states, call kinds, ...) rather than by
+# fields; exported with these label names
+METRIC_LABELS = {
+    "intent_fast_path": {"": "state"},
+    "llm_budget": {"degraded": "how", "p95_ms": "kind", "hedge_delay_ms": "kind"},
+    "goodbye_pool": {"keys": "pool"},
+    "llm_tokens": {"kinds": "kind"},
+    "call_lifecycle": {"events": "event"},
+}
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: turn/state/span histograms plus the /health stats"""
+    stats = await _component_stats()
+    text = REGISTRY.render() + "".join(
+        stats_lines(section, snapshot, METRIC_LABELS.get(section))
+        for section, snapshot in stats.items() if snapshot
+    )
+    return Response(text, media_type=CONTENT_TYPE)
+
+
+@app.get("/traces")
+async def traces():
+    """Span breakdown of the most recent turns (TRACING=1)"""
+    return {"tracing": tracing.TRACING, "traces": list(tracing.RECENT_TRACES)}
+
+
+def _loan_cache_stats():
+    repository = get_loan_repository()
+    return repository.stats() if hasattr(repository, "stats") else None
 
 
 @app.post("/reset")
-def reset_session(payload: dict):
+async def reset_session(payload: dict):
     """Reset a specific session"""
-    session_id = payload.get("session_id")
-    if session_id in sessions:
-        sessions[session_id] = {}
+    session_id = _session_id(payload)
+    if await sessions.get(session_id) is not None:
+        await sessions.put(session_id, Session())
+        call_lifecycle.reset(session_id)
         return {"status": "reset"}
     return {"status": "not_found"}
 
 
+
+@app.post("/loan-status/invalidate")
+async def invalidate_loan_status(payload: dict):
+    """Called by the loan system when an application's status changes"""
+    phone = payload.get("phone")
+    repository = get_loan_repository()
+    if phone and hasattr(repository, "invalidate"):
+        repository.invalidate(phone)
+        return {"status": "invalidated"}
+    return {"status": "ignored"}
+
+
 if __name__ == "__main__":
     import uvicorn
-    print("🚀 Starting FastAPI server...")
+    log_event(log, "starting_server", host="0.0.0.0", port=8000)
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,149 @@
+import math
+from bisect import bisect_left
+
+# ============================================================
+# Minimal Prometheus metrics (text exposition format 0.0.4)
+# ============================================================
+# Counters and histograms updated in the hot path are plain dicts
+# keyed by label values, so recording costs a dict lookup and an add.
+# The /health stats objects are exported as they are, by flattening
+# their snapshot dicts (stats_lines).
+# ============================================================
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+PREFIX = "loan_agent_"
+
+# Seconds; covers cache hits (sub-ms) up to the LLM timeout
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = PREFIX + name
+        self.help = help
+        self.labelnames = labelnames
+        self.values = {}
+
+    def inc(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in self.values.items():
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = PREFIX + name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self.series = {}  # labels -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, *labels):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, series in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), series):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name: str, help: str, labelnames: tuple = ()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def _metric_name(*parts) -> str:
+    name = "_".join(str(p) for p in parts if p != "")
+    return "".join(c if c.isalnum() else "_" for c in name).lower()
+
+
+def stats_lines(section: str, snapshot: dict, labels: dict = None) -> str:
+    """
+    Exports a /health stats snapshot as untyped gauges.
+
+    Input:
+    - section: metric name part ("route_cache", "llm_budget", ...)
+    - snapshot: dict of numbers, booleans, strings and nested dicts
+    - labels: key of a nested dict keyed by data rather than fields
+      ("" for the snapshot itself) -> label name for those keys
+
+    Output:
+    - exposition text. Numbers become loan_agent_<section>_<key>;
+      fields of nested dicts extend the name, data keys become labels;
+      a string becomes <name>{value="..."} 1.
+    """
+    labels = labels or {}
+    lines = []
+
+    def emit(name, value, pairs):
+        if isinstance(value, bool):
+            value = int(value)
+        if isinstance(value, str):
+            pairs = pairs + (("value", value),)
+            value = 1
+        if isinstance(value, (int, float)):
+            lines.append(f"{PREFIX}{name}{_labels([k for k, _ in pairs], [v for _, v in pairs])} {_number(value)}")
+
+    def walk(name, key, value, pairs):
+        if not isinstance(value, dict):
+            emit(name, value, pairs)
+        elif key in labels:
+            for data_key, item in value.items():
+                walk(name, None, item, pairs + ((labels[key], data_key),))
+        else:
+            for field, item in value.items():
+                walk(_metric_name(name, field), field, item, pairs)
+
+    walk(_metric_name(section), "", snapshot or {}, ())
+    return "\n".join(lines) + "\n" if lines else ""
@@ -0,0 +1,109 @@
+import math
+import os
+from functools import lru_cache
+
+# ============================================================
+# Prompt token accounting
+# ============================================================
+# Counts the tokens each LLM call sends (per kind: route, route_batch,
+# text, ...) and the output budget it allows, for /health and
+# /metrics. Usage reported by the provider (completion and cached
+# prompt tokens) is added when the response carries it.
+#
+# Counting uses tiktoken when it is installed (`pip install tiktoken`);
+# otherwise an estimate of PROMPT_CHARS_PER_TOKEN characters per token.
+# The same counter sizes the routing output budget: a route answer is
+# one action name, so max_tokens only has to fit the longest one.
+# ============================================================
+
+PROMPT_ENCODING = os.getenv("PROMPT_ENCODING", "o200k_base")
+PROMPT_CHARS_PER_TOKEN = 4
+
+# Chat format overhead (role and separators) per message, and for
+# priming the reply
+MESSAGE_OVERHEAD_TOKENS = 3
+REPLY_OVERHEAD_TOKENS = 3
+
+
+@lru_cache(maxsize=1)
+def get_encoding():
+    """The tiktoken encoding, or None when tiktoken is not installed."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    return tiktoken.get_encoding(PROMPT_ENCODING)
+
+
+@lru_cache(maxsize=1024)
+def count_tokens(text: str) -> int:
+    """Tokens in `text` (cached: the static prompt parts repeat on every call)."""
+    encoding = get_encoding()
+    if encoding is None:
+        return math.ceil(len(text) / PROMPT_CHARS_PER_TOKEN)
+    return len(encoding.encode(text))
+
+
+def message_tokens(messages: list) -> int:
+    """Prompt tokens of a chat completion request."""
+    return REPLY_OVERHEAD_TOKENS + sum(
+        MESSAGE_OVERHEAD_TOKENS + count_tokens(message["content"]) for message in messages
+    )
+
+
+def answer_budget(answers) -> int:
+    """max_tokens that fits the longest of the possible answers."""
+    return max(count_tokens(answer) for answer in answers)
+
+
+class TokenStats:
+    """Per-kind token counters for /health."""
+
+    def __init__(self):
+        self.kinds = {}
+
+    def _kind(self, kind: str) -> dict:
+        counters = self.kinds.get(kind)
+        if counters is None:
+            counters = self.kinds[kind] = {
+                "calls": 0,
+                "prompt_tokens": 0,
+                "max_tokens": 0,
+                "completion_tokens": 0,
+                "cached_prompt_tokens": 0,
+            }
+        return counters
+
+    def record_request(self, kind: str, messages: list, max_tokens: int = None) -> int:
+        """Counts one request; returns its prompt tokens."""
+        tokens = message_tokens(messages)
+        counters = self._kind(kind)
+        counters["calls"] += 1
+        counters["prompt_tokens"] += tokens
+        counters["max_tokens"] += max_tokens or 0
+        return tokens
+
+    def record_usage(self, kind: str, usage):
+        """Adds the provider's usage block (if any) of one response."""
+        if usage is None:
+            return
+        counters = self._kind(kind)
+        counters["completion_tokens"] += usage.completion_tokens or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        counters["cached_prompt_tokens"] += getattr(details, "cached_tokens", None) or 0
+
+    def stats(self) -> dict:
+        return {
+            "tokenizer": PROMPT_ENCODING if get_encoding() is not None else "estimate",
+            "kinds": {
+                kind: {
+                    **counters,
+                    "prompt_tokens_per_call": round(counters["prompt_tokens"] / counters["calls"], 1)
+                    if counters["calls"] else 0,
+                }
+                for kind, counters in self.kinds.items()
+            },
+        }
+
+
+TOKEN_STATS = TokenStats()
@@ -0,0 +1,310 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+REPLAY_CONCURRENCY = int(os.getenv("REPLAY_CONCURRENCY", "50"))
+# POST /chat/batch: upper bound of ?concurrency= and of the upload size
+REPLAY_MAX_CONCURRENCY = int(os.getenv("REPLAY_MAX_CONCURRENCY", "200"))
+REPLAY_MAX_BODY_BYTES = int(os.getenv("REPLAY_MAX_BODY_BYTES", str(10 * 1024 * 1024)))
+# LLM clients a server may run /chat/batch on (see below)
+REPLAY_LLM_CLIENTS = ("stub", "cache")
+
+# ============================================================
+# Transcript replay
+# ============================================================
+# Plays recorded calls through handle_turn, without HTTP or the
+# session store, to check a flow or prompt change against thousands of
+# calls. Used by POST /chat/batch and by the CLI below.
+#
+# Input, one JSON object per line:
+#   {"call_id": "c1", "caller_id": "9999999999",
+#    "turns": ["", "yes", "no"],
+#    "expect": {"state": "llm_goodbye", "outcome": "ended"}}
+# - turns starts with "" for the greeting, as a real call does
+# - caller_id is optional (a 10-digit string); without it one is
+#   derived from call_id, so reruns take the same path
+# - expect is optional; any outcome field can be checked
+#
+# Output, one JSON object per call, in the order calls finish:
+#   line, call_id, outcome (ended | handed_off | abandoned | error),
+#   state, ended, turns (played), latency_ms, max_turn_ms, passed,
+#   mismatches ({field: [expected, got]}), and with --responses the
+#   agent's replies
+#
+# Calls run in an async pool (LLM-bound replays: many calls waiting on
+# the LLM at once), and the CLI can spread the input over a process
+# pool as well (CPU-bound replays, e.g. with LLM_CLIENT=stub). For
+# repeatable runs use LLM_CLIENT=stub or cache (app/llm_stub.py).
+#
+# Replays share the process's LLM client and stats (fast path, budget,
+# breaker and limiter, goodbye pool, loan cache) with live calls. So
+# /chat/batch is only served with LLM_CLIENT=stub or cache, i.e. on a
+# server set up for replays, never next to production traffic.
+#
+# Usage:
+#   python -m app.replay calls.jsonl -o outcomes.jsonl --llm stub
+#   python -m app.replay calls.jsonl -o - --workers 4 --concurrency 20
+# ============================================================
+
+ABANDONED = "abandoned"
+ERROR = "error"
+
+
+def caller_id_for(call_id) -> str:
+    """A stable 10-digit caller ID for a transcript without one."""
+    return f"{zlib.crc32(str(call_id).encode()) % 10 ** 10:010d}"
+
+
+def parse_transcript(line: str) -> dict:
+    """One input line as a transcript; raises ValueError if malformed."""
+    transcript = json.loads(line)
+    if not isinstance(transcript, dict) or not isinstance(transcript.get("turns"), list):
+        raise ValueError("expected an object with a 'turns' list")
+    caller_id = transcript.get("caller_id")
+    if caller_id is not None and not (isinstance(caller_id, str) and len(caller_id) == 10 and caller_id.isdigit()):
+        raise ValueError("caller_id must be a 10-digit string")
+    return transcript
+
+
+def score(outcome: dict, expect: dict) -> dict:
+    """{field: [expected, got]} for every expected field that differs."""
+    return {
+        field: [wanted, outcome.get(field)]
+        for field, wanted in expect.items() if outcome.get(field) != wanted
+    }
+
+
+async def replay_call(transcript: dict, responses: bool = False) -> dict:
+    """
+    Plays one transcript on a new session.
+
+    Turns after the call has ended are not played. Output: the outcome
+    record described above (without "line").
+    """
+    from app.conversation import handle_turn
+    from app.lifecycle import ENDED, HANDED_OFF, HANDOFF_STATES
+    from app.logs import bind_session
+    from app.session import Session
+
+    call_id = transcript.get("call_id")
+    bind_session(call_id)
+    session = Session({"caller_id": transcript.get("caller_id") or caller_id_for(call_id)})
+    replies = []
+    turn_seconds = []
+    error = None
+
+    try:
+        for utterance in transcript["turns"]:
+            start = time.perf_counter()
+            reply, _ = await handle_turn(str(utterance), session)
+            turn_seconds.append(time.perf_counter() - start)
+            replies.append(reply)
+            if session.get("ended"):
+                break
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+
+    state = session.get("state")
+    if error is not None:
+        kind = ERROR
+    elif not session.get("ended"):
+        kind = ABANDONED
+    else:
+        kind = HANDED_OFF if state in HANDOFF_STATES else ENDED
+
+    outcome = {
+        "call_id": call_id,
+        "outcome": kind,
+        "state": state,
+        "ended": bool(session.get("ended")),
+        "loan_status": session.get("loan_status"),
+        "turns": len(turn_seconds),
+        "latency_ms": round(sum(turn_seconds) * 1000, 3),
+        "max_turn_ms": round(max(turn_seconds, default=0) * 1000, 3),
+    }
+    if error is not None:
+        outcome["error"] = error
+    expect = transcript.get("expect")
+    if expect:
+        outcome["mismatches"] = score(outcome, expect)
+        outcome["passed"] = not outcome["mismatches"]
+    if responses:
+        outcome["responses"] = replies
+    return outcome
+
+
+async def _replay_line(index: int, line: str, responses: bool) -> dict:
+    try:
+        transcript = parse_transcript(line)
+    except ValueError as e:
+        return {"line": index, "outcome": ERROR, "error": f"bad transcript: {e}"}
+    return {"line": index, **await replay_call(transcript, responses)}
+
+
+async def replay_stream(lines, concurrency: int = REPLAY_CONCURRENCY, responses: bool = False, start: int = 0):
+    """
+    Replays transcript lines with at most `concurrency` calls at a time,
+    yielding each outcome as soon as its call finishes.
+
+    Input:
+    - lines: iterable of JSONL lines (blank ones skipped)
+    - start: line number of the first line, for the "line" field
+    """
+    running = set()
+    for index, line in enumerate(lines, start):
+        if not line.strip():
+            continue
+        running.add(asyncio.ensure_future(_replay_line(index, line, responses)))
+        if len(running) >= concurrency:
+            done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+
+    while running:
+        done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            yield task.result()
+
+
+# ------------------------------------------------------------
+# Process pool
+# ------------------------------------------------------------
+# Each worker process keeps one event loop for all its chunks, so the
+# shared LLM client and the other loop-bound singletons stay usable.
+_worker_loop = None
+
+
+def _init_worker():
+    global _worker_loop
+    _worker_loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_worker_loop)
+    import app.conversation  # noqa: F401  (import the engine before the first chunk)
+
+
+def _replay_chunk(lines: list, start: int, concurrency: int, responses: bool) -> list:
+    async def run():
+        return [outcome async for outcome in replay_stream(lines, concurrency, responses, start)]
+    return _worker_loop.run_until_complete(run())
+
+
+def replay_processes(lines, workers: int, concurrency: int = REPLAY_CONCURRENCY,
+                     responses: bool = False, chunk_size: int = 100):
+    """
+    Replays transcript lines on `workers` processes, each running an
+    async pool of `concurrency` calls over chunks of `chunk_size` lines.
+
+    Yields the outcomes chunk by chunk as chunks finish; at most two
+    chunks per worker are read ahead.
+    """
+    with ProcessPoolExecutor(workers, initializer=_init_worker) as pool:
+        pending = set()
+        chunk, start = [], 0
+        for index, line in enumerate(lines):
+            chunk.append(line)
+            if len(chunk) < chunk_size:
+                continue
+            pending.add(pool.submit(_replay_chunk, chunk, start, concurrency, responses))
+            chunk, start = [], index + 1
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+        if chunk:
+            pending.add(pool.submit(_replay_chunk, chunk, start, concurrency, responses))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+
+
+# ------------------------------------------------------------
+# CLI
+# ------------------------------------------------------------
+class ReplaySummary:
+    """Totals over the outcomes written so far."""
+
+    def __init__(self):
+        self.calls = 0
+        self.outcomes = {}
+        self.passed = 0
+        self.failed = 0
+        self.turn_ms = []
+
+    def add(self, outcome: dict):
+        self.calls += 1
+        self.outcomes[outcome["outcome"]] = self.outcomes.get(outcome["outcome"], 0) + 1
+        if "passed" in outcome:
+            self.passed += outcome["passed"]
+            self.failed += not outcome["passed"]
+        if outcome.get("turns"):
+            self.turn_ms.append(outcome["latency_ms"] / outcome["turns"])
+
+    def report(self, seconds: float) -> dict:
+        ordered = sorted(self.turn_ms)
+        return {
+            "calls": self.calls,
+            "calls_per_s": round(self.calls / seconds, 1) if seconds else 0.0,
+            "outcomes": self.outcomes,
+            "passed": self.passed,
+            "failed": self.failed,
+            # Median over the calls of their mean turn latency
+            "p50_turn_ms": round(ordered[len(ordered) // 2], 3) if ordered else None,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay JSONL call transcripts through the engine")
+    parser.add_argument("transcripts", help="JSONL file, or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="outcome JSONL file, or - for stdout")
+    parser.add_argument("--llm", choices=["azure", "stub", "cache"], default=None,
+                        help="LLM client (default: LLM_CLIENT)")
+    parser.add_argument("--workers", type=int, default=1, help="processes; 1 runs in this process")
+    parser.add_argument("--concurrency", type=int, default=REPLAY_CONCURRENCY, help="calls in flight per process")
+    parser.add_argument("--chunk-size", type=int, default=100, help="lines per process pool task")
+    parser.add_argument("--responses", action="store_true", help="include the agent's replies")
+    args = parser.parse_args(argv)
+
+    # Logs go to stdout, where the outcomes may be going too; errors
+    # are in the outcomes. Set before the app is imported (worker
+    # processes inherit it)
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    if args.llm:
+        os.environ["LLM_CLIENT"] = args.llm
+
+    source = sys.stdin if args.transcripts == "-" else open(args.transcripts, encoding="utf-8")
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    summary = ReplaySummary()
+    started = time.perf_counter()
+
+    def write(outcome):
+        out.write(json.dumps(outcome) + "\n")
+        summary.add(outcome)
+
+    try:
+        if args.workers > 1:
+            for outcome in replay_processes(source, args.workers, args.concurrency, args.responses, args.chunk_size):
+                write(outcome)
+        else:
+            async def run():
+                from app import llm_router
+                async for outcome in replay_stream(source, args.concurrency, args.responses):
+                    write(outcome)
+                await llm_router.aclose()
+            asyncio.run(run())
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if source is not sys.stdin:
+            source.close()
+
+    print(json.dumps(summary.report(time.perf_counter() - started)), file=sys.stderr)
+    return 1 if summary.failed or summary.outcomes.get(ERROR) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+import asyncio
+import contextvars
+import logging
+import os
+
+from app import llm_router
+from app.llm_budget import wait_within_budget
+from app.logs import get_logger, log_event
+
+log = get_logger("route_batcher")
+
+# ============================================================
+# Micro-batched intent routing
+# ============================================================
+# Under load many calls need a routing answer within the same few
+# milliseconds, and each request repeats the same system prompt.
+# With ROUTE_BATCHING=1, requests arriving within one window are sent
+# as a single completion that classifies all of them, and each caller
+# gets its own answer back.
+# ============================================================
+
+ROUTE_BATCHING = os.getenv("ROUTE_BATCHING", "0") == "1"
+ROUTE_BATCH_WINDOW_MS = float(os.getenv("ROUTE_BATCH_WINDOW_MS", "5"))
+ROUTE_BATCH_MAX = int(os.getenv("ROUTE_BATCH_MAX", "16"))
+
+
+class RouteBatcher:
+    """
+    Collects llm_route requests for up to `window_ms` (or until
+    `max_batch` are waiting) and routes them with one llm_route_batch call.
+
+    - a batch of one uses the normal single-utterance prompt
+    - identical requests in a batch are sent once
+    - if the batched reply cannot be parsed, the batch is retried
+      as individual llm_route calls
+    - the batch itself runs outside any turn's budget; each caller
+      stops waiting when its own budget runs out
+    """
+
+    def __init__(self, window_ms: float = ROUTE_BATCH_WINDOW_MS, max_batch: int = ROUTE_BATCH_MAX):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._pending = []  # (user_input, allowed_actions, future)
+        self._timer = None
+        self._sending = set()
+
+        self.requests = 0
+        self.batches = 0
+        self.largest_batch = 0
+        self.parse_fallbacks = 0
+
+    async def route(self, user_input: str, allowed_actions):
+        """Same contract as llm_router.llm_route."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((user_input, tuple(allowed_actions), future))
+        self.requests += 1
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+
+        return await wait_within_budget(future)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        task = asyncio.get_running_loop().create_task(self._send(batch), context=contextvars.Context())
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def _send(self, batch):
+        # One entry per distinct request
+        requests = list(dict.fromkeys((user_input, actions) for user_input, actions, _ in batch))
+        self.batches += 1
+        self.largest_batch = max(self.largest_batch, len(requests))
+
+        if len(requests) == 1:
+            results = await asyncio.gather(llm_router.llm_route(*requests[0]), return_exceptions=True)
+        else:
+            try:
+                results = await llm_router.llm_route_batch(requests)
+            except ValueError as e:
+                self.parse_fallbacks += 1
+                log_event(
+                    log, "batch_reply_unusable", level=logging.ERROR,
+                    batch_size=len(requests), error=str(e),
+                )
+                results = await asyncio.gather(
+                    *(llm_router.llm_route(*request) for request in requests),
+                    return_exceptions=True,
+                )
+            except Exception as e:
+                results = [e] * len(requests)
+
+        answers = dict(zip(requests, results))
+        for user_input, actions, future in batch:
+            if future.done():  # caller gave up
+                continue
+            result = answers[(user_input, actions)]
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+            "requests": self.requests,
+            "batches": self.batches,
+            "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "parse_fallbacks": self.parse_fallbacks,
+        }
+
+
+ROUTE_BATCHER = RouteBatcher()
+
+
+async def llm_route(user_input: str, allowed_actions):
+    """llm_router.llm_route, through the batcher when ROUTE_BATCHING is on."""
+    # The local router answers in microseconds; nothing to batch
+    if ROUTE_BATCHING and llm_router.INTENT_ROUTER != "local":
+        return await ROUTE_BATCHER.route(user_input, allowed_actions)
+    return await llm_router.llm_route(user_input, allowed_actions)
@@ -0,0 +1,81 @@
+import hashlib
+import os
+
+from app import llm_router, route_batcher
+from app.cache import TTLCache, RedisCacheBackend
+from app.intent_classifier import normalize
+
+
+# ============================================================
+# Memoized intent routing
+# ============================================================
+# llm_route runs at temperature=0, so the same normalized input with
+# the same action set always maps to the same action. Results are kept
+# in a bounded local LRU/TTL cache and, optionally, in Redis so that
+# several workers share them.
+# ============================================================
+
+ROUTE_CACHE_SIZE = int(os.getenv("ROUTE_CACHE_SIZE", "10000"))
+ROUTE_CACHE_TTL = float(os.getenv("ROUTE_CACHE_TTL", "3600"))
+ROUTE_CACHE_REDIS_URL = os.getenv("ROUTE_CACHE_REDIS_URL")
+
+# Stored in place of None so "unclear" answers are cached too
+_NO_ACTION = "none"
+
+local_cache = TTLCache(maxsize=ROUTE_CACHE_SIZE, ttl=ROUTE_CACHE_TTL)
+shared_cache = (
+    RedisCacheBackend(ROUTE_CACHE_REDIS_URL, prefix="route:", ttl=ROUTE_CACHE_TTL)
+    if ROUTE_CACHE_REDIS_URL
+    else None
+)
+
+
+def cache_key(user_input: str, allowed_actions) -> str:
+    """(normalized input, sorted allowed actions, deployment name) as a string key."""
+    return "\x1f".join([
+        normalize(user_input),
+        ",".join(sorted(allowed_actions)),
+        llm_router.deployment_name() or "",
+    ])
+
+
+def _shared_key(key: str) -> str:
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+async def cached_llm_route(user_input: str, allowed_actions):
+    """
+    llm_route with memoization.
+
+    Lookup order: local cache -> shared cache -> LLM (batched when
+    ROUTE_BATCHING is on).
+    Returns the action string or None, exactly like llm_route.
+    """
+    key = cache_key(user_input, allowed_actions)
+
+    cached = local_cache.get(key)
+    if cached is not None:
+        return None if cached == _NO_ACTION else cached
+
+    if shared_cache is not None:
+        cached = await shared_cache.get(_shared_key(key))
+        if cached is not None:
+            local_cache.set(key, cached)
+            return None if cached == _NO_ACTION else cached
+
+    action = await route_batcher.llm_route(user_input, allowed_actions)
+
+    value = action or _NO_ACTION
+    local_cache.set(key, value)
+    if shared_cache is not None:
+        await shared_cache.set(_shared_key(key), value)
+
+    return action
+
+
+def stats() -> dict:
+    """Cache counters for /health."""
+    report = local_cache.stats()
+    if shared_cache is not None:
+        report.update(shared_cache.stats())
+    return report
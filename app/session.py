@@ -0,0 +1,335 @@
+import json
+import struct
+import sys
+import zlib
+from collections.abc import MutableMapping
+from operator import attrgetter
+
+from app.flow import get_flow
+
+# ============================================================
+# Compact call session
+# ============================================================
+# A Session behaves like the dict handle_turn has always used
+# (session["state"], session.get("ended"), "caller_id" in session,
+# session.pop(...)), but holds its fields in slots:
+# - state names as the flow's own (interned) strings, so reading the
+#   hottest key is a plain slot access; encode() turns them into
+#   small integer IDs
+# - phone numbers as strings (an int phone number is taken as its
+#   digits), so reading one needs no conversion; encode() packs
+#   digit strings into integers
+# - greeted / ended / speculative_lookup as bits of one int
+# - loan statuses interned
+# Keys it has no slot for go to a small overflow dict, so new session
+# keys keep working before they get a slot.
+#
+# None means "not set": storing None (or False for a flag) removes the
+# key, as in the code that reads sessions, where both mean the same.
+#
+# encode() / Session.decode() is the binary form for external stores
+# and session tokens (layout below). A state name that is not in the
+# flow is not encoded and reads back as unset (the start state).
+# ============================================================
+
+# State ID = index in STATE_NAMES. Sorted, so the same flow always gives
+# the same IDs; FLOW_ID tells flows apart in encoded sessions.
+STATE_NAMES = tuple(sorted(get_flow()))
+STATE_IDS = {name: i for i, name in enumerate(STATE_NAMES)}
+_STATE_STRINGS = {name: name for name in STATE_NAMES}
+FLOW_ID = zlib.crc32("\n".join(STATE_NAMES).encode())
+
+GREETED = 1
+ENDED = 2
+SPECULATIVE_LOOKUP = 4
+FLAGS = {"greeted": GREETED, "ended": ENDED, "speculative_lookup": SPECULATIVE_LOOKUP}
+
+# How each slotted key is stored
+_STATE, _PHONE, _TEXT, _OBJECT, _FLAG = range(5)
+FIELDS = {
+    "state": ("_state", _STATE),
+    "last_prompted_state": ("_last_prompted_state", _STATE),
+    "caller_id": ("_caller_id", _PHONE),
+    "phone": ("_phone", _PHONE),
+    "loan_status": ("_loan_status", _TEXT),
+    "caller_id_status": ("_caller_id_status", _TEXT),
+    "version": ("_version", _OBJECT),
+    # States visited by the current turn; not encoded
+    "trace": ("_trace", _OBJECT),
+}
+# Every known key in one table, so an access is a single lookup
+_KEYS = {**FIELDS, **{key: (flag, _FLAG) for key, flag in FLAGS.items()}}
+
+
+# ------------------------------------------------------------
+# Encoding, format version 1 (little-endian):
+#   header: version u8, FLOW_ID u32, flags u8, state u16,
+#           last_prompted_state u16 (NO_STATE if unset), version u32
+#   then per set field: tag u8 followed by
+#   - tag with INT_TAG set: u64 (a phone number's digits, prefixed
+#                           with "1" so leading zeros survive)
+#   - otherwise:            u16 length + UTF-8 text
+#   EXTRA_TAG holds the overflow keys as compact JSON.
+# A text (or the JSON) over MAX_TEXT_BYTES cannot be encoded.
+# A change to this layout needs a new FORMAT_VERSION.
+# ------------------------------------------------------------
+FORMAT_VERSION = 1
+NO_STATE = 0xFFFF
+INT_TAG = 0x80
+EXTRA_TAG = 0x7F
+MAX_TEXT_BYTES = 0xFFFF
+_HEADER = struct.Struct("<BIBHHI")
+_TAG_INT = struct.Struct("<BQ")
+_TAG_LEN = struct.Struct("<BH")
+_TAGGED_SLOTS = (
+    (1, "_caller_id"),
+    (2, "_phone"),
+    (3, "_loan_status"),
+    (4, "_caller_id_status"),
+)
+_TAG_SLOTS = dict(_TAGGED_SLOTS)
+_PHONE_TAGS = (1, 2)  # caller_id, phone: packed as integers when all digits
+# For error messages: the session key of each tag (slot "_caller_id" -> "caller_id")
+_TAG_KEYS = {tag: slot[1:] for tag, slot in _TAGGED_SLOTS}
+_TAG_KEYS[EXTRA_TAG] = "overflow keys"
+
+
+def _pack_text(tag: int, text: bytes) -> bytes:
+    if len(text) > MAX_TEXT_BYTES:
+        raise ValueError(
+            f"Session {_TAG_KEYS[tag]} too long to encode: {len(text)} bytes (max {MAX_TEXT_BYTES})"
+        )
+    return _TAG_LEN.pack(tag, len(text)) + text
+
+
+def _store(kind: int, value):
+    if kind == _STATE:
+        # The flow's own string, shared by every session
+        return _STATE_STRINGS.get(value, value)
+    if kind == _PHONE and type(value) is int:
+        # A caller ID sent as a JSON number
+        return str(value)
+    if kind == _TEXT and isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+# ------------------------------------------------------------
+# Reading a key: one getter per known key, the stored value (None if
+# unset). All but the flags are a C-level attrgetter.
+# ------------------------------------------------------------
+def _flag_getter(flag: int):
+    def get(session):
+        return True if session._flags & flag else None
+    return get
+
+
+_GETTERS = {
+    key: _flag_getter(slot) if kind == _FLAG else attrgetter(slot)
+    for key, (slot, kind) in _KEYS.items()
+}
+
+
+class Session(MutableMapping):
+    """One call's conversation state (see the module comment)."""
+
+    __slots__ = (
+        "_state",
+        "_last_prompted_state",
+        "_caller_id",
+        "_phone",
+        "_loan_status",
+        "_caller_id_status",
+        "_version",
+        "_trace",
+        "_flags",
+        "_extra",
+    )
+
+    def __init__(self, fields: dict = None):
+        self._state = self._last_prompted_state = None
+        self._caller_id = self._phone = None
+        self._loan_status = self._caller_id_status = None
+        self._version = self._trace = None
+        self._flags = 0
+        self._extra = None
+        if fields:
+            for key, value in fields.items():
+                self[key] = value
+
+    @classmethod
+    def of(cls, session) -> "Session":
+        """`session` itself if it is a Session, else a Session with its items."""
+        return session if isinstance(session, cls) else cls(session)
+
+    # --------------------------------------------------------
+    # Mapping protocol
+    # --------------------------------------------------------
+    def get(self, key, default=None):
+        # The hottest keys (read several times a turn) as plain slot reads
+        if key == "state":
+            value = self._state
+        elif key == "ended":
+            value = True if self._flags & ENDED else None
+        else:
+            getter = _GETTERS.get(key)
+            if getter is None:
+                return default if self._extra is None else self._extra.get(key, default)
+            value = getter(self)
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __setitem__(self, key, value):
+        if key == "state":
+            # The flow's own string, shared by every session
+            self._state = _STATE_STRINGS.get(value, value)
+            return
+        field = _KEYS.get(key)
+        if field is not None:
+            slot, kind = field
+            if kind == _FLAG:
+                self._flags = self._flags | slot if value else self._flags & ~slot
+            elif kind == _OBJECT or value is None:
+                setattr(self, slot, value)
+            else:
+                setattr(self, slot, _store(kind, value))
+            return
+        if value is None:
+            if self._extra is not None:
+                self._extra.pop(key, None)
+            return
+        if self._extra is None:
+            self._extra = {}
+        self._extra[key] = value
+
+    def pop(self, key, *default):
+        """Like dict.pop, in one lookup (MutableMapping.pop takes four)."""
+        value = self.get(key)
+        if value is None:
+            if default:
+                return default[0]
+            raise KeyError(key)
+        self[key] = None
+        return value
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self[key] = None
+
+    def __iter__(self):
+        return (key for key, _ in self.items())
+
+    def items(self):
+        """(key, value) pairs of the set keys, without a lookup per key."""
+        pairs = []
+        for key, (slot, _) in FIELDS.items():
+            value = getattr(self, slot)
+            if value is not None:
+                pairs.append((key, value))
+        if self._flags:
+            pairs.extend((key, True) for key, flag in FLAGS.items() if self._flags & flag)
+        if self._extra:
+            pairs.extend(self._extra.items())
+        return pairs
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"Session({dict(self)!r})"
+
+    def fingerprint(self) -> tuple:
+        """Equal for sessions with equal contents (the turn trace left out); cheaper than encode()."""
+        return (
+            self._state, self._last_prompted_state, self._caller_id, self._phone,
+            self._loan_status, self._caller_id_status, self._version, self._flags,
+            json.dumps(self._extra, sort_keys=True, default=str) if self._extra else None,
+        )
+
+    # --------------------------------------------------------
+    # Binary encoding
+    # --------------------------------------------------------
+    def encode(self) -> bytes:
+        """
+        The session in the current FORMAT_VERSION (the turn trace is left out).
+
+        Raises ValueError if a text field is over MAX_TEXT_BYTES.
+        """
+        out = bytearray(_HEADER.pack(
+            FORMAT_VERSION,
+            FLOW_ID,
+            self._flags,
+            STATE_IDS.get(self._state, NO_STATE),
+            STATE_IDS.get(self._last_prompted_state, NO_STATE),
+            self._version or 0,
+        ))
+        for tag, slot in _TAGGED_SLOTS:
+            value = getattr(self, slot)
+            if value is None:
+                continue
+            # At most 18 digits, so "1" + digits (keeping leading zeros) fits a u64
+            if tag in _PHONE_TAGS and isinstance(value, str) and value.isdigit() and len(value) <= 18:
+                out += _TAG_INT.pack(tag | INT_TAG, int("1" + value))
+            else:
+                out += _pack_text(tag, str(value).encode())
+        if self._extra:
+            out += _pack_text(EXTRA_TAG, json.dumps(self._extra, separators=(",", ":")).encode())
+        return bytes(out)
+
+    @classmethod
+    def decode(cls, data: bytes) -> "Session":
+        """
+        Session from encode() output.
+
+        Raises ValueError for another format version, a session encoded
+        with a different flow, or malformed data.
+        """
+        try:
+            version, flow_id, flags, state, last_prompted, session_version = _HEADER.unpack_from(data)
+        except struct.error as e:
+            raise ValueError(f"Bad session data: {e}") from None
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unknown session format version {version}")
+        if flow_id != FLOW_ID:
+            raise ValueError("Session was encoded for a different flow")
+
+        session = cls()
+        session._flags = flags
+        try:
+            session._state = None if state == NO_STATE else STATE_NAMES[state]
+            session._last_prompted_state = None if last_prompted == NO_STATE else STATE_NAMES[last_prompted]
+        except IndexError:
+            raise ValueError("Bad session data: unknown state ID") from None
+        session._version = session_version or None
+
+        pos = _HEADER.size
+        try:
+            while pos < len(data):
+                tag = data[pos]
+                if tag & INT_TAG:
+                    _, value = _TAG_INT.unpack_from(data, pos)
+                    value = str(value)[1:]
+                    pos += _TAG_INT.size
+                else:
+                    _, length = _TAG_LEN.unpack_from(data, pos)
+                    pos += _TAG_LEN.size
+                    value = data[pos:pos + length].decode()
+                    pos += length
+                if tag == EXTRA_TAG:
+                    session._extra = json.loads(value)
+                    continue
+                slot = _TAG_SLOTS[tag & ~INT_TAG]
+                setattr(session, slot, value if tag & INT_TAG else sys.intern(value))
+        except (struct.error, KeyError, UnicodeDecodeError) as e:
+            raise ValueError(f"Bad session data: {e!r}") from None
+        return session
+
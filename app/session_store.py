@@ -0,0 +1,324 @@
+import base64
+import hashlib
+import hmac
+import os
+import struct
+import time
+
+from app.cache import TTLCache
+from app.session import Session
+
+
+# ============================================================
+# Session stores
+# ============================================================
+# /chat loads a session, runs handle_turn and writes it back.
+# Backends:
+# - memory:    in-process LRU with idle-TTL eviction (default)
+# - redis:     shared across uvicorn workers / nodes
+# - ephemeral: in-process, drops a session as soon as it has ended
+# - token:     no server-side state; the session goes back to the
+#              client as a signed token with every reply
+#
+# Sessions are app.session.Session objects; redis and token hold them
+# in its binary encoding.
+#
+# With redis or token, any worker or node can serve any turn. Writes
+# are optimistic: a session carries the version it was loaded at, and
+# put_if_unchanged refuses to overwrite a newer one (another turn of
+# the same call got there first); /chat then reruns the turn on the
+# newer session.
+# ============================================================
+
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")
+SESSION_MAX = int(os.getenv("SESSION_MAX", "100000"))
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "1800"))
+SESSION_REDIS_URL = os.getenv("SESSION_REDIS_URL", "redis://localhost:6379/0")
+# Shared by every worker signing and checking session tokens
+SESSION_TOKEN_SECRET = os.getenv("SESSION_TOKEN_SECRET", "")
+# How often a turn is rerun after losing an optimistic write
+SESSION_CONFLICT_RETRIES = int(os.getenv("SESSION_CONFLICT_RETRIES", "2"))
+
+# Session key holding the number of writes so far
+VERSION_KEY = "version"
+
+
+
+class SessionStore:
+    """Interface every backend implements."""
+
+    # True when sessions travel with the client (see TokenSessionStore)
+    stateless = False
+    # True when sessions live in this process (one worker sees every turn)
+    local = False
+
+    async def get(self, session_id: str):
+        """Returns the session dict, or None if unknown/expired."""
+        raise NotImplementedError
+
+    async def put(self, session_id: str, session: dict):
+        raise NotImplementedError
+
+    async def put_if_unchanged(self, session_id: str, session: dict) -> bool:
+        """
+        Optimistic write of a session loaded with get().
+
+        Stores it only if the stored copy still has the version it was
+        loaded at, and bumps the version.
+
+        Output:
+        - False (nothing written) if another turn wrote it meanwhile
+
+        This default is atomic within one event loop only; the memory
+        stores hand out the stored dict itself, so there it always
+        succeeds. Shared backends override it.
+        """
+        stored = await self.get(session_id)
+        if stored is not None and stored is not session and stored.get(VERSION_KEY) != session.get(VERSION_KEY):
+            return False
+        session[VERSION_KEY] = session.get(VERSION_KEY, 0) + 1
+        await self.put(session_id, session)
+        return True
+
+    async def delete(self, session_id: str) -> bool:
+        raise NotImplementedError
+
+    async def size(self) -> int:
+        raise NotImplementedError
+
+    async def stats(self) -> dict:
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Sessions in process memory.
+
+    Bounded by max_sessions (least recently used evicted first) and
+    idle_ttl (a session not written for idle_ttl seconds expires).
+    """
+
+    local = True
+
+    def __init__(self, max_sessions: int = SESSION_MAX, idle_ttl: float = SESSION_IDLE_TTL):
+        self._sessions = TTLCache(maxsize=max_sessions, ttl=idle_ttl)
+
+    async def get(self, session_id: str):
+        return self._sessions.get(session_id, count=False)
+
+    async def put(self, session_id: str, session: dict):
+        # Every write restarts the idle timer
+        self._sessions.set(session_id, session)
+
+    async def delete(self, session_id: str) -> bool:
+        return self._sessions.delete(session_id)
+
+    async def size(self) -> int:
+        return len(self._sessions)
+
+    async def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "size": len(self._sessions),
+            "max_sessions": self._sessions.maxsize,
+            "evictions": self._sessions.evictions,
+            "expirations": self._sessions.expirations,
+        }
+
+
+class EphemeralSessionStore(MemorySessionStore):
+    """
+    Memory store that forgets a call the moment it has ended.
+
+    A later message on the same session_id starts a new call.
+    """
+
+    def __init__(self, max_sessions: int = SESSION_MAX, idle_ttl: float = SESSION_IDLE_TTL):
+        super().__init__(max_sessions, idle_ttl)
+        self.dropped = 0
+
+    async def put(self, session_id: str, session: dict):
+        if session.get("ended"):
+            self._sessions.delete(session_id)
+            self.dropped += 1
+            return
+        await super().put(session_id, session)
+
+    async def stats(self) -> dict:
+        report = await super().stats()
+        report["backend"] = "ephemeral"
+        report["dropped_ended"] = self.dropped
+        return report
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Sessions as encoded Session bytes in Redis, with the idle TTL as
+    key expiry. Values that do not decode (an older format, another
+    flow) read as no session.
+
+    Any client speaking the redis.asyncio API and returning bytes works,
+    including fakeredis.aioredis.FakeRedis() for local runs.
+    Requires the optional `redis` package unless a client is passed in.
+    """
+
+    def __init__(self, client=None, url: str = SESSION_REDIS_URL,
+                 idle_ttl: float = SESSION_IDLE_TTL, prefix: str = "session:"):
+        if client is None:
+            import redis.asyncio as redis
+            client = redis.from_url(url)
+
+        self.redis = client
+        self.idle_ttl = int(idle_ttl)
+        self.prefix = prefix
+        self.deleted = 0
+        self.conflicts = 0
+
+    @staticmethod
+    def _decode(raw):
+        if raw is None:
+            return None
+        try:
+            return Session.decode(raw)
+        except ValueError:
+            return None
+
+    async def get(self, session_id: str):
+        return self._decode(await self.redis.get(self.prefix + session_id))
+
+    async def put(self, session_id: str, session: dict):
+        await self.redis.set(self.prefix + session_id, Session.of(session).encode(), ex=self.idle_ttl)
+
+    async def put_if_unchanged(self, session_id: str, session: dict) -> bool:
+        # WATCH/MULTI: the SET is dropped if the key changes after WATCH
+        from redis.exceptions import WatchError
+
+        key = self.prefix + session_id
+        loaded_version = session.get(VERSION_KEY)
+        async with self.redis.pipeline() as pipe:
+            try:
+                await pipe.watch(key)
+                stored = self._decode(await pipe.get(key))
+                if stored is not None and stored.get(VERSION_KEY) != loaded_version:
+                    self.conflicts += 1
+                    return False
+                session[VERSION_KEY] = (loaded_version or 0) + 1
+                pipe.multi()
+                pipe.set(key, Session.of(session).encode(), ex=self.idle_ttl)
+                await pipe.execute()
+            except WatchError:
+                session[VERSION_KEY] = loaded_version
+                self.conflicts += 1
+                return False
+        return True
+
+    async def delete(self, session_id: str) -> bool:
+        removed = await self.redis.delete(self.prefix + session_id)
+        self.deleted += removed
+        return bool(removed)
+
+    async def size(self) -> int:
+        """Sessions under the prefix: a full SCAN, O(keys), so not part of stats()."""
+        count = 0
+        async for _ in self.redis.scan_iter(match=self.prefix + "*", count=1000):
+            count += 1
+        return count
+
+    async def stats(self) -> dict:
+        # Idle expiry is done by Redis itself, so only explicit deletes are
+        # counted. No size: /health and /metrics must not scan a shared Redis
+        return {
+            "backend": "redis",
+            "idle_ttl": self.idle_ttl,
+            "deleted": self.deleted,
+            "conflicts": self.conflicts,
+        }
+
+
+_ISSUED_AT = struct.Struct("<I")
+
+
+class TokenSessionStore(SessionStore):
+    """
+    Sessions kept by the client: each reply carries the session as a
+    signed token, which the client sends back with its next message.
+
+    Token: base64url(issued_at u32 + encoded Session) "." base64url(HMAC-SHA256)
+    Tokens that are tampered with, signed with another secret or older
+    than idle_ttl are rejected, and the message starts a new call.
+
+    Nothing is stored, so get/put are no-ops; there is no server copy
+    for two concurrent turns to conflict on, and replaying an old token
+    replays its state.
+    """
+
+    stateless = True
+
+    def __init__(self, secret: str = SESSION_TOKEN_SECRET, idle_ttl: float = SESSION_IDLE_TTL):
+        if not secret:
+            raise ValueError("SESSION_STORE=token needs SESSION_TOKEN_SECRET")
+        self._key = secret.encode()
+        self.idle_ttl = idle_ttl
+        self.issued = 0
+        self.accepted = 0
+        self.rejected = 0
+
+    def _sign(self, body: bytes) -> bytes:
+        return base64.urlsafe_b64encode(hmac.digest(self._key, body, hashlib.sha256)).rstrip(b"=")
+
+    def encode(self, session: dict) -> str:
+        payload = _ISSUED_AT.pack(int(time.time())) + Session.of(session).encode()
+        body = base64.urlsafe_b64encode(payload).rstrip(b"=")
+        self.issued += 1
+        return (body + b"." + self._sign(body)).decode()
+
+    def decode(self, token: str):
+        """Returns the session in `token`, or None if it is not valid."""
+        try:
+            body, signature = token.encode().split(b".")
+            if not hmac.compare_digest(signature, self._sign(body)):
+                raise ValueError("bad signature")
+            payload = base64.urlsafe_b64decode(body + b"==")
+            (issued_at,) = _ISSUED_AT.unpack_from(payload)
+            if time.time() - issued_at > self.idle_ttl:
+                raise ValueError("expired")
+            session = Session.decode(payload[_ISSUED_AT.size:])
+        except (ValueError, AttributeError, struct.error):
+            self.rejected += 1
+            return None
+        self.accepted += 1
+        return session
+
+    async def get(self, session_id: str):
+        return None
+
+    async def put(self, session_id: str, session: dict):
+        pass
+
+    async def delete(self, session_id: str) -> bool:
+        return False
+
+    async def size(self) -> int:
+        return 0
+
+    async def stats(self) -> dict:
+        return {
+            "backend": "token",
+            "size": 0,
+            "issued": self.issued,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+        }
+
+
+def create_session_store(kind: str = SESSION_STORE) -> SessionStore:
+    """Builds the store selected by SESSION_STORE."""
+    if kind == "memory":
+        return MemorySessionStore()
+    if kind == "ephemeral":
+        return EphemeralSessionStore()
+    if kind == "redis":
+        return RedisSessionStore()
+    if kind == "token":
+        return TokenSessionStore()
+    raise ValueError(f"Unknown SESSION_STORE: {kind!r}")
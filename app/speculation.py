@@ -0,0 +1,110 @@
+import asyncio
+import os
+
+from app.cache import TTLCache
+from app.integrations.loan_repository import get_loan_repository
+
+SPECULATIVE_LOOKUP = os.getenv("SPECULATIVE_LOOKUP", "1") != "0"
+
+# Pending lookups for calls that never reach verification are
+# forgotten after this long (or when the table is full)
+SPECULATION_TTL = float(os.getenv("SPECULATION_TTL", "300"))
+SPECULATION_MAX = int(os.getenv("SPECULATION_MAX", "100000"))
+
+
+def _retrieve_exception(task: asyncio.Task):
+    # A failed speculative lookup is simply not used; don't log it as unhandled
+    if not task.cancelled():
+        task.exception()
+
+
+class CallerIdSpeculation:
+    """
+    Starts the caller-ID loan lookup while the greeting is being spoken.
+
+    Session keys:
+    - speculative_lookup: True while a speculation is outstanding
+    - caller_id_status:   its result, copied in once the lookup finished
+
+    The task itself stays in this process; a turn served elsewhere just
+    falls back to a normal lookup.
+    """
+
+    def __init__(self, maxsize: int = SPECULATION_MAX, ttl: float = SPECULATION_TTL):
+        self._tasks = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.started = 0
+        self.used = 0
+        self.wasted = 0
+        self.missed = 0
+
+    def start(self, session: dict):
+        """Kick off the lookup for session["caller_id"] in the background."""
+        if not SPECULATIVE_LOOKUP:
+            return
+        caller_id = session["caller_id"]
+        task = asyncio.ensure_future(get_loan_repository().lookup(caller_id))
+        task.add_done_callback(_retrieve_exception)
+        self._tasks.set(caller_id, task)
+        session["speculative_lookup"] = True
+        self.started += 1
+
+    def collect(self, session: dict):
+        """Copies a finished lookup result onto the session."""
+        if not session.get("speculative_lookup") or "caller_id_status" in session:
+            return
+        caller_id = session["caller_id"]
+        task = self._tasks.get(caller_id, count=False)
+        if task is None or not task.done():
+            return
+        self._tasks.delete(caller_id)
+        if not task.cancelled() and task.exception() is None:
+            session["caller_id_status"] = task.result()
+
+    async def take(self, session: dict):
+        """
+        Result of the speculative lookup, waiting for it if still running.
+
+        Output:
+        - the status, or None when there is nothing to use
+        """
+        if not session.pop("speculative_lookup", False):
+            return None
+
+        status = session.pop("caller_id_status", None)
+        if status is None:
+            caller_id = session["caller_id"]
+            task = self._tasks.get(caller_id, count=False)
+            self._tasks.delete(caller_id)
+            if task is not None:
+                try:
+                    status = await task
+                except Exception:
+                    status = None
+
+        if status is None:
+            self.missed += 1
+        else:
+            self.used += 1
+        return status
+
+    def discard(self, session: dict):
+        """The call is over without needing the speculative result."""
+        if not session.pop("speculative_lookup", False):
+            return
+        session.pop("caller_id_status", None)
+        self._tasks.delete(session["caller_id"])
+        self.wasted += 1
+
+    def stats(self) -> dict:
+        finished = self.used + self.wasted + self.missed
+        return {
+            "started": self.started,
+            "used": self.used,
+            "wasted": self.wasted,
+            "missed": self.missed,
+            "pending": len(self._tasks),
+            "use_rate": round(self.used / finished, 3) if finished else 0.0,
+        }
+
+
+CALLER_ID_SPECULATION = CallerIdSpeculation()
@@ -0,0 +1,45 @@
+import json
+import re
+from contextvars import ContextVar
+
+# ============================================================
+# Token streaming
+# ============================================================
+# While a streaming request is being served, token_sink holds a
+# callable that receives each text delta produced by the free-text
+# LLM calls. Outside of streaming requests it is None and the LLM
+# calls behave exactly as before.
+# ============================================================
+
+token_sink: ContextVar = ContextVar("token_sink", default=None)
+
+# A sentence ends at . ! or ? followed by whitespace
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def split_sentences(text: str) -> list[str]:
+    """Splits finished text into speakable sentences."""
+    return [s for s in (part.strip() for part in _SENTENCE_END.split(text)) if s]
+
+
+class SentenceChunker:
+    """Accumulates streamed tokens and releases complete sentences."""
+
+    def __init__(self):
+        self._buffer = ""
+
+    def feed(self, token: str) -> list[str]:
+        self._buffer += token
+        parts = _SENTENCE_END.split(self._buffer)
+        # The last part may still be growing
+        self._buffer = parts.pop()
+        return [p.strip() for p in parts if p.strip()]
+
+    def flush(self) -> list[str]:
+        rest, self._buffer = self._buffer.strip(), ""
+        return [rest] if rest else []
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Formats one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
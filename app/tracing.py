@@ -0,0 +1,99 @@
+import os
+import time
+from collections import deque
+from contextvars import ContextVar
+
+from app.metrics import REGISTRY
+
+# ============================================================
+# Per-turn spans
+# ============================================================
+# span("name", **attrs) times a stage of a turn (state resolution,
+# a state's handler, a loan lookup, an LLM call). With TRACING=1
+# each span is recorded in loan_agent_span_seconds{span=...} and in
+# the current turn's trace; the last TRACE_BUFFER turn traces are
+# served on /traces.
+#
+# With tracing off (the default) span() returns one shared no-op
+# context manager, so an instrumented stage costs a function call.
+# ============================================================
+
+TRACING = os.getenv("TRACING", "0") != "0"
+TRACE_BUFFER = int(os.getenv("TRACE_BUFFER", "100"))
+
+SPAN_SECONDS = REGISTRY.histogram("span_seconds", "Duration of traced turn stages", ("span",))
+
+# Spans of the turn being handled: [(name, start offset, duration, attrs, error)]
+current_trace: ContextVar = ContextVar("current_trace", default=None)
+
+RECENT_TRACES = deque(maxlen=TRACE_BUFFER)
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NO_SPAN = _NoSpan()
+
+
+class Span:
+    __slots__ = ("name", "attrs", "start")
+
+    def __init__(self, name: str, attrs: dict):
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        SPAN_SECONDS.observe(duration, self.name)
+        trace = current_trace.get()
+        if trace is not None:
+            error = exc_type.__name__ if exc_type is not None else None
+            trace[1].append((self.name, self.start - trace[0], duration, self.attrs, error))
+        return False
+
+
+def span(name: str, **attrs):
+    """Times the enclosed block as one stage of the current turn."""
+    if not TRACING:
+        return NO_SPAN
+    return Span(name, attrs)
+
+
+def start_trace():
+    """Starts collecting the current turn's spans. Returns the token for end_trace (None when off)."""
+    if not TRACING:
+        return None
+    return current_trace.set((time.perf_counter(), []))
+
+
+def end_trace(token, states=None):
+    if token is None:
+        return
+    started, spans = current_trace.get()
+    current_trace.reset(token)
+    RECENT_TRACES.append({
+        "started_at": time.time() - (time.perf_counter() - started),
+        "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+        "states": list(states or ()),
+        "spans": [
+            {
+                "name": name,
+                "start_ms": round(offset * 1000, 3),
+                "duration_ms": round(duration * 1000, 3),
+                **({"attrs": attrs} if attrs else {}),
+                **({"error": error} if error else {}),
+            }
+            for name, offset, duration, attrs, error in spans
+        ],
+    })
@@ -0,0 +1,100 @@
+"""
+Concurrent-call throughput: sync LLM client in a threadpool vs async pipeline.
+
+"before" reproduces the old `def /chat` behaviour: each call runs on one of
+the 40 worker threads Starlette gives sync routes and makes blocking
+completions through `AzureOpenAI`. "after" runs the same scripted call
+through the async `handle_turn` with the shared `AsyncAzureOpenAI` pool.
+
+Both talk to benchmarks/fake_azure.py, so no real deployment is used.
+
+Usage:
+    python -m benchmarks.bench_async_chat --calls 200 --latency-ms 800
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_azure import FakeAzureServer
+
+THREADPOOL_SIZE = 40  # Starlette / anyio default for sync endpoints
+
+# "no" -> keypad number -> "no" : two routing calls + one goodbye
+CALL_SCRIPT = ["", "no", "9999999999", "no"]
+
+
+def _configure_env(endpoint: str):
+    os.environ["AZURE_OPENAI_ENDPOINT"] = endpoint
+    os.environ["AZURE_OPENAI_API_KEY"] = "fake"
+    os.environ["AZURE_OPENAI_API_VERSION"] = "2024-06-01"
+    os.environ["AZURE_OPENAI_CHAT_DEPLOYMENT"] = "fake-gpt"
+
+
+def run_before(calls: int) -> float:
+    from openai import AzureOpenAI
+
+    client = AzureOpenAI(
+        azure_endpoint=os.environ["AZURE_OPENAI_ENDPOINT"],
+        api_key=os.environ["AZURE_OPENAI_API_KEY"],
+        api_version=os.environ["AZURE_OPENAI_API_VERSION"],
+    )
+    deployment = os.environ["AZURE_OPENAI_CHAT_DEPLOYMENT"]
+
+    def one_call(_):
+        # Same number of LLM round trips as CALL_SCRIPT
+        for content in ("no", "no", "goodbye"):
+            client.chat.completions.create(
+                model=deployment,
+                messages=[{"role": "user", "content": content}],
+                temperature=0,
+            )
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=THREADPOOL_SIZE) as pool:
+        list(pool.map(one_call, range(calls)))
+    return time.perf_counter() - start
+
+
+async def run_after(calls: int) -> float:
+    from app.conversation import handle_turn
+    from app import llm_router
+
+    async def one_call():
+        session = {}
+        for message in CALL_SCRIPT:
+            _, session = await handle_turn(message, session)
+        assert session.get("ended"), session
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_call() for _ in range(calls)))
+    elapsed = time.perf_counter() - start
+    await llm_router.aclose()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync vs async /chat throughput")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=800)
+    parser.add_argument("--port", type=int, default=8900)
+    args = parser.parse_args()
+
+    with FakeAzureServer(port=args.port, latency_ms=args.latency_ms) as fake:
+        _configure_env(fake.endpoint)
+
+        before = run_before(args.calls)
+        after = asyncio.run(run_after(args.calls))
+
+    print(f"calls={args.calls} llm_latency={args.latency_ms:.0f}ms")
+    for label, elapsed in (
+        (f"before (sync, {THREADPOOL_SIZE} threads)", before),
+        ("after  (async, shared pool)", after),
+    ):
+        print(f"{label:<30} {elapsed:6.2f}s  {args.calls / elapsed:7.1f} calls/s")
+
+
+if __name__ == "__main__":
+    main()
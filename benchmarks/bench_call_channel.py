@@ -0,0 +1,167 @@
+"""
+Per-turn overhead: HTTP POST /chat vs the /call/{session_id} WebSocket.
+
+Starts the agent under uvicorn (talking to benchmarks/fake_azure.py) and
+plays the same scripted calls through three client styles:
+
+- http new conn: one `POST /chat` per turn on a fresh connection,
+                 like the desktop clients' `requests.post`
+- http keep-alive: `POST /chat` over one pooled connection
+- websocket:     one socket per call, one frame per turn; the greeting
+                 is pushed on connect and counted as the first turn
+
+The script is answered by the intent fast path and the goodbye pool,
+so no LLM latency hides the transport cost.
+
+Usage:
+    python -m benchmarks.bench_call_channel --calls 200
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+from websockets.sync.client import connect
+
+from benchmarks.fake_azure import FakeAzureServer
+
+# "no" -> keypad number -> "no" : ends with a goodbye
+CALL_SCRIPT = ["", "no", "9999999999", "no"]
+
+
+class AgentServer:
+    """Runs app.main under uvicorn in a child process (`workers` worker processes)."""
+
+    def __init__(self, port: int, azure_endpoint: str, workers: int = 1, env: dict = None):
+        self.port = port
+        self.azure_endpoint = azure_endpoint
+        self.workers = workers
+        self.env = env or {}
+        self.process = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        env = dict(
+            os.environ,
+            AZURE_OPENAI_ENDPOINT=self.azure_endpoint,
+            AZURE_OPENAI_API_KEY="fake",
+            AZURE_OPENAI_API_VERSION="2024-06-01",
+            AZURE_OPENAI_CHAT_DEPLOYMENT="fake-gpt",
+            # The simulated callers pass their caller IDs in
+            CHAT_CALLER_ID="1",
+            **self.env,
+        )
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app",
+             "--port", str(self.port), "--log-level", "warning", "--workers", str(self.workers)],
+            env=env, stdout=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 15 + 5 * self.workers
+        while time.monotonic() < deadline:
+            try:
+                httpx.get(f"{self.url}/health", timeout=0.5)
+                return self
+            except httpx.TransportError:
+                time.sleep(0.05)
+        self.process.kill()
+        raise RuntimeError("agent server did not start")
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        self.process.wait()
+
+
+def call_http_new_connection(url: str) -> list[float]:
+    session_id = str(uuid.uuid4())
+    timings = []
+    for message in CALL_SCRIPT:
+        start = time.perf_counter()
+        httpx.post(f"{url}/chat", json={"session_id": session_id, "message": message}).json()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def call_http_keep_alive(client: httpx.Client) -> list[float]:
+    session_id = str(uuid.uuid4())
+    timings = []
+    for message in CALL_SCRIPT:
+        start = time.perf_counter()
+        client.post("/chat", json={"session_id": session_id, "message": message}).json()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def call_websocket(url: str) -> list[float]:
+    ws_url = url.replace("http://", "ws://") + f"/call/{uuid.uuid4()}"
+    timings = []
+
+    def wait_done():
+        while json.loads(ws.recv())["type"] != "done":
+            pass
+
+    start = time.perf_counter()
+    with connect(ws_url) as ws:
+        wait_done()  # greeting
+        timings.append(time.perf_counter() - start)
+        for message in CALL_SCRIPT[1:]:
+            start = time.perf_counter()
+            ws.send(json.dumps({"type": "utterance", "text": message}))
+            wait_done()
+            timings.append(time.perf_counter() - start)
+    return timings
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP vs WebSocket per-turn overhead")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--port", type=int, default=8920)
+    parser.add_argument("--azure-port", type=int, default=8921)
+    args = parser.parse_args()
+
+    with FakeAzureServer(port=args.azure_port, latency_ms=20) as fake, \
+            AgentServer(args.port, fake.endpoint) as agent, \
+            httpx.Client(base_url=agent.url) as client:
+
+        modes = {
+            "http new conn": lambda: call_http_new_connection(agent.url),
+            "http keep-alive": lambda: call_http_keep_alive(client),
+            "websocket": lambda: call_websocket(agent.url),
+        }
+
+        # Warm the goodbye pool, route cache and connections
+        for run_call in modes.values():
+            for _ in range(5):
+                run_call()
+
+        results = {}
+        for label, run_call in modes.items():
+            timings = []
+            for _ in range(args.calls):
+                timings.extend(run_call())
+            results[label] = timings
+
+    print(f"calls={args.calls} turns/call={len(CALL_SCRIPT)}")
+    print(f"{'':<16} {'mean ms':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for label, timings in results.items():
+        mean = sum(timings) / len(timings)
+        print(
+            f"{label:<16} {mean * 1000:8.3f} "
+            f"{percentile(timings, 0.5) * 1000:8.3f} {percentile(timings, 0.99) * 1000:8.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Load on the conversation engine itself: scripted calls through
+conversation.handle_turn, no HTTP in between.
+
+--calls calls (cycling through the paths in benchmarks/call_paths.py:
+caller-ID hit, keypad retry, agent handoff, SMS) run with --concurrency
+of them in progress at once. LLM calls go to benchmarks/fake_azure.py
+with --latency-ms; the goodbye pool is warmed first, as the app's
+startup does with GOODBYE_POOL_WARM=1. Reports:
+
+- throughput (calls/s and turns/s)
+- turn latency p50/p95/p99 per path, and whole-call duration per path
+- calls that did not end in the path's expected state
+- memory per mid-call session in the in-memory session store
+  (tracemalloc, after the greeting and first answer)
+
+The calls are played --rounds times and the fastest round is reported,
+which keeps other load on the machine out of the numbers.
+
+Usage:
+    python -m benchmarks.bench_engine --calls 2000 --concurrency 200
+    python -m benchmarks.bench_engine --json results.json
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import time
+import tracemalloc
+
+from benchmarks.call_paths import PATHS, path_schedule, latency_summary
+from benchmarks.fake_azure import FakeAzureServer
+
+
+def _configure_env(endpoint: str):
+    os.environ["AZURE_OPENAI_ENDPOINT"] = endpoint
+    os.environ["AZURE_OPENAI_API_KEY"] = "fake"
+    os.environ["AZURE_OPENAI_API_VERSION"] = "2024-06-01"
+    os.environ["AZURE_OPENAI_CHAT_DEPLOYMENT"] = "fake-gpt"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+
+def _session_type(new_session):
+    # Sessions as the app creates them, unless a type (e.g. dict) is given
+    if new_session is not None:
+        return new_session
+    from app.session import Session
+    return Session
+
+
+async def run_calls(calls: int, concurrency: int, new_session=None) -> dict:
+    from app.conversation import handle_turn
+
+    new_session = _session_type(new_session)
+    turn_seconds = {name: [] for name in PATHS}
+    call_seconds = {name: [] for name in PATHS}
+    wrong_end = {name: 0 for name in PATHS}
+    schedule = path_schedule(calls)
+    schedule.reverse()
+
+    async def caller():
+        while schedule:
+            name = schedule.pop()
+            path = PATHS[name]
+            session = new_session({"caller_id": path["caller_id"]})
+            call_start = time.perf_counter()
+            for utterance in path["turns"]:
+                start = time.perf_counter()
+                await handle_turn(utterance, session)
+                turn_seconds[name].append(time.perf_counter() - start)
+            call_seconds[name].append(time.perf_counter() - call_start)
+            if session.get("state") != path["expected"] or not session.get("ended"):
+                wrong_end[name] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(caller() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    turns = sum(len(t) for t in turn_seconds.values())
+    all_turns = [s for t in turn_seconds.values() for s in t]
+    return {
+        "calls_per_s": round(calls / elapsed, 1),
+        "turns_per_s": round(turns / elapsed, 1),
+        "turn": latency_summary(all_turns),
+        "paths": {
+            name: {
+                "calls": len(call_seconds[name]),
+                "wrong_end": wrong_end[name],
+                "turn": latency_summary(turn_seconds[name]),
+                "call": latency_summary(call_seconds[name]),
+            }
+            for name in PATHS
+        },
+    }
+
+
+async def session_memory(sessions: int, new_session=None) -> float:
+    """Bytes per mid-call session held in the in-memory session store."""
+    from app.conversation import handle_turn
+    from app.session_store import MemorySessionStore
+
+    new_session = _session_type(new_session)
+    store = MemorySessionStore(max_sessions=sessions + 1)
+    names = path_schedule(sessions)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i, name in enumerate(names):
+        path = PATHS[name]
+        session = new_session({"caller_id": path["caller_id"]})
+        for utterance in path["turns"][:2]:
+            await handle_turn(utterance, session)
+        await store.put(f"bench-{i}", session)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / sessions
+
+
+async def run(args) -> dict:
+    from app import llm_router
+    from app.goodbye_pool import GOODBYE_POOL
+
+    await GOODBYE_POOL.refresh(stagger=0)
+    await run_calls(min(200, args.calls), args.concurrency)  # warm up
+    rounds = [await run_calls(args.calls, args.concurrency) for _ in range(args.rounds)]
+    results = max(rounds, key=lambda r: r["calls_per_s"])
+    results["bytes_per_session"] = round(await session_memory(args.memory_sessions))
+    await llm_router.aclose()
+    return results
+
+
+def print_report(title: str, results: dict):
+    print(title)
+    print(f"throughput: {results['calls_per_s']} calls/s, {results['turns_per_s']} turns/s")
+    print(f"{'path':<14} {'calls':>6} {'wrong':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'call p50 ms':>12}")
+    for name, path in results["paths"].items():
+        turn = path["turn"]
+        print(
+            f"{name:<14} {path['calls']:>6} {path['wrong_end']:>6} {turn['p50_ms']:>8.2f} "
+            f"{turn['p95_ms']:>8.2f} {turn['p99_ms']:>8.2f} {path['call']['p50_ms']:>12.2f}"
+        )
+    if "bytes_per_session" in results:
+        print(f"memory: {results['bytes_per_session']} bytes per mid-call session")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scripted calls through handle_turn")
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--memory-sessions", type=int, default=5000)
+    parser.add_argument("--port", type=int, default=8906)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    with FakeAzureServer(args.port, args.latency_ms) as fake:
+        _configure_env(fake.endpoint)
+        results = asyncio.run(run(args))
+
+    print_report(
+        f"engine: calls={args.calls} concurrency={args.concurrency} llm_latency={args.latency_ms:g}ms "
+        f"(best of {args.rounds} rounds)",
+        results,
+    )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
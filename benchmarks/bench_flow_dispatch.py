@@ -0,0 +1,84 @@
+"""
+Per-turn dispatch cost: raw flow dict vs compiled FlowNode.
+
+Times only the work handle_turn does to classify a node and build its
+outputs (action checks, allowed actions, prompt rendering and the
+"didn't understand" text), with no I/O.
+
+Usage:
+    python -m benchmarks.bench_flow_dispatch --iterations 200000
+"""
+
+import argparse
+import json
+import timeit
+
+from app.flow import compile_flow, ACTION, DECISION, PROMPT, PROMPT_NEXT, END
+
+FLOW_PATH = "flows/loan_status_flow.json"
+SESSION = {"loan_status": "APPROVED"}
+ACTION_NAMES = (
+    "verify_phone",
+    "get_keypad_input",
+    "verify_phone_from_caller_id",
+    "transfer_to_agent",
+    "generate_goodbye",
+    "llm_goodbye_after_sms",
+)
+
+
+def dispatch_raw(node: dict):
+    """The checks handle_turn made on the raw JSON dict."""
+    for name in ACTION_NAMES:
+        if node.get("action") == name:
+            return name
+    if "allowed_actions" in node:
+        actions = list(node["allowed_actions"].keys())
+        prompt = node.get("prompt", "")
+        if "{{status}}" in prompt:
+            prompt = prompt.replace("{{status}}", SESSION.get("loan_status", "UNKNOWN"))
+        options_text = " or ".join(f"'{opt}'" for opt in node["allowed_actions"].keys())
+        return actions, prompt, f"I didn't quite understand that. Please say {options_text}."
+    if "prompt" in node and "action" not in node and "allowed_actions" not in node:
+        return node.get("next")
+    if node.get("end"):
+        return True
+    return None
+
+
+def dispatch_compiled(node):
+    """The same decisions on a compiled FlowNode."""
+    kind = node.kind
+    if kind == ACTION:
+        return node.action
+    if kind == DECISION:
+        return node.actions, node.prompt.render(SESSION), node.unclear_text
+    if kind == PROMPT_NEXT or kind == PROMPT:
+        return node.next
+    if kind == END:
+        return True
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flow dispatch microbenchmark")
+    parser.add_argument("--iterations", type=int, default=200000)
+    args = parser.parse_args()
+
+    with open(FLOW_PATH) as f:
+        raw = json.load(f)
+    compiled = compile_flow(raw)
+
+    for state in ("status_response", "not_found", "handoff", "verify_caller_id"):
+        raw_node, node = raw[state], compiled[state]
+        t_raw = timeit.timeit(lambda: dispatch_raw(raw_node), number=args.iterations)
+        t_compiled = timeit.timeit(lambda: dispatch_compiled(node), number=args.iterations)
+        print(
+            f"{state:<18} raw {t_raw / args.iterations * 1e9:7.0f} ns   "
+            f"compiled {t_compiled / args.iterations * 1e9:7.0f} ns   "
+            f"x{t_raw / t_compiled:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
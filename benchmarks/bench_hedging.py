@@ -0,0 +1,115 @@
+"""
+Routing latency under a slow tail, with and without hedged LLM calls.
+
+The fake deployment answers in --latency-ms, except for --slow-rate of
+requests which take --slow-ms longer. Each routing request goes through
+conversation.route_intent inside a turn budget (TURN_BUDGET_SECONDS),
+with the route cache cleared so every request reaches the LLM. Reports
+p50/p99 per mode, how many requests were hedged and how many ran out of
+budget and were answered by the local matcher or a re-prompt.
+
+Usage:
+    python -m benchmarks.bench_hedging --requests 400 --slow-rate 0.05 --slow-ms 3000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+
+from benchmarks.fake_azure import FakeAzureServer
+
+# Utterances the fast path leaves to the LLM
+UTTERANCES = [
+    ("start", "i guess that would be fine", ("yes", "no")),
+    ("status_response", "rather not thanks", ("yes", "no")),
+    ("not_found", "i would rather talk to an agent", ("yes", "agent")),
+    ("not_found", "is there a person i can speak with", ("yes", "agent")),
+]
+
+
+def _configure_env(endpoint: str):
+    os.environ["AZURE_OPENAI_ENDPOINT"] = endpoint
+    os.environ["AZURE_OPENAI_API_KEY"] = "fake"
+    os.environ["AZURE_OPENAI_API_VERSION"] = "2024-06-01"
+    os.environ["AZURE_OPENAI_CHAT_DEPLOYMENT"] = "fake-gpt"
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run(requests: int, concurrency: int, seed: int = 5) -> list[float]:
+    from app import llm_budget, route_cache
+    from app.conversation import route_intent
+
+    rng = random.Random(seed)
+    latencies = []
+    queue = [rng.choice(UTTERANCES) for _ in range(requests)]
+
+    async def worker():
+        while queue:
+            state, utterance, actions = queue.pop()
+            route_cache.local_cache.clear()
+            started = time.monotonic()
+            token = llm_budget.start_turn()
+            try:
+                await route_intent(state, utterance, actions)
+            finally:
+                llm_budget.end_turn(token, started)
+            latencies.append(time.monotonic() - started)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+
+async def compare(args):
+    from app import llm_budget, llm_router
+
+    results = {}
+    for label, hedge in (("no hedging", False), ("hedged", True)):
+        llm_budget.LLM_HEDGE = hedge
+        stats = llm_budget.BUDGET_STATS
+        stats.__init__()
+        await run(40, args.concurrency)  # learn the latency distribution
+        learned = stats.latency
+        stats.__init__()
+        stats.latency = learned
+        latencies = await run(args.requests, args.concurrency)
+        results[label] = (latencies, llm_budget.BUDGET_STATS.snapshot())
+
+    await llm_router.aclose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hedged vs unhedged LLM routing")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--slow-ms", type=float, default=3000)
+    parser.add_argument("--port", type=int, default=8904)
+    args = parser.parse_args()
+
+    with FakeAzureServer(args.port, args.latency_ms, slow_rate=args.slow_rate, slow_ms=args.slow_ms) as fake:
+        _configure_env(fake.endpoint)
+        results = asyncio.run(compare(args))
+
+    from app.llm_budget import TURN_BUDGET_SECONDS
+    print(
+        f"requests={args.requests} llm_latency={args.latency_ms:g}ms "
+        f"slow={args.slow_rate:.0%} +{args.slow_ms:g}ms budget={TURN_BUDGET_SECONDS:g}s"
+    )
+    print(f"{'':<12} {'p50 ms':>8} {'p99 ms':>8} {'hedged':>7} {'wins':>5} {'timeouts':>9}  degraded")
+    for label, (latencies, stats) in results.items():
+        print(
+            f"{label:<12} {percentile(latencies, 0.5) * 1000:8.1f} {percentile(latencies, 0.99) * 1000:8.1f} "
+            f"{stats['hedged']:>7} {stats['hedge_wins']:>5} {stats['llm_timeouts']:>9}  {stats['degraded']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+HTTP load: thousands of simulated callers on POST /chat.
+
+Starts the agent under uvicorn (one worker, talking to
+benchmarks/fake_azure.py) and --callers callers, started evenly over
+--ramp-s seconds. Each caller plays one scripted call from
+benchmarks/call_paths.py, passing its caller ID with the first turn as
+the telephony side would, and pauses --think-ms (+/- 50%) between turns
+like a person listening and answering. Reports:
+
+- throughput (turns/s over the run, so bounded by the offered load:
+  callers / ramp and think time) and failed requests
+- turn latency p50/p95/p99 per path, as seen by the client
+- server memory per session: growth of the server's RSS divided by the
+  sessions left in its store
+
+Usage:
+    python -m benchmarks.bench_http_load --callers 2000 --ramp-s 20 --think-ms 1500
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+import httpx
+
+from benchmarks.bench_call_channel import AgentServer
+from benchmarks.call_paths import PATHS, path_schedule, latency_summary
+from benchmarks.fake_azure import FakeAzureServer
+
+
+def rss_bytes(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    raise RuntimeError("no VmRSS")
+
+
+async def run_callers(url: str, args) -> dict:
+    turn_seconds = {name: [] for name in PATHS}
+    failures = {name: 0 for name in PATHS}
+    rng = random.Random(7)
+    schedule = path_schedule(args.callers)
+    rng.shuffle(schedule)
+
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+
+        async def caller(i: int, name: str):
+            await asyncio.sleep(args.ramp_s * i / args.callers)
+            path = PATHS[name]
+            payload = {"session_id": str(uuid.uuid4()), "caller_id": path["caller_id"]}
+            for n, utterance in enumerate(path["turns"]):
+                if n:
+                    await asyncio.sleep(args.think_ms / 1000 * rng.uniform(0.5, 1.5))
+                start = time.perf_counter()
+                try:
+                    response = await client.post("/chat", json={**payload, "message": utterance})
+                    response.raise_for_status()
+                except httpx.HTTPError:
+                    failures[name] += 1
+                    return
+                turn_seconds[name].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(caller(i, name) for i, name in enumerate(schedule)))
+        elapsed = time.perf_counter() - start
+
+    turns = sum(len(t) for t in turn_seconds.values())
+    return {
+        "turns_per_s": round(turns / elapsed, 1),
+        "failed_requests": sum(failures.values()),
+        "turn": latency_summary([s for t in turn_seconds.values() for s in t]),
+        "paths": {
+            name: {"calls": schedule.count(name), "failed": failures[name], "turn": latency_summary(turn_seconds[name])}
+            for name in PATHS
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated callers on POST /chat")
+    parser.add_argument("--callers", type=int, default=2000)
+    parser.add_argument("--ramp-s", type=float, default=20)
+    parser.add_argument("--think-ms", type=float, default=1500)
+    parser.add_argument("--connections", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--port", type=int, default=8907)
+    parser.add_argument("--fake-port", type=int, default=8908)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    # Keep ended calls in the store for the whole run: memory per session
+    # is the RSS growth over every stored session, not the live calls
+    env = {"SESSION_ENDED_TTL": "86400"}
+    with FakeAzureServer(args.fake_port, args.latency_ms) as fake, \
+            AgentServer(args.port, fake.endpoint, env=env) as agent:
+        # Let the server settle, then take the memory baseline
+        time.sleep(1.0)
+        rss_before = rss_bytes(agent.process.pid)
+        results = asyncio.run(run_callers(agent.url, args))
+        sessions = httpx.get(f"{agent.url}/health").json()["session_store"]["size"]
+        rss_after = rss_bytes(agent.process.pid)
+        results["sessions"] = sessions
+        results["bytes_per_session"] = round((rss_after - rss_before) / sessions) if sessions else None
+
+    print(f"http: callers={args.callers} ramp={args.ramp_s:g}s think={args.think_ms:g}ms "
+          f"llm_latency={args.latency_ms:g}ms")
+    print(f"throughput: {results['turns_per_s']} turns/s, failed requests {results['failed_requests']}")
+    print(f"{'path':<14} {'calls':>6} {'failed':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, path in results["paths"].items():
+        turn = path["turn"]
+        print(f"{name:<14} {path['calls']:>6} {path['failed']:>7} {turn['p50_ms']:>8.2f} "
+              f"{turn['p95_ms']:>8.2f} {turn['p99_ms']:>8.2f}")
+    print(f"memory: {results['bytes_per_session']} bytes per session (RSS growth / {results['sessions']} sessions)")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Cold import time of the app modules, measured with `python -X importtime`.
+
+Each module is imported in a fresh interpreter, started in an empty
+directory with the Azure variables removed, so the numbers also prove
+that importing needs neither credentials nor a particular working
+directory. The median cumulative import time over --runs runs is
+compared with the targets in benchmarks/import_time_targets.json; the
+script exits non-zero when a module is over its target.
+
+Usage:
+    python -m benchmarks.bench_import_time
+    python -m benchmarks.bench_import_time --update   # record current medians (+25%) as targets
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TARGETS_PATH = os.path.join(os.path.dirname(__file__), "import_time_targets.json")
+
+MODULES = ["app.conversation", "app.main"]
+
+
+def import_time_ms(module: str, cwd: str) -> float:
+    """Cumulative import time of `module` in a fresh interpreter."""
+    env = {k: v for k, v in os.environ.items() if not k.startswith("AZURE_OPENAI_")}
+    env["PYTHONPATH"] = PROJECT_DIR
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    pattern = re.compile(rf"import time:\s+\d+ \|\s+(\d+) \|\s*{re.escape(module)}$")
+    for line in result.stderr.splitlines():
+        match = pattern.match(line)
+        if match:
+            return int(match.group(1)) / 1000
+    raise RuntimeError(f"no importtime line for {module}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold import time vs tracked targets")
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--update", action="store_true", help="write current medians (+25%%) as targets")
+    args = parser.parse_args()
+
+    with open(TARGETS_PATH) as f:
+        targets = json.load(f)
+
+    medians = {}
+    with tempfile.TemporaryDirectory() as cwd:
+        for module in MODULES:
+            medians[module] = statistics.median(import_time_ms(module, cwd) for _ in range(args.runs))
+
+    if args.update:
+        targets = {module: round(ms * 1.25) for module, ms in medians.items()}
+        with open(TARGETS_PATH, "w") as f:
+            json.dump(targets, f, indent=2)
+            f.write("\n")
+
+    failed = False
+    print(f"{'module':<20} {'median ms':>10} {'target ms':>10}")
+    for module, ms in medians.items():
+        target = targets.get(module)
+        over = target is not None and ms > target
+        failed |= over
+        print(f"{module:<20} {ms:10.1f} {target if target is not None else '-':>10}  {'OVER' if over else 'ok'}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
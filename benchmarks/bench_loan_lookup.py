@@ -0,0 +1,96 @@
+"""
+Loan-status lookups/sec for the SQLite and snapshot repositories.
+
+Builds both stores with --rows synthetic applications in a temp
+directory, then times random lookups (half hits, half misses) through
+the synchronous path and the async lookup() API.
+
+Usage:
+    python -m benchmarks.bench_loan_lookup --rows 1000000 --lookups 100000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from app.integrations.loan_repository import (
+    SQLiteLoanRepository,
+    SnapshotLoanRepository,
+    write_snapshot,
+)
+
+STATUSES = ("UNDER_REVIEW", "APPROVED", "REJECTED", "DISBURSED")
+
+
+def synthetic_rows(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield f"{rng.randrange(10**9, 10**10)}", rng.choice(STATUSES)
+
+
+def sample_phones(count: int, lookups: int, seed: int = 7):
+    """Half phones that exist (same generator), half that almost surely do not."""
+    existing = [phone for phone, _ in synthetic_rows(min(count, lookups // 2), seed)]
+    rng = random.Random(seed + 1)
+    missing = [f"{rng.randrange(10**9):010d}" for _ in range(lookups - len(existing))]
+    phones = existing + missing
+    rng.shuffle(phones)
+    return phones
+
+
+def time_sync(repo, phones) -> float:
+    start = time.perf_counter()
+    for phone in phones:
+        repo.lookup_sync(phone)
+    return len(phones) / (time.perf_counter() - start)
+
+
+async def time_async(repo, phones, concurrency: int) -> float:
+    queue = list(phones)
+
+    async def worker():
+        while queue:
+            await repo.lookup(queue.pop())
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return len(phones) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Loan repository lookup benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    phones = sample_phones(args.rows, args.lookups)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        sqlite_repo = SQLiteLoanRepository(os.path.join(tmp, "loans.db"))
+        sqlite_repo.bulk_load(synthetic_rows(args.rows))
+        print(f"sqlite   load {args.rows:,} rows: {time.perf_counter() - start:6.1f}s")
+
+        start = time.perf_counter()
+        snapshot_path = os.path.join(tmp, "loans.snapshot")
+        write_snapshot(snapshot_path, synthetic_rows(args.rows))
+        snapshot_repo = SnapshotLoanRepository(snapshot_path)
+        print(f"snapshot load {args.rows:,} rows: {time.perf_counter() - start:6.1f}s "
+              f"({os.path.getsize(snapshot_path) / 2**20:.1f} MiB)")
+
+        for name, repo in (("sqlite", sqlite_repo), ("snapshot", snapshot_repo)):
+            sync_rate = time_sync(repo, phones)
+            async_rate = asyncio.run(time_async(repo, phones, args.concurrency))
+            print(f"{name:<9} sync {sync_rate:>10,.0f} lookups/s   "
+                  f"async x{args.concurrency} {async_rate:>10,.0f} lookups/s")
+
+        sqlite_repo.close()
+        snapshot_repo.close()
+
+
+if __name__ == "__main__":
+    main()
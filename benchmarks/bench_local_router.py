@@ -0,0 +1,135 @@
+"""
+Accuracy and latency of the local intent router vs the Azure router.
+
+Loads the labeled utterances in benchmarks/data/intent_utterances.csv
+(utterance, allowed actions separated by "|", expected action or
+"none"), then:
+
+- calibrates the local router's "none" threshold on half of the rows
+  and reports accuracy on the other half (and on all rows at the
+  default threshold)
+- times local routing per utterance and per batch
+- times llm_route against benchmarks/fake_azure.py; the fake only
+  keyword-matches, so its accuracy says nothing about the real model.
+  Pass --azure to score the deployment configured in the environment.
+
+Usage:
+    python -m benchmarks.bench_local_router
+    python -m benchmarks.bench_local_router --azure
+"""
+
+import argparse
+import asyncio
+import csv
+import os
+import time
+from contextlib import nullcontext
+
+from benchmarks.fake_azure import FakeAzureServer
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "data", "intent_utterances.csv")
+
+
+def load_samples(path: str = DATA_PATH) -> list[tuple]:
+    """(utterance, allowed_actions, expected) triples; expected is None for "none"."""
+    with open(path, newline="") as f:
+        return [
+            (row["utterance"], tuple(row["allowed"].split("|")),
+             None if row["expected"] == "none" else row["expected"])
+            for row in csv.DictReader(f)
+        ]
+
+
+def accuracy(predictions, samples) -> float:
+    return sum(p == expected for p, (_, _, expected) in zip(predictions, samples)) / len(samples)
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def timed(fn, samples) -> tuple[list, list[float]]:
+    predictions, timings = [], []
+    for user_input, actions, _ in samples:
+        start = time.perf_counter()
+        predictions.append(fn(user_input, actions))
+        timings.append(time.perf_counter() - start)
+    return predictions, timings
+
+
+async def timed_async(fn, samples) -> tuple[list, list[float]]:
+    predictions, timings = [], []
+    for user_input, actions, _ in samples:
+        start = time.perf_counter()
+        predictions.append(await fn(user_input, actions))
+        timings.append(time.perf_counter() - start)
+    return predictions, timings
+
+
+def report(label: str, predictions, timings, samples):
+    print(
+        f"{label:<34} acc {accuracy(predictions, samples):6.1%}  "
+        f"p50 {percentile(timings, 0.5) * 1000:8.3f} ms  p99 {percentile(timings, 0.99) * 1000:8.3f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local vs Azure intent routing")
+    parser.add_argument("--azure", action="store_true", help="score the real configured deployment")
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--port", type=int, default=8903)
+    args = parser.parse_args()
+
+    samples = load_samples()
+
+    # llm_router needs its endpoint configured before it is imported
+    fake = None if args.azure else FakeAzureServer(args.port, args.latency_ms)
+    with fake or nullcontext():
+        if fake is not None:
+            os.environ["AZURE_OPENAI_ENDPOINT"] = fake.endpoint
+            os.environ["AZURE_OPENAI_API_KEY"] = "fake"
+            os.environ["AZURE_OPENAI_API_VERSION"] = "2024-06-01"
+            os.environ["AZURE_OPENAI_CHAT_DEPLOYMENT"] = "fake-gpt"
+        compare(samples, "azure (configured deployment)" if args.azure
+                else f"fake azure ({args.latency_ms:g} ms, keyword)")
+
+
+def compare(samples, remote_label: str):
+    from app.local_intent_router import LocalIntentRouter, EXEMPLARS, LOCAL_ROUTER_THRESHOLD
+    from app.llm_router import ROUTE_EXAMPLES
+
+    start = time.perf_counter()
+    router = LocalIntentRouter(ROUTE_EXAMPLES + EXEMPLARS)
+    print(f"samples={len(samples)} local router built in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    predictions, timings = timed(router.route, samples)
+    report(f"local (threshold {LOCAL_ROUTER_THRESHOLD:g})", predictions, timings, samples)
+
+    tune, held_out = samples[::2], samples[1::2]
+    threshold, tune_accuracy = router.calibrate(tune)
+    predictions, timings = timed(router.route, held_out)
+    report(f"local (calibrated {threshold:g}, held out)", predictions, timings, held_out)
+    print(f"{'':<34} tuning-half accuracy {tune_accuracy:.1%}")
+
+    start = time.perf_counter()
+    router.route_batch([(user_input, actions) for user_input, actions, _ in samples])
+    per_item = (time.perf_counter() - start) / len(samples)
+    print(f"{'local route_batch':<34} {per_item * 1e6:8.1f} us per utterance")
+
+    misses = [(u, e, p) for p, (u, _, e) in zip(timed(router.route, samples)[0], samples) if p != e]
+    for user_input, expected, predicted in misses:
+        print(f"  miss: {user_input!r} expected {expected} got {predicted}")
+
+    async def run_remote():
+        from app import llm_router
+        result = await timed_async(llm_router.llm_route, samples)
+        await llm_router.aclose()
+        return result
+
+    predictions, timings = asyncio.run(run_remote())
+    report(remote_label, predictions, timings, samples)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Caller-side cost of logging: synchronous print vs the queued JSON logger.
+
+Emits the lines of a turn (incoming call, loan lookup, turn summary)
+--turns times, once with print (what the engine used to do) and once with
+app.logs.log_event, while stdout is a slow sink (each write takes
+--write-us, like a busy terminal or a log pipe that is being read
+slowly). Reports the time the *caller* spends per turn; with the queued
+logger the writes happen on the listener thread.
+
+Usage:
+    python -m benchmarks.bench_logging --turns 5000 --write-us 50
+"""
+
+import argparse
+import sys
+import time
+
+from benchmarks.bench_hedging import percentile
+
+
+class SlowSink:
+    """A stdout whose writes block for a fixed time."""
+
+    def __init__(self, write_seconds: float):
+        self.write_seconds = write_seconds
+        self.lines = 0
+
+    def write(self, text: str):
+        deadline = time.perf_counter() + self.write_seconds
+        while time.perf_counter() < deadline:
+            pass
+        self.lines += text.count("\n")
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def with_print(i: int):
+    print(f"DEBUG | Incoming call from: 555{i:07d}")
+    print("DEBUG | caller ID lookup:", repr(f"555{i:07d}"), "→", "APPROVED")
+    print("DEBUG | transition after verify:", "status_response")
+
+
+def with_logger(i: int, log, log_event):
+    log_event(log, "incoming_call", caller_id=f"555{i:07d}")
+    log_event(log, "loan_lookup", source="caller_id", phone=f"555{i:07d}", status="APPROVED",
+              next_state="status_response", lookup_ms=0.05)
+    log_event(log, "turn", outcome="ok", states=["start", "verify_caller_id"], duration_ms=0.4)
+
+
+def timed(fn, turns: int) -> list[float]:
+    timings = []
+    for i in range(turns):
+        start = time.perf_counter()
+        fn(i)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="print vs queued structured logging")
+    parser.add_argument("--turns", type=int, default=5000)
+    parser.add_argument("--write-us", type=float, default=50)
+    args = parser.parse_args()
+
+    real_stdout = sys.stdout
+    sink = SlowSink(args.write_us / 1e6)
+    sys.stdout = sink
+    try:
+        # The writer thread's stream handler binds sys.stdout when it starts
+        # (on the first event)
+        from app import logs
+        log = logs.get_logger("bench")
+
+        results = {"print": timed(with_print, args.turns)}
+        results["log_event"] = timed(lambda i: with_logger(i, log, logs.log_event), args.turns)
+        dropped = logs.QUEUE_HANDLER.dropped
+        logs.shutdown()  # wait for the writer thread to drain the queue
+    finally:
+        sys.stdout = real_stdout
+
+    print(f"turns={args.turns} stdout write={args.write_us:g}us, 3 lines per turn")
+    for label, timings in results.items():
+        print(
+            f"{label:<10} p50 {percentile(timings, 0.5) * 1e6:8.1f} us  "
+            f"p99 {percentile(timings, 0.99) * 1e6:8.1f} us  total {sum(timings) * 1000:8.1f} ms"
+        )
+    print(f"lines written {sink.lines}, dropped by the logger {dropped}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Prompt size and routing latency, before and after the prompt templates
+in app/llm_router.py.
+
+"Before" rebuilds the requests the way llm_router used to (routing
+system prompts formatted per call, allowed actions as a Python list
+repr, padded user messages, no output budget for routing); "after" uses the
+module-level templates. For every kind of LLM call it reports:
+
+- prompt tokens per call (tiktoken when installed, else an estimate;
+  see app/prompt_tokens.py) and the max_tokens sent
+- bytes of the serialized request shared by every call of that kind
+  (what a provider-side prompt cache can reuse)
+- microseconds to build the messages
+
+Then --requests routing calls of each shape, interleaved, go to the
+fake deployment in benchmarks/fake_azure.py (--latency-ms) and the
+client-side latency is compared. The fake's latency does not depend on
+the prompt, so this shows the client's share (serializing and sending
+the request) only; prefill and prompt-cache savings happen at the
+provider.
+
+Usage:
+    python -m benchmarks.bench_prompts --requests 300 --latency-ms 0
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from benchmarks.bench_route_batching import UTTERANCES, _configure_env
+from benchmarks.call_paths import latency_summary
+from benchmarks.fake_azure import FakeAzureServer
+
+
+# ============================================================
+# The requests as llm_router built them before the templates
+# ============================================================
+
+def legacy_route_messages(user_input, allowed_actions):
+    from app.llm_router import ROUTE_EXAMPLES_TEXT
+    return [
+        {
+            "role": "system",
+            "content": (
+                "You are a banking assistant routing user intent. "
+                "Map the user's input to ONE allowed action. "
+                "Be flexible with variations.\n\n"
+                "Examples:\n"
+                f"{ROUTE_EXAMPLES_TEXT}\n\n"
+                "Respond ONLY with the action name (lowercase) or 'none'."
+            )
+        },
+        {
+            "role": "user",
+            "content": f"""
+User input: {user_input}
+Allowed actions: {list(allowed_actions)}
+"""
+        }
+    ]
+
+
+def legacy_route_batch_messages(requests):
+    from app.llm_router import ROUTE_EXAMPLES_TEXT
+    lines = "\n".join(
+        json.dumps({"id": i, "input": user_input, "allowed": list(allowed_actions)})
+        for i, (user_input, allowed_actions) in enumerate(requests)
+    )
+    return [
+        {
+            "role": "system",
+            "content": (
+                "You are a banking assistant routing user intent. "
+                "Map each user input to ONE of its allowed actions. "
+                "Be flexible with variations.\n\n"
+                "Examples:\n"
+                f"{ROUTE_EXAMPLES_TEXT}\n\n"
+                "You receive one JSON object per line with an id, the user input "
+                "and its allowed actions. Respond ONLY with a JSON array holding "
+                "one action name (lowercase) or 'none' per line, in id order."
+            )
+        },
+        {"role": "user", "content": f"Inputs:\n{lines}\n"}
+    ]
+
+
+def legacy_fallback_messages(user_input):
+    # Same system prompt text (a constant literal then, too)
+    from app.llm_router import FALLBACK_SYSTEM_PROMPT
+    return [
+        {"role": "system", "content": FALLBACK_SYSTEM_PROMPT},
+        {
+            "role": "user",
+            "content": f"""
+User said: {user_input}
+Current context: Asking for phone number to check loan status
+
+Generate a brief, helpful redirect message.
+"""
+        }
+    ]
+
+
+def legacy_goodbye_messages(loan_status):
+    from app.llm_router import GOODBYE_SYSTEM_PROMPT
+    return [
+        {"role": "system", "content": GOODBYE_SYSTEM_PROMPT},
+        {
+            "role": "user",
+            "content": f"""
+Context: User's loan is {loan_status}. They declined SMS.
+
+Generate a brief goodbye message.
+"""
+        }
+    ]
+
+
+# ============================================================
+# Prompt sizes
+# ============================================================
+
+def prompt_cases():
+    """kind -> (legacy builder, new builder, legacy max_tokens, new max_tokens, sample args)"""
+    from app import llm_router
+
+    batches = [UTTERANCES[i:i + 3] for i in range(0, len(UTTERANCES), 3)]
+    return {
+        "route": (
+            legacy_route_messages, llm_router.route_messages,
+            lambda *a: None, lambda _, actions: llm_router.route_max_tokens(actions),
+            UTTERANCES,
+        ),
+        "route_batch": (
+            legacy_route_batch_messages, llm_router.route_batch_messages,
+            lambda *a: None, llm_router.route_batch_max_tokens,
+            [(batch,) for batch in batches],
+        ),
+        "fallback": (
+            legacy_fallback_messages,
+            lambda text: llm_router._messages(
+                llm_router.FALLBACK_SYSTEM_PROMPT, llm_router.FALLBACK_USER_TEMPLATE.format(user_input=text)
+            ),
+            lambda *a: llm_router.FALLBACK_MAX_TOKENS, lambda *a: llm_router.FALLBACK_MAX_TOKENS,
+            [(text,) for text, _ in UTTERANCES],
+        ),
+        "goodbye": (
+            legacy_goodbye_messages,
+            lambda status: llm_router._messages(
+                llm_router.GOODBYE_SYSTEM_PROMPT, llm_router.GOODBYE_USER_TEMPLATE.format(loan_status=status)
+            ),
+            lambda *a: llm_router.GOODBYE_MAX_TOKENS, lambda *a: llm_router.GOODBYE_MAX_TOKENS,
+            [("UNDER_REVIEW",), ("APPROVED",), ("REJECTED",)],
+        ),
+    }
+
+
+def shared_prefix(requests: list[str]) -> int:
+    return len(os.path.commonprefix(requests))
+
+
+def build_us(builder, samples, repeat: int = 2000) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for args in samples:
+            builder(*args)
+    return (time.perf_counter() - start) / (repeat * len(samples)) * 1e6
+
+
+def measure_prompts() -> dict:
+    from app.prompt_tokens import message_tokens
+
+    results = {}
+    for kind, (legacy, new, legacy_budget, new_budget, samples) in prompt_cases().items():
+        row = {}
+        for label, builder, budget in (("before", legacy, legacy_budget), ("after", new, new_budget)):
+            requests = [builder(*args) for args in samples]
+            row[label] = {
+                "prompt_tokens": round(sum(message_tokens(m) for m in requests) / len(requests), 1),
+                "max_tokens": budget(*samples[0]),
+                "shared_prefix_bytes": shared_prefix([json.dumps(m) for m in requests]),
+                "request_bytes": round(sum(len(json.dumps(m)) for m in requests) / len(requests)),
+                "build_us": round(build_us(builder, samples), 2),
+            }
+        results[kind] = row
+    return results
+
+
+# ============================================================
+# Routing latency against the fake deployment
+# ============================================================
+
+async def measure_latency(requests: int) -> dict:
+    from app import llm_router
+
+    client = llm_router.get_client()
+    model = llm_router.deployment_name()
+
+    def before(text, actions):
+        return client.chat.completions.create(
+            model=model, messages=legacy_route_messages(text, actions), temperature=0
+        )
+
+    def after(text, actions):
+        return client.chat.completions.create(
+            model=model, messages=llm_router.route_messages(text, actions), temperature=0,
+            max_tokens=llm_router.route_max_tokens(actions),
+        )
+
+    seconds = {"before": [], "after": []}
+    for shape in (before, after):  # warm up the connection
+        await shape(*UTTERANCES[0])
+    for i in range(requests):
+        text, actions = UTTERANCES[i % len(UTTERANCES)]
+        for label, shape in (("before", before), ("after", after)):
+            start = time.perf_counter()
+            await shape(text, actions)
+            seconds[label].append(time.perf_counter() - start)
+    await llm_router.aclose()
+    return {label: latency_summary(values) for label, values in seconds.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt tokens and routing latency, before/after templates")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--port", type=int, default=8912)
+    args = parser.parse_args()
+
+    from app.prompt_tokens import TOKEN_STATS
+
+    prompts = measure_prompts()
+    print(f"tokenizer: {TOKEN_STATS.stats()['tokenizer']}")
+    print(f"{'kind':<12} {'':<7} {'tokens':>7} {'max_tok':>8} {'bytes':>6} {'shared':>7} {'build us':>9}")
+    for kind, row in prompts.items():
+        for label, r in row.items():
+            print(f"{kind:<12} {label:<7} {r['prompt_tokens']:>7} {str(r['max_tokens']):>8} "
+                  f"{r['request_bytes']:>6} {r['shared_prefix_bytes']:>7} {r['build_us']:>9}")
+
+    with FakeAzureServer(args.port, args.latency_ms) as fake:
+        _configure_env(fake.endpoint)
+        latency = asyncio.run(measure_latency(args.requests))
+
+    print(f"\nroute latency, {args.requests} calls each, fake latency {args.latency_ms:g}ms")
+    for label, summary in latency.items():
+        print(f"  {label:<7} p50 {summary['p50_ms']:.2f} ms  p95 {summary['p95_ms']:.2f} ms  "
+              f"p99 {summary['p99_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
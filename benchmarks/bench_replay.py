@@ -0,0 +1,84 @@
+"""
+Transcript replay throughput (app/replay.py): the async pool alone vs
+the process pool, with CPU-bound and LLM-bound replays.
+
+--calls transcripts are generated from the scripted calls in
+benchmarks/call_paths.py (each expecting its path's last state) and
+replayed with `python -m app.replay` for each mode:
+
+- llm=stub: LLM_CLIENT=stub, no network; the engine is the only work
+- llm=fake: the fake deployment in benchmarks/fake_azure.py with
+  --latency-ms per completion; calls mostly wait on the LLM
+
+Each run reports calls/s (wall time of the whole CLI, start-up and
+warm-up included), how many calls passed their expectation, and
+the median turn latency.
+
+Usage:
+    python -m benchmarks.bench_replay --calls 20000 --workers 1 2 4
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_engine import _configure_env
+from benchmarks.call_paths import PATHS, path_schedule
+from benchmarks.fake_azure import FakeAzureServer
+
+
+def write_transcripts(path: str, calls: int):
+    with open(path, "w", encoding="utf-8") as f:
+        for i, name in enumerate(path_schedule(calls)):
+            scripted = PATHS[name]
+            f.write(json.dumps({
+                "call_id": f"{name}-{i}",
+                "caller_id": scripted["caller_id"],
+                "turns": scripted["turns"],
+                "expect": {"state": scripted["expected"]},
+            }) + "\n")
+
+
+def run_replay(transcripts: str, llm: str, workers: int, concurrency: int) -> dict:
+    command = [
+        sys.executable, "-m", "app.replay", transcripts, "-o", os.devnull,
+        "--llm", llm, "--workers", str(workers), "--concurrency", str(concurrency),
+    ]
+    start = time.perf_counter()
+    finished = subprocess.run(command, capture_output=True, text=True)
+    seconds = time.perf_counter() - start
+    summary = json.loads(finished.stderr.strip().splitlines()[-1])
+    summary["wall_calls_per_s"] = round(summary["calls"] / seconds, 1)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay throughput: async pool vs process pool")
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--port", type=int, default=8916)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        transcripts = os.path.join(tmp, "calls.jsonl")
+        write_transcripts(transcripts, args.calls)
+
+        print(f"calls={args.calls} concurrency/process={args.concurrency} cpus={os.cpu_count()}")
+        print(f"{'llm':<6} {'workers':>7} {'calls/s':>9} {'passed':>8} {'failed':>7} {'p50 turn ms':>12}")
+        with FakeAzureServer(args.port, args.latency_ms) as fake:
+            _configure_env(fake.endpoint)
+            for llm, client in (("stub", "stub"), ("fake", "azure")):
+                for workers in args.workers:
+                    r = run_replay(transcripts, client, workers, args.concurrency)
+                    print(f"{llm:<6} {workers:>7} {r['wall_calls_per_s']:>9} {r['passed']:>8} "
+                          f"{r['failed']:>7} {r['p50_turn_ms']:>12}")
+
+
+if __name__ == "__main__":
+    main()
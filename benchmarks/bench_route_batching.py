@@ -0,0 +1,130 @@
+"""
+Routing latency with and without micro-batching (app/route_batcher.py).
+
+Fires --requests routing requests at Poisson-distributed arrival times
+(--rate per second) straight at the LLM router, bypassing the fast path
+and the route cache, once unbatched and once through RouteBatcher.
+The fake deployment serves at most --max-concurrency completions at
+once, so unbatched peaks queue up at the endpoint.
+
+Usage:
+    python -m benchmarks.bench_route_batching --requests 2000 --rate 400
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+
+import httpx
+
+from benchmarks.fake_azure import FakeAzureServer
+
+# Utterances the fast path would not answer, with the decision's actions
+UTTERANCES = [
+    ("i think that is right", ("yes", "no")),
+    ("please no more messages", ("yes", "no")),
+    ("could you try some other number", ("retry", "agent", "no")),
+    ("i would rather talk to an agent", ("retry", "agent", "no")),
+    ("hmm let me think", ("yes", "no")),
+    ("yes that works for me", ("yes", "no")),
+]
+
+
+def _configure_env(endpoint: str):
+    os.environ["AZURE_OPENAI_ENDPOINT"] = endpoint
+    os.environ["AZURE_OPENAI_API_KEY"] = "fake"
+    os.environ["AZURE_OPENAI_API_VERSION"] = "2024-06-01"
+    os.environ["AZURE_OPENAI_CHAT_DEPLOYMENT"] = "fake-gpt"
+
+
+async def run(route, requests: int, rate: float, seed: int = 11):
+    """
+    Issues requests at Poisson arrival times.
+
+    Arrival times are fixed up front, so a busy client catches up in
+    bursts instead of silently lowering the rate. Latency is measured
+    from the scheduled arrival.
+
+    Output:
+    - (latency of each request, achieved requests per second)
+    """
+    rng = random.Random(seed)
+    latencies = []
+
+    async def one(arrival, utterance, actions):
+        await route(utterance, actions)
+        latencies.append(time.perf_counter() - arrival)
+
+    tasks = []
+    start = arrival = time.perf_counter()
+    for _ in range(requests):
+        delay = arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(arrival, *rng.choice(UTTERANCES))))
+        arrival += rng.expovariate(rate)
+    await asyncio.gather(*tasks)
+    return latencies, requests / (time.perf_counter() - start)
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def compare(args, stats_url: str):
+    from app import llm_router
+    from app.route_batcher import RouteBatcher
+
+    def completions() -> int:
+        return httpx.get(stats_url).json()["completions"]
+
+    batcher = RouteBatcher(window_ms=args.window_ms, max_batch=args.max_batch)
+    modes = {
+        "unbatched": llm_router.llm_route,
+        f"batched ({args.window_ms:g} ms, max {args.max_batch})": batcher.route,
+    }
+
+    results = {}
+    for label, route in modes.items():
+        await run(route, 50, args.rate)  # warm the connection pool
+        before = completions()
+        latencies, achieved = await run(route, args.requests, args.rate)
+        results[label] = (latencies, achieved, completions() - before)
+
+    await llm_router.aclose()
+    return results, batcher.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Unbatched vs micro-batched LLM routing")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=400, help="requests per second")
+    parser.add_argument("--window-ms", type=float, default=5)
+    parser.add_argument("--max-batch", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--max-concurrency", type=int, default=64)
+    parser.add_argument("--port", type=int, default=8902)
+    args = parser.parse_args()
+
+    with FakeAzureServer(args.port, args.latency_ms, args.max_concurrency) as fake:
+        _configure_env(fake.endpoint)
+        results, batcher_stats = asyncio.run(compare(args, f"{fake.endpoint}/stats"))
+
+    print(
+        f"requests={args.requests} rate={args.rate:g}/s llm_latency={args.latency_ms:g}ms "
+        f"max_concurrency={args.max_concurrency}"
+    )
+    print(f"{'':<28} {'p50 ms':>8} {'p99 ms':>8} {'LLM calls':>10} {'req/s':>7}")
+    for label, (latencies, achieved, calls) in results.items():
+        print(
+            f"{label:<28} {percentile(latencies, 0.5) * 1000:8.1f} "
+            f"{percentile(latencies, 0.99) * 1000:8.1f} {calls:>10} {achieved:7.1f}"
+        )
+    print(f"batcher: {batcher_stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Session representation: the plain dict vs app.session.Session.
+
+Sessions are built by playing the first two turns of the scripted calls
+in benchmarks/call_paths.py (a caller mid-call, as parked in the
+session store), once as dicts and once as Session objects. Reports:
+
+- memory per stored session (tracemalloc over --sessions sessions in
+  the in-memory store)
+- serialized size and encode/decode time: JSON for the dict (what an
+  external store used to hold) vs Session.encode()/decode()
+- engine throughput with each representation (scripted calls through
+  handle_turn, best of --rounds), since every session access goes
+  through Session's mapping methods
+
+Usage:
+    python -m benchmarks.bench_session --sessions 100000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.bench_engine import _configure_env, run_calls, session_memory
+from benchmarks.call_paths import PATHS, path_schedule
+from benchmarks.fake_azure import FakeAzureServer
+
+
+async def parked_sessions(count: int, new_session) -> list:
+    from app.conversation import handle_turn
+
+    sessions = []
+    for name in path_schedule(count):
+        path = PATHS[name]
+        session = new_session({"caller_id": path["caller_id"]})
+        for utterance in path["turns"][:2]:
+            await handle_turn(utterance, session)
+        session["version"] = 1
+        sessions.append(session)
+    return sessions
+
+
+def per_call_us(fn, items, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            fn(item)
+        best = min(best, time.perf_counter() - start)
+    return best / len(items) * 1e6
+
+
+def serialization(dicts: list, sessions: list) -> dict:
+    from app.session import Session
+
+    # What goes over the wire; the per-turn trace is not session state
+    dicts = [{k: v for k, v in d.items() if k != "trace"} for d in dicts]
+    as_json = [json.dumps(d) for d in dicts]
+    as_bytes = [s.encode() for s in sessions]
+    return {
+        "dict_json": {
+            "bytes": round(sum(len(j) for j in as_json) / len(as_json), 1),
+            "encode_us": round(per_call_us(json.dumps, dicts), 2),
+            "decode_us": round(per_call_us(json.loads, as_json), 2),
+        },
+        "session_binary": {
+            "bytes": round(sum(len(b) for b in as_bytes) / len(as_bytes), 1),
+            "encode_us": round(per_call_us(Session.encode, sessions), 2),
+            "decode_us": round(per_call_us(Session.decode, as_bytes), 2),
+        },
+    }
+
+
+async def run(args) -> dict:
+    from app import llm_router
+    from app.goodbye_pool import GOODBYE_POOL
+    from app.session import Session
+
+    await GOODBYE_POOL.refresh(stagger=0)
+    await run_calls(200, 100)  # warm up
+
+    results = {"memory": {}, "throughput": {}}
+    for label, new_session in (("dict", dict), ("session", Session)):
+        results["memory"][label] = round(await session_memory(args.sessions, new_session))
+        rounds = [await run_calls(args.calls, args.concurrency, new_session) for _ in range(args.rounds)]
+        results["throughput"][label] = max(r["turns_per_s"] for r in rounds)
+
+    sample = min(args.sessions, 5000)
+    results["serialization"] = serialization(
+        await parked_sessions(sample, dict), await parked_sessions(sample, Session)
+    )
+    await llm_router.aclose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="dict vs Session: memory, serialization, throughput")
+    parser.add_argument("--sessions", type=int, default=100000)
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--port", type=int, default=8915)
+    args = parser.parse_args()
+
+    with FakeAzureServer(args.port, args.latency_ms) as fake:
+        _configure_env(fake.endpoint)
+        results = asyncio.run(run(args))
+
+    memory, throughput, ser = results["memory"], results["throughput"], results["serialization"]
+    print(f"sessions={args.sessions} (mid-call, after two turns)")
+    print(f"{'':<16} {'dict':>10} {'Session':>10}")
+    print(f"{'bytes/session':<16} {memory['dict']:>10} {memory['session']:>10}")
+    print(f"{'serialized B':<16} {ser['dict_json']['bytes']:>10} {ser['session_binary']['bytes']:>10}")
+    print(f"{'encode us':<16} {ser['dict_json']['encode_us']:>10} {ser['session_binary']['encode_us']:>10}")
+    print(f"{'decode us':<16} {ser['dict_json']['decode_us']:>10} {ser['session_binary']['decode_us']:>10}")
+    print(f"{'engine turns/s':<16} {throughput['dict']:>10} {throughput['session']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Cost of the turn instrumentation (app/tracing.py, app/metrics.py).
+
+Runs the greeting and caller-ID turns of many calls through
+conversation.handle_turn (no LLM involved, mock loan backend) with
+tracing off (the default: spans are no-ops, only the turn/state
+histograms are recorded) and with TRACING on, and reports the time per
+turn, plus how long rendering /metrics takes afterwards.
+
+Usage:
+    python -m benchmarks.bench_tracing --calls 5000
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import time
+
+
+async def run_calls(calls: int) -> float:
+    """Seconds per turn over `calls` two-turn calls."""
+    from app.conversation import handle_turn
+
+    turns = 0
+    start = time.perf_counter()
+    for _ in range(calls):
+        session = {}
+        await handle_turn("", session)
+        await handle_turn("yes", session)
+        turns += 2
+    return (time.perf_counter() - start) / turns
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Turn latency with tracing off and on")
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    os.environ.setdefault("LOAN_BACKEND", "mock")
+    from app import tracing
+    from app.metrics import REGISTRY
+
+    results = {"tracing off": [], "tracing on": []}
+    # The engine prints DEBUG lines; keep them out of the measurement
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(run_calls(200))  # warm up
+        for _ in range(args.rounds):
+            for label, enabled in (("tracing off", False), ("tracing on", True)):
+                tracing.TRACING = enabled
+                results[label].append(asyncio.run(run_calls(args.calls)))
+
+    print(f"calls={args.calls} rounds={args.rounds} (best round)")
+    off = min(results["tracing off"])
+    for label, per_turn in results.items():
+        best = min(per_turn)
+        print(f"{label:<12} {best * 1e6:8.1f} us/turn  ({(best - off) * 1e6:+.1f} us)")
+
+    start = time.perf_counter()
+    text = REGISTRY.render()
+    print(f"render /metrics registry: {(time.perf_counter() - start) * 1000:.2f} ms, {len(text.splitlines())} lines")
+
+
+if __name__ == "__main__":
+    main()
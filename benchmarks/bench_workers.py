@@ -0,0 +1,139 @@
+"""
+/chat throughput as uvicorn workers are added, with sessions any worker
+can serve (SESSION_STORE=token by default, or redis).
+
+For each --workers count the agent is started with that many uvicorn
+workers (fake Azure, benchmarks/fake_azure.py, in its own process), and
+--client-procs load processes each keep --callers scripted calls from
+benchmarks/call_paths.py going back to back for --seconds. Each turn
+sends the session token from the previous reply; the client's pooled
+connections are spread over the workers by the kernel, so the turns of
+one call are served by different workers. Reports:
+
+- turns/s, and scaling efficiency: turns/s / (workers x turns/s with
+  one worker)
+- turn latency p50/p95
+- calls that ended in the wrong state. Non-zero means session state
+  was lost between workers, as with --store memory.
+
+Near-linear scaling needs a core per worker plus cores for the client
+processes and the fake endpoint; with fewer cores the workers only
+share them, and the efficiency column shows that.
+
+Usage:
+    python -m benchmarks.bench_workers --workers 1 2 4
+    python -m benchmarks.bench_workers --workers 2 --store memory   # state lost
+    SESSION_REDIS_URL=redis://localhost:6379/0 python -m benchmarks.bench_workers --store redis
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import time
+import uuid
+
+import httpx
+
+from benchmarks.bench_call_channel import AgentServer
+from benchmarks.call_paths import PATHS, path_schedule, latency_summary
+from benchmarks.fake_azure import FakeAzureServer
+
+
+async def play_calls(url: str, callers: int, seconds: float) -> dict:
+    """Closed-loop callers for `seconds`: turn latencies and wrong endings."""
+    turn_seconds = []
+    calls = wrong_end = failed = 0
+    schedule = path_schedule(callers)
+    stop_at = time.monotonic() + seconds
+
+    async with httpx.AsyncClient(base_url=url, timeout=30) as client:
+
+        async def caller(name: str):
+            nonlocal calls, wrong_end, failed
+            path = PATHS[name]
+            while time.monotonic() < stop_at:
+                payload = {"session_id": str(uuid.uuid4()), "caller_id": path["caller_id"]}
+                reply = {}
+                for utterance in path["turns"]:
+                    start = time.perf_counter()
+                    try:
+                        response = await client.post("/chat", json={**payload, "message": utterance})
+                        response.raise_for_status()
+                    except httpx.HTTPError:
+                        failed += 1
+                        break
+                    turn_seconds.append(time.perf_counter() - start)
+                    reply = response.json()
+                    payload["session_token"] = reply.get("session_token")
+                else:
+                    calls += 1
+                    wrong_end += not reply.get("ended")
+
+        await asyncio.gather(*(caller(name) for name in schedule))
+
+    return {"turn_seconds": turn_seconds, "calls": calls, "wrong_end": wrong_end, "failed": failed}
+
+
+def _client_process(url: str, callers: int, seconds: float, results):
+    results.put(asyncio.run(play_calls(url, callers, seconds)))
+
+
+def run_load(url: str, args) -> dict:
+    results = multiprocessing.Queue()
+    procs = [
+        multiprocessing.Process(target=_client_process, args=(url, args.callers, args.seconds, results))
+        for _ in range(args.client_procs)
+    ]
+    for proc in procs:
+        proc.start()
+    parts = [results.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+
+    turn_seconds = [s for part in parts for s in part["turn_seconds"]]
+    return {
+        "turns_per_s": round(len(turn_seconds) / args.seconds, 1),
+        "turn": latency_summary(turn_seconds),
+        "calls": sum(part["calls"] for part in parts),
+        "wrong_end": sum(part["wrong_end"] for part in parts),
+        "failed": sum(part["failed"] for part in parts),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/chat throughput by number of uvicorn workers")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--store", default="token", choices=["token", "redis", "memory"])
+    parser.add_argument("--client-procs", type=int, default=2)
+    parser.add_argument("--callers", type=int, default=50, help="concurrent calls per client process")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--port", type=int, default=8913)
+    parser.add_argument("--fake-port", type=int, default=8914)
+    args = parser.parse_args()
+
+    env = {"SESSION_STORE": args.store, "LOG_LEVEL": "WARNING"}
+    if args.store == "token":
+        env["SESSION_TOKEN_SECRET"] = os.getenv("SESSION_TOKEN_SECRET", "bench-" + uuid.uuid4().hex)
+
+    print(f"store={args.store} client_procs={args.client_procs} callers/proc={args.callers} "
+          f"seconds={args.seconds:g} llm_latency={args.latency_ms:g}ms cpus={os.cpu_count()}")
+    print(f"{'workers':>7} {'turns/s':>9} {'efficiency':>10} {'p50 ms':>8} {'p95 ms':>8} {'calls':>7} {'wrong':>6} {'failed':>7}")
+
+    single = None
+    with FakeAzureServer(args.fake_port, args.latency_ms) as fake:
+        for workers in args.workers:
+            with AgentServer(args.port, fake.endpoint, workers=workers, env=env) as agent:
+                time.sleep(1.0 + 0.5 * workers)  # let every worker finish starting up
+                results = run_load(agent.url, args)
+            if workers == 1:
+                single = results["turns_per_s"]
+            efficiency = f"{results['turns_per_s'] / (workers * single):.2f}" if single else "-"
+            turn = results["turn"]
+            print(f"{workers:>7} {results['turns_per_s']:>9} {efficiency:>10} {turn.get('p50_ms', 0):>8.2f} "
+                  f"{turn.get('p95_ms', 0):>8.2f} {results['calls']:>7} {results['wrong_end']:>6} {results['failed']:>7}")
+
+
+if __name__ == "__main__":
+    main()
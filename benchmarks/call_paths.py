@@ -0,0 +1,61 @@
+"""
+Scripted calls through flows/loan_status_flow.json, shared by the
+engine and HTTP load benchmarks (bench_engine.py, bench_http_load.py).
+
+Each path is the caller ID the call arrives with and the utterances the
+caller says, starting with the empty input that triggers the greeting;
+`expected` is the last state the call must end in. The phone numbers
+are the demo applications in app/integrations/loan_system.py.
+"""
+
+UNKNOWN_CALLER = "5550100000"
+
+PATHS = {
+    # Caller ID matches an application: status, no SMS, goodbye
+    "caller_id_hit": {
+        "caller_id": "9999999999",
+        "turns": ["", "yes", "no"],
+        "expected": "llm_goodbye",
+    },
+    # Declines the caller ID, keys an unknown number, retries with a known one
+    "keypad_retry": {
+        "caller_id": UNKNOWN_CALLER,
+        "turns": ["", "no", "555 010 1234", "yes", "8888888888", "no"],
+        "expected": "llm_goodbye",
+    },
+    # Caller ID not found, asks for a person
+    "agent_handoff": {
+        "caller_id": UNKNOWN_CALLER,
+        "turns": ["", "yes", "agent"],
+        "expected": "handoff",
+    },
+    # Status by caller ID, accepts the SMS
+    "sms": {
+        "caller_id": "8888888888",
+        "turns": ["", "yes", "yes"],
+        "expected": "send_sms",
+    },
+}
+
+
+def path_schedule(calls: int) -> list[str]:
+    """`calls` path names, cycling through PATHS so each gets the same share."""
+    names = list(PATHS)
+    return [names[i % len(names)] for i in range(calls)]
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def latency_summary(seconds: list[float]) -> dict:
+    """p50/p95/p99/max in milliseconds."""
+    if not seconds:
+        return {}
+    return {
+        "p50_ms": round(percentile(seconds, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(seconds, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(seconds, 0.99) * 1000, 3),
+        "max_ms": round(max(seconds) * 1000, 3),
+    }
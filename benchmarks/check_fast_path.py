@@ -0,0 +1,45 @@
+"""
+Precision of the keyword fast path (app/intent_classifier.classify).
+
+The fast path answers without the LLM, so a confident wrong answer is
+never corrected ("incorrect" taken as yes confirms a caller ID the
+caller rejected). Runs classify over the labeled utterances in
+benchmarks/data/intent_utterances.csv and lists every confident answer
+that differs from the label. Deferring to the LLM is never wrong.
+
+Exits 1 if there is any wrong answer.
+
+Usage:
+    python -m benchmarks.check_fast_path
+"""
+
+import argparse
+import sys
+
+from benchmarks.bench_local_router import DATA_PATH, load_samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keyword fast path: confident wrong answers")
+    parser.add_argument("--data", default=DATA_PATH, help="labeled utterances CSV")
+    args = parser.parse_args()
+
+    from app.intent_classifier import classify
+
+    samples = load_samples(args.data)
+    answered = wrong = 0
+    for utterance, allowed, expected in samples:
+        confident, action = classify(utterance, list(allowed))
+        if not confident:
+            continue
+        answered += 1
+        if action != expected:
+            wrong += 1
+            print(f"WRONG {utterance!r}: {action} (expected {expected or 'none'})")
+
+    print(f"utterances={len(samples)} answered={answered} wrong={wrong}")
+    return 1 if wrong else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
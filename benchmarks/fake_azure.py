@@ -0,0 +1,275 @@
+"""
+Local stand-in for the Azure OpenAI chat-completions endpoint.
+
+Answers routing prompts (single or batched) with a keyword match and
+everything else with a canned sentence, after a configurable artificial
+latency. Used by the benchmarks so they never touch the real deployment.
+
+--max-concurrency caps how many non-streamed completions are served at
+once (like a deployment's throughput limit); extra requests wait their turn.
+--slow-rate / --slow-ms make that fraction of requests slower, to model
+a latency tail.
+
+Fault injection: --error-rate answers that fraction of requests with
+--error-status (429, 500, 503, ...), and --throttle-over answers 429 to
+requests arriving while that many are already in flight. POST /faults
+with any of {"error_rate", "error_status", "throttle_over"} changes them
+while the server runs (e.g. {"error_rate": 1} for a full outage).
+
+Run standalone:
+    python -m benchmarks.fake_azure --port 8900 --latency-ms 300
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import subprocess
+import sys
+import time
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+
+CANNED_REPLY = "Thank you for calling. Have a great day!"
+
+# Extra generation time per additional utterance in a batched routing reply
+BATCH_ITEM_LATENCY_MS = 4
+# How long an injected error takes to come back
+ERROR_LATENCY_MS = 20
+
+
+def _match(user_input: str, actions: list) -> str:
+    """The first allowed action mentioned in the user input, else 'none'."""
+    words = user_input.lower()
+    for action in actions:
+        if action and action in words:
+            return action
+    return "none"
+
+
+def _route_answer(messages: list) -> str:
+    text = messages[-1]["content"]
+    user_input = re.search(r"User input: (.*)", text)
+    allowed = re.search(r"Allowed actions: (.*)", text)
+    if not user_input or not allowed:
+        return "none"
+    return _match(user_input.group(1), [a.strip(" '\"[]") for a in allowed.group(1).split(",")])
+
+
+def _batch_route_answer(messages: list) -> tuple[str, int]:
+    """JSON array answering every "Inputs:" line, and the number of lines."""
+    lines = messages[-1]["content"].split("Inputs:", 1)[1].strip().splitlines()
+    items = [json.loads(line) for line in lines if line.strip()]
+    return json.dumps([_match(item["input"], item["allowed"]) for item in items]), len(items)
+
+
+def _chunk(deployment: str, delta: dict, finish_reason=None) -> str:
+    return "data: " + json.dumps({
+        "id": "chatcmpl-fake",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": deployment,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }) + "\n\n"
+
+
+async def _stream(deployment: str, content: str, latency_ms: float):
+    """First token after 30% of the latency, the rest spread over the remainder."""
+    tokens = re.findall(r"\S+\s*", content)
+    await asyncio.sleep(latency_ms * 0.3 / 1000)
+    per_token = latency_ms * 0.7 / 1000 / max(len(tokens), 1)
+    yield _chunk(deployment, {"role": "assistant", "content": ""})
+    for token in tokens:
+        yield _chunk(deployment, {"content": token})
+        await asyncio.sleep(per_token)
+    yield _chunk(deployment, {}, finish_reason="stop")
+    yield "data: [DONE]\n\n"
+
+
+def _error(status: int) -> JSONResponse:
+    return JSONResponse(
+        status_code=status,
+        content={"error": {"code": str(status), "message": f"Injected fault ({status})"}},
+    )
+
+
+def make_app(latency_ms: float = 300, max_concurrency: int = 0,
+             slow_rate: float = 0.0, slow_ms: float = 0.0,
+             error_rate: float = 0.0, error_status: int = 503, throttle_over: int = 0) -> FastAPI:
+    """
+    Build the fake endpoint.
+
+    Input:
+    - latency_ms: artificial delay added to every completion
+    - max_concurrency: non-streamed completions served at once (0 = unlimited)
+    - slow_rate, slow_ms: fraction of requests that take slow_ms longer
+    - error_rate, error_status: fraction of requests failed with error_status
+    - throttle_over: in-flight requests above which new ones get 429 (0 = never)
+
+    Output:
+    - FastAPI app serving /openai/deployments/{name}/chat/completions
+    """
+    app = FastAPI()
+    app.state.latency_ms = latency_ms
+    app.state.completions = 0
+    app.state.faults = {"error_rate": error_rate, "error_status": error_status, "throttle_over": throttle_over}
+    app.state.in_flight = 0
+    app.state.peak_in_flight = 0
+    app.state.errors = 0
+    slots = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+    @app.get("/stats")
+    async def stats():
+        return {
+            "completions": app.state.completions,
+            "errors": app.state.errors,
+            "peak_in_flight": app.state.peak_in_flight,
+            "faults": app.state.faults,
+        }
+
+    @app.post("/faults")
+    async def set_faults(faults: dict):
+        app.state.faults.update({k: v for k, v in faults.items() if k in app.state.faults})
+        app.state.peak_in_flight = app.state.in_flight
+        return app.state.faults
+
+    @app.post("/openai/deployments/{deployment}/chat/completions")
+    async def chat_completions(deployment: str, payload: dict):
+        app.state.in_flight += 1
+        app.state.peak_in_flight = max(app.state.peak_in_flight, app.state.in_flight)
+        try:
+            return await _complete(deployment, payload)
+        finally:
+            app.state.in_flight -= 1
+
+    async def _complete(deployment: str, payload: dict):
+        faults = app.state.faults
+        throttled = faults["throttle_over"] and app.state.in_flight > faults["throttle_over"]
+        if throttled or (faults["error_rate"] and random.random() < faults["error_rate"]):
+            app.state.errors += 1
+            await asyncio.sleep(ERROR_LATENCY_MS / 1000)
+            return _error(429 if throttled else faults["error_status"])
+
+        app.state.completions += 1
+        messages = payload.get("messages", [])
+        system = messages[0]["content"] if messages else ""
+        latency_ms = app.state.latency_ms
+        if slow_rate and random.random() < slow_rate:
+            latency_ms += slow_ms
+        if "routing user intent" in system and "Inputs:" in messages[-1]["content"]:
+            content, items = _batch_route_answer(messages)
+            latency_ms += BATCH_ITEM_LATENCY_MS * (items - 1)
+        elif "routing user intent" in system:
+            content = _route_answer(messages)
+        else:
+            content = CANNED_REPLY
+
+        if payload.get("stream"):
+            return StreamingResponse(
+                _stream(deployment, content, latency_ms),
+                media_type="text/event-stream",
+            )
+
+        if slots is None:
+            await asyncio.sleep(latency_ms / 1000)
+        else:
+            async with slots:
+                await asyncio.sleep(latency_ms / 1000)
+
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": deployment,
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": content},
+                }
+            ],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    return app
+
+
+class FakeAzureServer:
+    """
+    Runs the fake endpoint in a child process for the duration of a benchmark.
+
+    A separate process keeps the fake server's CPU work off the GIL of the
+    process being measured.
+    """
+
+    def __init__(self, port: int = 8900, latency_ms: float = 300, max_concurrency: int = 0,
+                 slow_rate: float = 0.0, slow_ms: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 503, throttle_over: int = 0):
+        self.port = port
+        self.latency_ms = latency_ms
+        self.max_concurrency = max_concurrency
+        self.slow_rate = slow_rate
+        self.slow_ms = slow_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.throttle_over = throttle_over
+        self.process = None
+
+    @property
+    def endpoint(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        self.process = subprocess.Popen([
+            sys.executable, "-m", "benchmarks.fake_azure",
+            "--port", str(self.port),
+            "--latency-ms", str(self.latency_ms),
+            "--max-concurrency", str(self.max_concurrency),
+            "--slow-rate", str(self.slow_rate),
+            "--slow-ms", str(self.slow_ms),
+            "--error-rate", str(self.error_rate),
+            "--error-status", str(self.error_status),
+            "--throttle-over", str(self.throttle_over),
+        ])
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            try:
+                httpx.get(f"{self.endpoint}/docs", timeout=0.5)
+                return self
+            except httpx.TransportError:
+                time.sleep(0.05)
+        self.process.kill()
+        raise RuntimeError("fake Azure server did not start")
+
+    def set_faults(self, **faults) -> dict:
+        """Changes error_rate / error_status / throttle_over of the running server."""
+        return httpx.post(f"{self.endpoint}/faults", json=faults, timeout=5).json()
+
+    def stats(self) -> dict:
+        return httpx.get(f"{self.endpoint}/stats", timeout=5).json()
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        self.process.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--max-concurrency", type=int, default=0)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--throttle-over", type=int, default=0)
+    args = parser.parse_args()
+    uvicorn.run(
+        make_app(args.latency_ms, args.max_concurrency, args.slow_rate, args.slow_ms,
+                 args.error_rate, args.error_status, args.throttle_over),
+        host="127.0.0.1", port=args.port, log_level="warning",
+    )
@@ -0,0 +1,176 @@
+"""
+Fault injection: how the LLM circuit breaker and concurrency limit react
+when the deployment throttles, goes down and comes back.
+
+Routing requests (conversation.route_intent inside a turn budget, route
+cache cleared) arrive at --rate per second against benchmarks/fake_azure.py
+through four phases of --phase-seconds each:
+
+    healthy   -> no faults
+    throttled -> the fake answers 429 above --throttle-over in-flight requests
+    outage    -> every request fails with 503
+    recovered -> no faults
+
+Per phase it reports turn latency, how many turns degraded (re-prompt
+or static text), requests that reached the fake, and the breaker state and
+concurrency limit at the end. It then checks that the limit backed off
+under throttling, the breaker opened during the outage and shed load at
+once, and closed again after recovery; the script exits non-zero when
+a check fails.
+
+Usage:
+    python -m benchmarks.fault_injection --rate 60 --phase-seconds 4
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from benchmarks.bench_hedging import UTTERANCES, percentile
+from benchmarks.fake_azure import FakeAzureServer
+
+PHASES = [
+    ("healthy", {"error_rate": 0, "throttle_over": 0}),
+    ("throttled", {"error_rate": 0, "throttle_over": None}),  # None -> --throttle-over
+    ("outage", {"error_rate": 1, "error_status": 503, "throttle_over": 0}),
+    ("recovered", {"error_rate": 0, "throttle_over": 0}),
+]
+
+
+def _configure_env(endpoint: str, args):
+    os.environ["AZURE_OPENAI_ENDPOINT"] = endpoint
+    os.environ["AZURE_OPENAI_API_KEY"] = "fake"
+    os.environ["AZURE_OPENAI_API_VERSION"] = "2024-06-01"
+    os.environ["AZURE_OPENAI_CHAT_DEPLOYMENT"] = "fake-gpt"
+    os.environ["LLM_BREAKER_COOLDOWN"] = str(args.cooldown)
+    os.environ["LLM_LIMIT_INITIAL"] = str(args.initial_limit)
+
+
+async def run_phase(seconds: float, rate: float) -> list[tuple[float, bool]]:
+    """(latency, breaker_was_open) per request, arriving at `rate` per second."""
+    from app import llm_budget, route_cache
+    from app.conversation import route_intent
+    from app.llm_guard import LLM_GUARD
+
+    results = []
+
+    async def one(i: int):
+        state, utterance, actions = UTTERANCES[i % len(UTTERANCES)]
+        route_cache.local_cache.clear()
+        was_open = LLM_GUARD.breaker.state == "open"
+        started = time.monotonic()
+        token = llm_budget.start_turn()
+        try:
+            await route_intent(state, utterance, actions)
+        finally:
+            llm_budget.end_turn(token, started)
+        results.append((time.monotonic() - started, was_open))
+
+    tasks = []
+    start = time.monotonic()
+    for i in range(int(seconds * rate)):
+        delay = start + i / rate - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(i)))
+    await asyncio.gather(*tasks)
+    return results
+
+
+async def run_all(fake: FakeAzureServer, args) -> list[dict]:
+    from app import llm_router
+    from app.llm_budget import BUDGET_STATS
+    from app.llm_guard import LLM_GUARD
+
+    llm_router.get_client()  # as the app's lifespan does
+
+    report = []
+    for name, faults in PHASES:
+        faults = {k: (args.throttle_over if v is None else v) for k, v in faults.items()}
+        fake.set_faults(**faults)
+        before = fake.stats()
+        degraded_before = sum(BUDGET_STATS.degraded.values())
+        decreases_before = LLM_GUARD.limiter.decreases
+        opened_before = LLM_GUARD.breaker.opened
+
+        results = await run_phase(args.phase_seconds, args.rate)
+
+        after = fake.stats()
+        latencies = [latency for latency, _ in results]
+        shed = [latency for latency, was_open in results if was_open]
+        report.append({
+            "phase": name,
+            "requests": len(results),
+            "p50": percentile(latencies, 0.5),
+            "p99": percentile(latencies, 0.99),
+            "shed_p99": percentile(shed, 0.99) if shed else None,
+            "shed": len(shed),
+            "degraded": sum(BUDGET_STATS.degraded.values()) - degraded_before,
+            "llm_ok": after["completions"] - before["completions"],
+            "llm_errors": after["errors"] - before["errors"],
+            "breaker": LLM_GUARD.breaker.state,
+            "times_opened": LLM_GUARD.breaker.opened - opened_before,
+            "limit": int(LLM_GUARD.limiter.limit),
+            "decreases": LLM_GUARD.limiter.decreases - decreases_before,
+        })
+
+    await llm_router.aclose()
+    return report
+
+
+def checks(report: list[dict], args) -> list[tuple[str, bool]]:
+    phase = {r["phase"]: r for r in report}
+    return [
+        ("healthy: nothing degraded", phase["healthy"]["degraded"] == 0),
+        ("throttled: limit backed off", phase["throttled"]["decreases"] > 0
+         and phase["throttled"]["limit"] < args.initial_limit),
+        ("throttled: breaker stayed closed or recovered", phase["throttled"]["breaker"] != "open"),
+        ("outage: breaker opened", phase["outage"]["times_opened"] > 0),
+        ("outage: open breaker sheds within 50 ms", phase["outage"]["shed_p99"] is not None
+         and phase["outage"]["shed_p99"] < 0.05),
+        ("outage: fake saw only probe traffic", phase["outage"]["llm_errors"]
+         < 0.25 * phase["outage"]["requests"]),
+        ("recovered: breaker closed", phase["recovered"]["breaker"] == "closed"),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM breaker and concurrency limit under injected faults")
+    parser.add_argument("--rate", type=float, default=60, help="routing requests per second")
+    parser.add_argument("--phase-seconds", type=float, default=4)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--throttle-over", type=int, default=8)
+    parser.add_argument("--cooldown", type=float, default=1.0, help="LLM_BREAKER_COOLDOWN")
+    parser.add_argument("--initial-limit", type=int, default=20, help="LLM_LIMIT_INITIAL")
+    parser.add_argument("--port", type=int, default=8905)
+    args = parser.parse_args()
+
+    with FakeAzureServer(args.port, args.latency_ms) as fake:
+        _configure_env(fake.endpoint, args)
+        report = asyncio.run(run_all(fake, args))
+
+    def ms(seconds):
+        return "-" if seconds is None else f"{seconds * 1000:.1f}"
+
+    print(f"rate={args.rate:g}/s llm_latency={args.latency_ms:g}ms throttle_over={args.throttle_over} "
+          f"cooldown={args.cooldown:g}s")
+    print(f"{'phase':<10} {'reqs':>5} {'p50 ms':>8} {'p99 ms':>8} {'shed':>5} {'shed p99':>9} "
+          f"{'degraded':>9} {'llm ok':>7} {'llm err':>8} {'limit':>6} {'cuts':>5}  breaker")
+    for r in report:
+        print(
+            f"{r['phase']:<10} {r['requests']:>5} {ms(r['p50']):>8} {ms(r['p99']):>8} {r['shed']:>5} "
+            f"{ms(r['shed_p99']):>9} {r['degraded']:>9} {r['llm_ok']:>7} {r['llm_errors']:>8} "
+            f"{r['limit']:>6} {r['decreases']:>5}  {r['breaker']} (opened {r['times_opened']}x)"
+        )
+
+    failed = False
+    for label, ok in checks(report, args):
+        failed |= not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {label}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
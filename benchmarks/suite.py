@@ -0,0 +1,161 @@
+"""
+Benchmark suite with a regression check against a stored baseline.
+
+Runs, each in its own interpreter:
+
+- bench_engine:    scripted call paths straight through handle_turn
+- bench_http_load: simulated callers on POST /chat against uvicorn
+
+(both use the fake Azure endpoint in benchmarks/fake_azure.py), then
+compares the tracked metrics with benchmarks/baseline.json. A metric
+regresses when it is worse than the baseline by more than --tolerance
+(relative) AND by more than its absolute floor, so sub-millisecond
+jitter never fails the run. The suite also fails when a call ends in
+the wrong state, an HTTP request fails, or memory per session could
+not be measured. Exit status 1 on failure.
+
+Tracked: engine throughput (best of 3 rounds), per-path turn
+p50/p95/p99 and memory per session; HTTP per-path turn p50/p95. The
+HTTP latencies are compared with the baseline but only fail the run
+with --check-http: client and server share the machine, and on a small
+or shared box they swing by an order of magnitude between runs. Use it
+on a dedicated machine. HTTP RSS per stored session is tracked the
+same way.
+
+Usage:
+    python -m benchmarks.suite
+    python -m benchmarks.suite --update-baseline   # after an intended change
+    python -m benchmarks.suite --skip-http
+    python -m benchmarks.suite --check-http        # dedicated machine
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+ENGINE_ARGS = ["--calls", "2000", "--concurrency", "200"]
+HTTP_ARGS = ["--callers", "1000", "--ramp-s", "10", "--think-ms", "1000"]
+
+# Absolute change below which a metric never counts as regressed
+FLOORS = {"_ms": 5.0, "bytes_per_session": 128, "_per_s": 0.0}
+
+
+def run_benchmark(module: str, extra_args: list) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, "results.json")
+        subprocess.run([sys.executable, "-m", module, *extra_args, "--json", out], check=True)
+        with open(out) as f:
+            return json.load(f)
+
+
+def tracked_metrics(engine: dict, http: dict) -> dict:
+    """Flat metric name -> value for the baseline."""
+    metrics = {}
+    if engine:
+        metrics["engine.calls_per_s"] = engine["calls_per_s"]
+        metrics["engine.bytes_per_session"] = engine["bytes_per_session"]
+        for name, path in engine["paths"].items():
+            for q in ("p50_ms", "p95_ms", "p99_ms"):
+                metrics[f"engine.{name}.turn_{q}"] = path["turn"][q]
+    if http:
+        metrics["http.bytes_per_session"] = http["bytes_per_session"]
+        for name, path in http["paths"].items():
+            for q in ("p50_ms", "p95_ms"):
+                metrics[f"http.{name}.turn_{q}"] = path["turn"][q]
+    # A metric that could not be measured is a failure (see
+    # correctness_failures), not a value to compare or store
+    return {name: value for name, value in metrics.items() if value is not None}
+
+
+def correctness_failures(engine: dict, http: dict) -> list[str]:
+    failures = []
+    for name, path in (engine or {}).get("paths", {}).items():
+        if path["wrong_end"]:
+            failures.append(f"engine.{name}: {path['wrong_end']} calls ended in the wrong state")
+    if http and http["failed_requests"]:
+        failures.append(f"http: {http['failed_requests']} failed requests")
+    for name, results in (("engine", engine), ("http", http)):
+        if results and results.get("bytes_per_session") is None:
+            failures.append(f"{name}: memory per session not measured (no sessions counted)")
+    return failures
+
+
+def _floor(name: str) -> float:
+    for suffix, floor in FLOORS.items():
+        if name.endswith(suffix):
+            return floor
+    return 0.0
+
+
+def compare(metrics: dict, baseline: dict, tolerance: float, checked: tuple) -> list[tuple]:
+    """(name, baseline, current, change, regressed) per tracked metric.
+
+    Only metrics starting with one of `checked` can regress; the others
+    get None instead of a verdict.
+    """
+    rows = []
+    for name, current in metrics.items():
+        base = baseline.get(name)
+        if base is None:
+            rows.append((name, None, current, None, False))
+            continue
+        if not name.startswith(checked):
+            rows.append((name, base, current, (current - base) / base if base else 0.0, None))
+            continue
+        higher_is_better = name.endswith("_per_s")
+        worse_by = (base - current) if higher_is_better else (current - base)
+        change = (current - base) / base if base else 0.0
+        regressed = worse_by > tolerance * abs(base) and worse_by > _floor(name)
+        rows.append((name, base, current, change, regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite vs stored baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed relative regression")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--skip-http", action="store_true")
+    parser.add_argument("--check-http", action="store_true", help="also fail on HTTP latency regressions")
+    args = parser.parse_args()
+
+    engine = run_benchmark("benchmarks.bench_engine", ENGINE_ARGS)
+    http = None if args.skip_http else run_benchmark("benchmarks.bench_http_load", HTTP_ARGS)
+    metrics = tracked_metrics(engine, http)
+
+    if args.update_baseline:
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(metrics, f, indent=2)
+            f.write("\n")
+        print(f"baseline written to {BASELINE_PATH}")
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+
+    print()
+    print(f"{'metric':<40} {'baseline':>10} {'current':>10} {'change':>8}")
+    failed = False
+    checked = ("engine.", "http.") if args.check_http else ("engine.",)
+    for name, base, current, change, regressed in compare(metrics, baseline, args.tolerance, checked):
+        failed |= bool(regressed)
+        base_text = "-" if base is None else f"{base:g}"
+        change_text = "new" if change is None else f"{change:+.0%}"
+        verdict = "REGRESSED" if regressed else ("(not checked)" if regressed is None else "")
+        print(f"{name:<40} {base_text:>10} {current:>10g} {change_text:>8}  {verdict}")
+
+    for failure in correctness_failures(engine, http):
+        failed = True
+        print(f"FAIL {failure}")
+
+    print("suite: " + ("FAILED" if failed else "ok"))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,7 @@ st.caption("🎤 Simulating a voice call (using text as placeholder)")
 # Session setup - generates new UUID each time Streamlit restarts
 if "session_id" not in st.session_state:
     st.session_state.session_id = str(uuid.uuid4())
+    st.session_state.session_token = None
     st.session_state.messages = []
     st.session_state.conversation_ended = False
     st.session_state.call_started = False
@@ -21,6 +22,7 @@ col1, col2 = st.columns([6, 1])
 with col2:
     if st.button("🔄 New Call"):
         st.session_state.session_id = str(uuid.uuid4())
+        st.session_state.session_token = None
         st.session_state.messages = []
         st.session_state.conversation_ended = False
         st.session_state.call_started = False
@@ -37,12 +39,14 @@ if not st.session_state.call_started and not st.session_state.messages:
                 BACKEND_URL,
                 json={
                     "session_id": st.session_state.session_id,
+                    "session_token": st.session_state.session_token,
                     "message": ""
                 },
                 timeout=10
             )
             if response.status_code == 200:
                 result = response.json()
+                st.session_state.session_token = result.get("session_token")
                 agent_response = result.get("response", "")
                 st.session_state.messages.append(("Agent", agent_response))
                 st.rerun()
@@ -83,6 +87,7 @@ if submitted and user_input.strip():
             BACKEND_URL,
             json={
                 "session_id": st.session_state.session_id,
+                "session_token": st.session_state.session_token,
                 "message": user_input
             },
             timeout=10
@@ -90,6 +95,7 @@ if submitted and user_input.strip():
         
         if response.status_code == 200:
             result = response.json()
+            st.session_state.session_token = result.get("session_token")
             agent_response = result.get("response", "")
             
             # Add messages to history
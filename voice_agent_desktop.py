@@ -17,9 +17,11 @@ import pyttsx3
 import requests
 import uuid
 import time
+import json
 
 # Configuration
 BACKEND_URL = "http://localhost:8000/chat"
+STREAM_URL = "http://localhost:8000/chat/stream"
 
 class VoiceAgent:
     def __init__(self):
@@ -43,6 +45,7 @@ class VoiceAgent:
         
         # Session management
         self.session_id = str(uuid.uuid4())
+        self.session_token = None  # the session itself with SESSION_STORE=token
         
     def speak(self, text):
         """Convert text to speech and play"""
@@ -99,13 +102,16 @@ class VoiceAgent:
                 BACKEND_URL,
                 json={
                     "session_id": self.session_id,
+                    "session_token": self.session_token,
                     "message": user_input
                 },
                 timeout=10
             )
             
             if response.status_code == 200:
-                return response.json()["response"]
+                result = response.json()
+                self.session_token = result.get("session_token")
+                return result["response"]
             else:
                 return "Sorry, I'm having trouble connecting to the system."
                 
@@ -113,6 +119,48 @@ class VoiceAgent:
             print(f"❌ Backend error: {e}")
             return "Sorry, I can't reach the system right now."
     
+    def stream_to_backend(self, user_input):
+        """
+        Send message to the streaming endpoint and speak each sentence
+        as soon as it arrives, instead of waiting for the whole reply.
+
+        Returns the full response text.
+        """
+        try:
+            response = requests.post(
+                STREAM_URL,
+                json={
+                    "session_id": self.session_id,
+                    "session_token": self.session_token,
+                    "message": user_input
+                },
+                stream=True,
+                timeout=10
+            )
+            if response.status_code != 200:
+                text = "Sorry, I'm having trouble connecting to the system."
+                self.speak(text)
+                return text
+
+            event = None
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data = json.loads(line[len("data:"):])
+                    if event == "sentence":
+                        self.speak(data["text"])
+                    elif event == "done":
+                        self.session_token = data.get("session_token")
+                        return data["response"]
+            return ""
+
+        except requests.exceptions.RequestException as e:
+            print(f"❌ Backend error: {e}")
+            text = "Sorry, I can't reach the system right now."
+            self.speak(text)
+            return text
+
     def run(self):
         """Main conversation loop"""
         print("\n" + "="*60)
@@ -129,8 +177,8 @@ class VoiceAgent:
         time.sleep(0.5)
         
         # Get initial greeting
-        greeting = self.send_to_backend("")
-        self.speak(greeting)
+        # (spoken sentence by sentence while it streams in)
+        self.stream_to_backend("")
         
         # Main conversation loop
         while True:
@@ -146,11 +194,8 @@ class VoiceAgent:
                 self.speak("I didn't catch that. Could you repeat that?")
                 continue
             
-            # Send to backend
-            response = self.send_to_backend(user_speech)
-            
-            # Speak response
-            self.speak(response)
+            # Send to backend and speak the response as it streams in
+            response = self.stream_to_backend(user_speech)
             
             # Check if call ended
             if "[Call ended]" in response or "ended" in response.lower():
@@ -45,6 +45,7 @@ class VoiceAgent:
         
         # Session management
         self.session_id = str(uuid.uuid4())
+        self.session_token = None  # the session itself with SESSION_STORE=token
         self.last_agent_response = ""  # Track last response for context
         
     def speak(self, text):
@@ -132,13 +133,16 @@ class VoiceAgent:
                 BACKEND_URL,
                 json={
                     "session_id": self.session_id,
+                    "session_token": self.session_token,
                     "message": user_input
                 },
                 timeout=10
             )
             
             if response.status_code == 200:
-                return response.json()["response"]
+                result = response.json()
+                self.session_token = result.get("session_token")
+                return result["response"]
             else:
                 return "Sorry, I'm having trouble connecting to the system."
                 